@@ -3,19 +3,36 @@ import numpy as np
 import os
 import sys
 import time
+import json
+import hashlib
+import chromadb
 from langchain_core.documents import Document
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from app.services.series_index import rebuild_series_index
+from app.services.elasticity_engine import refresh_elasticity_table
+from app.services.sales_store import SALES_STORE_PATH, append_sales, staged_sales_store, write_product_hierarchy
+from app.embedding_pipeline import OllamaEmbeddingClient, embed_and_commit
+from app.services.embedding_cache import get_embedding_cache
+from app.services.deal_cache import bump_collection_version, new_collection_version, read_collection_version
+from app.services.lexical_index import LexicalIndex
+from app.services.vector_index import VECTOR_BACKEND, build_vector_index
+from app.services.rag_service import deal_score
+from app.services.ingestion_jobs import IngestionProgress, JobCancelled
+from app.services.telemetry import span
 
 # --- CONFIGURATION ---
 DATASET_ID = "svizor/retail-sales-forecasting-data"
 DOWNLOAD_PATH = "data/kaggle"
-CHROMA_PATH = "./chroma_db"
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
 EMBEDDING_MODEL = "nomic-embed-text" 
 CHROMA_COLLECTION = "retail_products"
-PROCESSED_DATA_PATH = "data/processed_sales.pkl"
-OLLAMA_URL = "http://localhost:11434"
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+EMBED_INSTRUCTION = "passage: "  # Same document prefix OllamaEmbeddings.embed_documents applies
+SALES_CHUNK_ROWS = int(os.getenv("INGEST_SALES_CHUNK_ROWS", "500000"))  # Sales rows held in memory at once
+DOC_BATCH_SIZE = int(os.getenv("INGEST_DOC_BATCH_SIZE", "1000"))  # Catalog rows per Document batch
+CHROMA_PAGE_SIZE = 5000  # IDs per Chroma get/delete call during catalog sync
+# Excluded from the content hash (dept/class are already hashed as part of page_content)
+VOLATILE_METADATA = {"seasonality_tags", "content_hash", "dept_name", "class_name"}
 
 
 def get_kaggle_api():
@@ -49,137 +66,408 @@ def download_kaggle_dataset(dataset_id: str, path: str):
         raise e
 
 
-def preprocess_data(path: str) -> Tuple[pd.DataFrame, List[Document]]:
-    """
-    Loads raw data, applies business rules (defaults/features), 
-    and creates LangChain Documents for RAG, and a DataFrame for ML services.
-    """
-    print("📊 Starting data preprocessing...")
-    
-    try:
-        catalog_df = pd.read_csv(os.path.join(path, 'catalog.csv'))
-        sales_df = pd.read_csv(os.path.join(path, 'sales.csv'), parse_dates=['date'])
-    except FileNotFoundError as e:
-        print(f"❌ Required files not found in {path}. Did the download fail?")
-        raise FileNotFoundError(f"Missing CSV files in {path}: {e}")
-        
-    # Standardize column names
-    catalog_df.rename(columns={'item_id': 'sku', 'item_type': 'name'}, inplace=True)
-    sales_df.rename(columns={
+def _standardize_sales(chunk: pd.DataFrame) -> pd.DataFrame:
+    """Applies column names and ML defaults to one chunk of raw sales rows."""
+    chunk = chunk.rename(columns={
         'item_id': 'sku', 
         'price_base': 'price', 
         'quantity': 'units_sold', 
         'store_id': 'region'
-    }, inplace=True)
-    
+    })
+    chunk['cost'] = chunk['price'] * 0.6
+    chunk['promo'] = np.random.randint(0, 2, size=len(chunk))
+    chunk['stock_level'] = np.random.randint(50, 500, size=len(chunk))
+    chunk['channel'] = 'in-store'  # Set default channel
+    chunk['region'] = chunk['region'].astype(str)  # Ensure region is string
+    return chunk.dropna(subset=['price', 'units_sold'])
+
+
+def iter_sales_chunks(path: str, chunksize: int = SALES_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Streams processed sales rows from sales.csv without loading the whole file."""
+    sales_file = os.path.join(path, 'sales.csv')
+    if not os.path.exists(sales_file):
+        print(f"❌ Required files not found in {path}. Did the download fail?")
+        raise FileNotFoundError(f"Missing CSV files in {path}: {sales_file}")
+    for chunk in pd.read_csv(sales_file, parse_dates=['date'], chunksize=chunksize):
+        yield _standardize_sales(chunk)
+
+
+class SalesSummary:
+    """Per-SKU running aggregates gathered while sales chunks stream past (mean price, home region)."""
+
+    def __init__(self):
+        self.price_sum = pd.Series(dtype=float)
+        self.price_count = pd.Series(dtype=float)
+        self.region = pd.Series(dtype=object)
+        self.rows = 0
+
+    def add(self, chunk: pd.DataFrame) -> None:
+        grouped = chunk.groupby('sku')
+        self.price_sum = self.price_sum.add(grouped['price'].sum(), fill_value=0)
+        self.price_count = self.price_count.add(grouped['price'].count(), fill_value=0)
+        first_region = grouped['region'].first()
+        self.region = pd.concat([self.region, first_region[~first_region.index.isin(self.region.index)]])
+        self.rows += len(chunk)
+
+    def price_map(self) -> pd.Series:
+        return self.price_sum / self.price_count
+
+
+def enrich_catalog(catalog_df: pd.DataFrame, summary: SalesSummary) -> pd.DataFrame:
+    """Standardizes one catalog chunk and applies project assumptions/defaults."""
+    catalog_df = catalog_df.rename(columns={'item_id': 'sku', 'item_type': 'name'})
+
     # Merge a single price onto the catalog for RAG indexing
-    price_map = sales_df.groupby('sku')['price'].mean()
-    catalog_df['price'] = catalog_df['sku'].map(price_map).fillna(100.0)
-
-    # Apply project assumptions/defaults to Catalog
-    catalog_df['quality_score'] = catalog_df['dept_name'].astype('category').cat.codes.apply(
-        lambda x: (x % 5) + 6
-    )  # Score 6-10
-    catalog_df['channel'] = np.random.choice(['online', 'in-store'], size=len(catalog_df))
-    catalog_df['discount'] = np.random.uniform(0.0, 30.0, size=len(catalog_df))  # Random discount 0-30%
+    catalog_df['price'] = catalog_df['sku'].map(summary.price_map()).fillna(100.0)
+
+    # Score 6-10 from a stable hash of dept_name, so every chunk agrees on the mapping
+    dept_hash = pd.util.hash_array(catalog_df['dept_name'].astype(str).to_numpy())
+    catalog_df['quality_score'] = (dept_hash % 5 + 6).astype(int)
+    # Synthetic channel/discount are derived from the SKU hash (not re-drawn every run),
+    # so unchanged products keep the same content hash and are not re-embedded
+    sku_hash = pd.util.hash_array(catalog_df['sku'].astype(str).to_numpy())
+    catalog_df['channel'] = np.where(sku_hash % 2 == 0, 'online', 'in-store')
+    catalog_df['discount'] = ((sku_hash >> np.uint64(8)) % np.uint64(30001)).astype(float) / 1000.0  # Discount 0-30%
+    if 'region' not in catalog_df.columns:
+        # The Kaggle catalog has no store column: use the first store the SKU sold in
+        catalog_df['region'] = catalog_df['sku'].map(summary.region).fillna('all')
     catalog_df['region'] = catalog_df['region'].astype(str)  # Ensure region is string
+    return catalog_df
 
-    # Create LangChain Documents (for ChromaDB)
-    documents = []
+
+def build_documents(catalog_df: pd.DataFrame, current_season: str) -> List[Document]:
+    """Creates LangChain Documents (for ChromaDB) from an enriched catalog batch using column-wise formatting."""
+    sku = catalog_df['sku'].astype(str)
+    name = catalog_df['name'].astype(str)
+    price = catalog_df['price'].astype(float)
+    discount = catalog_df['discount'].astype(float)
+    quality = catalog_df['quality_score'].astype(int)
+
+    content = (
+        "Product: " + name + " (SKU: " + sku + "). "
+        + "Category: " + catalog_df['dept_name'].astype(str) + " / " + catalog_df['class_name'].astype(str) + ". "
+        + "Price: $" + np.char.mod('%.2f', price.to_numpy()) + ". Quality: " + quality.astype(str) + "/10. "
+        + "Discount: " + np.char.mod('%.1f', discount.to_numpy()) + "%."
+    )
+
+    metadata = pd.DataFrame({
+        "sku": sku,
+        "name": name,
+        "region": catalog_df['region'].astype(str), 
+        "channel": catalog_df['channel'].astype(str), 
+        "dept_name": catalog_df['dept_name'].astype(str),
+        "class_name": catalog_df['class_name'].astype(str),
+        "quality_score": quality,
+        "price": price,
+        "discount": discount,
+        "seasonality_tags": current_season
+    }).to_dict('records')
+
+    documents = [Document(page_content=text, metadata=meta) for text, meta in zip(content.tolist(), metadata)]
+    for doc in documents:
+        doc.metadata["content_hash"] = content_hash(doc)
+    return documents
+
+
+def iter_document_batches(path: str, summary: SalesSummary, batch_size: int = DOC_BATCH_SIZE) -> Iterator[List[Document]]:
+    """Streams catalog.csv in batches and yields the Documents for each batch."""
+    catalog_file = os.path.join(path, 'catalog.csv')
+    if not os.path.exists(catalog_file):
+        print(f"❌ Required files not found in {path}. Did the download fail?")
+        raise FileNotFoundError(f"Missing CSV files in {path}: {catalog_file}")
     current_season = time.strftime('%B')
-    
-    for _, row in catalog_df.iterrows():
-        content = (
-            f"Product: {row['name']} (SKU: {row['sku']}). "
-            f"Category: {row['dept_name']} / {row['class_name']}. "
-            f"Price: ${row['price']:.2f}. Quality: {row['quality_score']}/10. "
-            f"Discount: {row['discount']:.1f}%."
-        )
-        
-        metadata = {
-            "sku": str(row['sku']),
-            "name": str(row['name']),
-            "region": str(row['region']), 
-            "channel": str(row['channel']), 
-            "quality_score": int(row['quality_score']),
-            "price": float(row['price']),
-            "discount": float(row['discount']),
-            "seasonality_tags": current_season
-        }
-        
-        documents.append(Document(page_content=content, metadata=metadata))
-
-    # --- ML: Sales Data Processing ---
-    sales_df['cost'] = sales_df['price'] * 0.6
-    sales_df['promo'] = np.random.randint(0, 2, size=len(sales_df))
-    sales_df['stock_level'] = np.random.randint(50, 500, size=len(sales_df))
-    sales_df['channel'] = 'in-store'  # Set default channel
-    sales_df['region'] = sales_df['region'].astype(str)  # Ensure region is string
-    
-    processed_sales_df = sales_df.dropna(subset=['price', 'units_sold']).copy()
+    for chunk in pd.read_csv(catalog_file, chunksize=batch_size):
+        yield build_documents(enrich_catalog(chunk, summary), current_season)
+
+
+def preprocess_data(path: str) -> Tuple[pd.DataFrame, List[Document]]:
+    """
+    Loads raw data, applies business rules (defaults/features), 
+    and creates LangChain Documents for RAG, and a DataFrame for ML services.
+    Materializes everything in memory; the ingestion pipeline uses the streaming
+    helpers (iter_sales_chunks / iter_document_batches) directly.
+    """
+    print("📊 Starting data preprocessing...")
+    summary = SalesSummary()
+    sales_chunks = []
+    for chunk in iter_sales_chunks(path):
+        summary.add(chunk)
+        sales_chunks.append(chunk)
+    processed_sales_df = pd.concat(sales_chunks, ignore_index=True) if sales_chunks else pd.DataFrame()
+
+    documents = [doc for batch in iter_document_batches(path, summary) for doc in batch]
     print(f"✅ Preprocessing complete. {len(documents)} documents created, {len(processed_sales_df)} sales records processed.")
 
     return processed_sales_df, documents
 
 
-def ingest_data_setup(processed_sales_df: pd.DataFrame, documents: List[Document]):
-    """Embeds documents and loads them into ChromaDB, and saves the ML DataFrame."""
-    
-    print("🔄 Initializing Ollama embeddings...")
-    embeddings = OllamaEmbeddings(model=EMBEDDING_MODEL, base_url=OLLAMA_URL)
+def _write_product_hierarchy(path: str) -> int:
+    """Saves the catalog's SKU -> dept_name/class_name mapping for hierarchical forecasting."""
+    catalog = pd.read_csv(os.path.join(path, 'catalog.csv'), usecols=['item_id', 'dept_name', 'class_name'])
+    return write_product_hierarchy(catalog.rename(columns={'item_id': 'sku'}))
+
+
+def _write_sales_chunk(chunk: pd.DataFrame, path: str) -> None:
+    """Appends one processed sales chunk to the staged columnar ML store (indexed once it is published)."""
+    append_sales(chunk, path)
+
+
+def content_hash(doc: Document) -> str:
+    """Hash of everything that is embedded or stored for a product, minus volatile tags."""
+    metadata = {k: v for k, v in doc.metadata.items() if k not in VOLATILE_METADATA}
+    payload = doc.page_content + "\x1f" + json.dumps(metadata, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
 
-    print(f"📚 Loading {len(documents)} documents into ChromaDB...")
-    
+def document_id(doc: Document) -> str:
+    """Deterministic Chroma ID: '<sku>:<content hash>'. Changes only when the product does."""
+    return f"{doc.metadata['sku']}:{doc.metadata['content_hash']}"
+
+
+def _sku_of(doc_id: str) -> str:
+    return doc_id.rsplit(":", 1)[0]
+
+
+def _open_collection():
+    """Opens (or creates) the persistent Chroma collection used by the RAG service."""
     # Ensure the directory exists
     os.makedirs(CHROMA_PATH, exist_ok=True)
-    
-    # Initialize the vector store with documents
-    vector_store = Chroma.from_documents(
-        documents=documents,
-        embedding=embeddings,
-        collection_name=CHROMA_COLLECTION,
-        persist_directory=CHROMA_PATH
+    return chromadb.PersistentClient(path=CHROMA_PATH).get_or_create_collection(CHROMA_COLLECTION)
+
+
+def _existing_collection():
+    """The persistent collection if it already exists, else None; never creates the directory or collection."""
+    if not os.path.isdir(CHROMA_PATH):
+        return None
+    try:
+        return chromadb.PersistentClient(path=CHROMA_PATH).get_collection(CHROMA_COLLECTION)
+    except Exception:
+        return None
+
+
+def _existing_ids(collection) -> set:
+    """All document IDs currently in the collection (paged, IDs only)."""
+    ids, offset = set(), 0
+    while True:
+        page = collection.get(include=[], limit=CHROMA_PAGE_SIZE, offset=offset)["ids"]
+        ids.update(page)
+        if len(page) < CHROMA_PAGE_SIZE:
+            return ids
+        offset += len(page)
+
+
+def sync_catalog(document_batches: Iterable[List[Document]], dry_run: bool = False, progress: Optional[IngestionProgress] = None) -> Dict[str, int]:
+    """
+    Incrementally re-indexes the catalog against the Chroma collection.
+    Only new or changed products (new '<sku>:<hash>' IDs) are embedded and upserted;
+    IDs no longer produced by the catalog (removed products and old versions of changed
+    ones) are deleted. With dry_run=True nothing is embedded or written and only the diff
+    is returned: {'added', 'changed', 'unchanged', 'removed'}.
+    Progress (documents built/embedded/deleted) is reported to `progress`; a cancelled
+    job stops between batches, before anything is deleted.
+    """
+    progress = progress or IngestionProgress()
+    # A dry run only reads: a missing collection just means every product would be added
+    collection = _existing_collection() if dry_run else _open_collection()
+    existing = _existing_ids(collection) if collection is not None else set()
+    existing_skus = {_sku_of(doc_id) for doc_id in existing}
+    diff = {"added": 0, "changed": 0, "unchanged": 0, "removed": 0}
+    seen_ids, seen_skus = set(), set()
+    lexical = LexicalIndex()  # Rebuilt from every current product, changed or not
+
+    def _changed_batches() -> Iterator[List[Document]]:
+        for docs in document_batches:
+            progress.checkpoint()
+            progress.add("preprocess", documents=len(docs))
+            fresh = []
+            for doc in docs:
+                doc_id = document_id(doc)
+                if doc_id in seen_ids:
+                    continue
+                seen_ids.add(doc_id)
+                seen_skus.add(doc.metadata["sku"])
+                lexical.add([doc], prior=deal_score)
+                if doc_id in existing:
+                    diff["unchanged"] += 1
+                    continue
+                diff["changed" if doc.metadata["sku"] in existing_skus else "added"] += 1
+                fresh.append(doc)
+            if fresh:
+                yield fresh
+        progress.finish("preprocess")
+
+    if dry_run:
+        for _ in _changed_batches():
+            pass
+    else:
+        embedded = 0
+
+        def _on_progress(done: int, rate: float) -> None:
+            nonlocal embedded
+            progress.add("embed", documents=done - embedded)
+            embedded = done
+            progress.checkpoint()
+
+        print("🔄 Initializing Ollama embeddings...")
+        client = OllamaEmbeddingClient(OLLAMA_URL, EMBEDDING_MODEL, instruction=EMBED_INSTRUCTION)
+        progress.start("embed")
+        try:
+            # Already filtered against the collection, so no per-batch resume lookup is needed
+            embed_and_commit(
+                _changed_batches(), collection, client, id_for=document_id, resume=False,
+                cache=get_embedding_cache(EMBEDDING_MODEL), on_progress=_on_progress
+            )
+        finally:
+            client.close()
+        progress.finish("embed")
+
+    stale = [doc_id for doc_id in existing if doc_id not in seen_ids]
+    diff["removed"] = sum(1 for doc_id in stale if _sku_of(doc_id) not in seen_skus)
+    if not dry_run:
+        progress.checkpoint()
+        for start in range(0, len(stale), CHROMA_PAGE_SIZE):
+            collection.delete(ids=stale[start:start + CHROMA_PAGE_SIZE])
+            progress.add("persist", documents=len(stale[start:start + CHROMA_PAGE_SIZE]))
+        changed = bool(diff["added"] or diff["changed"] or stale)
+        # The indexes are written for the upcoming version before it is published, so a search
+        # never finds the new version without its lexical (or vector) index
+        current = read_collection_version(CHROMA_PATH)
+        lexical.version = new_collection_version() if changed else current
+        with span("ingest.lexical_index"):
+            lexical.finalize().save(CHROMA_PATH)
+        print(f"🔤 Lexical index rebuilt: {len(lexical)} products in {len(lexical.partitions)} region/channel partitions.")
+        if VECTOR_BACKEND == "numpy":
+            with span("ingest.vector_index"):
+                # Keeps the served version's files until the next build; queries use them until the bump
+                counts = build_vector_index(collection, CHROMA_PATH, lexical.version, keep=(current,))
+            print(f"🧮 Memory-mapped vector index built: {sum(counts.values())} vectors in {len(counts)} partitions.")
+        if changed:
+            bump_collection_version(CHROMA_PATH, lexical.version)  # Invalidates cached deal results
+        progress.finish("persist")
+
+    print(
+        f"{'🔍 Dry run' if dry_run else '✅ Catalog sync'}: {diff['added']} added, {diff['changed']} changed, "
+        f"{diff['unchanged']} unchanged, {diff['removed']} removed."
     )
-    
+    return diff
+
+
+def ingest_data_setup(processed_sales_df: pd.DataFrame, documents: List[Document]):
+    """Embeds new/changed documents into ChromaDB, and saves the ML DataFrame (batch by batch)."""
+    print(f"📚 Syncing {len(documents)} documents with ChromaDB...")
+    sync_catalog(documents[start:start + DOC_BATCH_SIZE] for start in range(0, len(documents), DOC_BATCH_SIZE))
+    print("✅ ChromaDB population complete and persisted.")
+
+    # Save the processed sales data (and the product hierarchy) for ML services
+    write_product_hierarchy(pd.DataFrame([doc.metadata for doc in documents]))
+    with staged_sales_store() as staging:
+        for start in range(0, len(processed_sales_df), SALES_CHUNK_ROWS):
+            _write_sales_chunk(processed_sales_df.iloc[start:start + SALES_CHUNK_ROWS], staging)
+    rebuild_series_index()
+    refresh_elasticity_table()  # Background; pricing keeps the previous coefficients meanwhile
+    print(f"💾 Processed sales data saved at {SALES_STORE_PATH}.")
+
+
+def stream_ingestion(path: str, dry_run: bool = False, progress: Optional[IngestionProgress] = None) -> Tuple[int, Dict[str, int]]:
+    """
+    Bounded-memory ingestion: sales are read in chunks and written to a staging copy of the
+    ML store as they are processed, while per-SKU prices are aggregated incrementally; catalog
+    rows are then turned into Documents batch by batch and synced to Chroma (only changes are
+    embedded). The staged store replaces the live one only once the catalog sync has succeeded,
+    so a failed ingestion leaves the previous sales data, catalog and indexes in place together.
+    With dry_run=True no store is written and only the catalog diff is computed.
+    Returns (sales_rows, catalog diff).
+    """
+    progress = progress or IngestionProgress()
+    print("📊 Streaming sales data into the ML store...")
+    summary = SalesSummary()
+
+    def _stream_sales(staging: Optional[str]) -> None:
+        for part, chunk in enumerate(iter_sales_chunks(path)):
+            progress.checkpoint()
+            summary.add(chunk)
+            progress.add("preprocess", rows=len(chunk))
+            if staging is not None:
+                with span("ingest.sales_chunk"):
+                    _write_sales_chunk(chunk, staging)
+                progress.add("persist", rows=len(chunk))
+            print(f"   ↳ sales chunk {part}: {summary.rows} rows so far")
+
+    if dry_run:
+        _stream_sales(None)
+        with span("ingest.sync_catalog"):
+            diff = sync_catalog(iter_document_batches(path, summary), dry_run=True, progress=progress)
+        return summary.rows, diff
+
+    # New partitions go to a staging directory that is discarded if anything below fails
+    with staged_sales_store() as staging:
+        _stream_sales(staging)
+        with span("ingest.sync_catalog"):
+            diff = sync_catalog(iter_document_batches(path, summary), progress=progress)
     print("✅ ChromaDB population complete and persisted.")
+    print(f"💾 {summary.rows} sales records saved at {SALES_STORE_PATH}.")
+    print(f"🗂️  Product hierarchy saved for {_write_product_hierarchy(path)} SKUs.")
+    with span("ingest.series_index"):
+        rebuild_series_index()
+    refresh_elasticity_table()  # Background; pricing keeps the previous coefficients meanwhile
 
-    # Save the processed sales data for ML services
-    os.makedirs(os.path.dirname(PROCESSED_DATA_PATH), exist_ok=True)
-    processed_sales_df.to_pickle(PROCESSED_DATA_PATH)
-    print(f"💾 Processed sales data saved at {PROCESSED_DATA_PATH}.")
+    return summary.rows, diff
 
 
-def run_full_ingestion() -> str:
+def run_full_ingestion(dry_run: bool = False, progress: Optional[IngestionProgress] = None) -> str:
     """
     Orchestrates the entire ingestion process.
-    This is the main entry point called by the FastAPI endpoint.
+    This is the main entry point, run as a background job by the FastAPI endpoint.
+    With dry_run=True it only reports which products would be added, changed or removed.
+    Cancellation of the job surfaces as JobCancelled.
     """
+    progress = progress or IngestionProgress()
     try:
         print("="*60)
         print("🚀 Starting Full Data Ingestion Pipeline")
         print("="*60)
         
         # Step 1: Download
-        download_kaggle_dataset(DATASET_ID, DOWNLOAD_PATH)
-        
-        # Step 2: Preprocess
-        processed_sales_df, documents = preprocess_data(DOWNLOAD_PATH)
+        progress.start("download")
+        with span("ingest.download"):
+            download_kaggle_dataset(DATASET_ID, DOWNLOAD_PATH)
+        progress.finish("download")
+        progress.checkpoint()
         
-        # Step 3: Ingest to ChromaDB and save ML data
-        ingest_data_setup(processed_sales_df, documents)
+        # Step 2 + 3: Preprocess and load ChromaDB / ML data, streaming chunk by chunk
+        sales_rows, diff = stream_ingestion(DOWNLOAD_PATH, dry_run=dry_run, progress=progress)
         
+        if dry_run:
+            success_msg = (
+                f"🔍 Dry run complete (nothing written).\n"
+                f"   - {diff['added']} products would be added, {diff['changed']} changed, "
+                f"{diff['removed']} removed, {diff['unchanged']} unchanged\n"
+                f"   - {sales_rows} sales records read"
+            )
+            print(success_msg)
+            return success_msg
+
         success_msg = (
             f"✅ Data ingestion successful!\n"
-            f"   - {len(documents)} products indexed in ChromaDB\n"
-            f"   - {len(processed_sales_df)} sales records saved for ML\n"
+            f"   - {diff['added'] + diff['changed']} products embedded into ChromaDB "
+            f"({diff['unchanged']} unchanged, {diff['removed']} removed)\n"
+            f"   - {sales_rows} sales records saved for ML\n"
             f"   - ChromaDB location: {CHROMA_PATH}\n"
-            f"   - ML data location: {PROCESSED_DATA_PATH}"
+            f"   - ML data location: {SALES_STORE_PATH}"
         )
         print("="*60)
         print(success_msg)
         print("="*60)
+
+        # Step 4: Recompute forecasts of the series whose sales changed (background, incremental)
+        from app.services.forecast_materializer import MATERIALIZE_AFTER_INGEST, forecast_materializer
+        if MATERIALIZE_AFTER_INGEST:
+            forecast_materializer.trigger("ingestion")
         return success_msg
         
+    except JobCancelled:
+        print("🛑 Ingestion cancelled.")
+        raise
     except Exception as e:
         error_msg = f"❌ Ingestion Failed: {str(e)}"
         print(error_msg, file=sys.stderr)
@@ -188,5 +476,14 @@ def run_full_ingestion() -> str:
 
 # Optional: Allow running this script directly for testing
 if __name__ == "__main__":
-    result = run_full_ingestion()
-    print(result)
\ No newline at end of file
+    from app.services.ingestion_jobs import IngestionConflict, lock_collection
+    try:
+        # Same lock as the API jobs, so a CLI run never overlaps one
+        lock = lock_collection(f"{CHROMA_PATH}/{CHROMA_COLLECTION}", f"cli-{os.getpid()}")
+    except IngestionConflict as e:
+        sys.exit(f"❌ {e}")
+    with lock:
+        result = run_full_ingestion()
+    print(result)
+    from app.services.forecast_materializer import forecast_materializer
+    forecast_materializer.wait()  # The run is on a daemon thread; let it finish before exiting
\ No newline at end of file
@@ -0,0 +1,148 @@
+# app/embedding_pipeline.py
+import os
+import random
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import TYPE_CHECKING, Callable, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from app.services.telemetry import span
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# --- CONFIGURATION ---
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", "64"))  # Texts per Ollama request
+EMBED_CONCURRENCY = int(os.getenv("EMBED_CONCURRENCY", "4"))  # Requests in flight at once
+EMBED_MAX_RETRIES = int(os.getenv("EMBED_MAX_RETRIES", "5"))
+EMBED_BACKOFF_SECONDS = float(os.getenv("EMBED_BACKOFF_SECONDS", "0.5"))  # Doubles on every retry
+EMBED_TIMEOUT_SECONDS = float(os.getenv("EMBED_TIMEOUT_SECONDS", "120"))
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class OllamaEmbeddingClient:
+    """
+    Minimal Ollama embedding client over a pooled keep-alive HTTP session.
+    Uses the batch /api/embed endpoint and falls back to per-text /api/embeddings on
+    older Ollama servers. Transient failures are retried with exponential backoff.
+    """
+
+    def __init__(self, base_url: str, model: str, pool_size: int = EMBED_CONCURRENCY, instruction: str = ""):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.instruction = instruction  # Prefix added to every text (e.g. "passage: ")
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, pool_size))
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._legacy_api = False
+
+    def _post(self, route: str, payload: dict) -> dict:
+        for attempt in range(EMBED_MAX_RETRIES + 1):
+            try:
+                response = self.session.post(f"{self.base_url}{route}", json=payload, timeout=EMBED_TIMEOUT_SECONDS)
+                if response.status_code not in RETRYABLE_STATUS:
+                    response.raise_for_status()
+                    return response.json()
+                error = requests.HTTPError(f"{response.status_code} from Ollama {route}", response=response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+            if attempt == EMBED_MAX_RETRIES:
+                raise ConnectionError(f"Ollama embedding request failed after {attempt + 1} attempts: {error}")
+            # Exponential backoff with jitter so parallel workers do not retry in lockstep
+            time.sleep(EMBED_BACKOFF_SECONDS * (2 ** attempt) * (0.5 + random.random()))
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embeds a batch of texts, preserving order."""
+        texts = [f"{self.instruction}{text}" for text in texts]
+        if not self._legacy_api:
+            try:
+                return self._post("/api/embed", {"model": self.model, "input": texts})["embeddings"]
+            except requests.HTTPError as e:
+                if e.response is None or e.response.status_code != 404:
+                    raise
+                self._legacy_api = True  # Server predates /api/embed
+        return [self._post("/api/embeddings", {"model": self.model, "prompt": text})["embedding"] for text in texts]
+
+    def close(self) -> None:
+        self.session.close()
+
+
+def embed_and_commit(
+    document_batches: Iterable[List["Document"]],
+    collection,
+    client: OllamaEmbeddingClient,
+    id_for: Callable[["Document"], str],
+    concurrency: int = EMBED_CONCURRENCY,
+    batch_size: int = EMBED_BATCH_SIZE,
+    resume: bool = True,
+    cache=None,
+    on_progress: Optional[Callable[[int, float], None]] = None,
+) -> int:
+    """
+    Embeds documents in fixed-size batches with bounded concurrency and commits each
+    batch to the Chroma collection as soon as its embeddings arrive.
+
+    With resume=True, documents whose IDs are already in the collection are skipped,
+    so re-running after an interruption only embeds what is missing. An EmbeddingCache,
+    if given, serves texts that were embedded before (by any run or by the API).
+    Returns the number of documents embedded in this run.
+    """
+    started = time.time()
+    done = 0
+    skipped = 0
+    commit_lock = threading.Lock()
+
+    def _sub_batches():
+        nonlocal skipped
+        for docs in document_batches:
+            # De-duplicate IDs inside the batch (Chroma rejects repeated IDs in one upsert)
+            by_id = {id_for(doc): doc for doc in docs}
+            if resume and by_id:
+                existing = set(collection.get(ids=list(by_id), include=[])["ids"])
+                skipped += len(existing)
+                by_id = {i: d for i, d in by_id.items() if i not in existing}
+            items = list(by_id.items())
+            for start in range(0, len(items), batch_size):
+                yield items[start:start + batch_size]
+
+    def _embed_and_upsert(items) -> int:
+        ids = [i for i, _ in items]
+        docs = [d for _, d in items]
+        texts = [d.page_content for d in docs]
+        with span("ingest.embed_batch"):
+            embeddings = cache.embed_with(texts, client.embed, kind="document") if cache is not None else client.embed(texts)
+        with commit_lock, span("ingest.upsert_batch"):
+            collection.upsert(
+                ids=ids,
+                embeddings=embeddings,
+                metadatas=[d.metadata for d in docs],
+                documents=[d.page_content for d in docs],
+            )
+        return len(ids)
+
+    pending = _sub_batches()
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        in_flight = set()
+        while True:
+            while len(in_flight) < concurrency * 2:
+                items = next(pending, None)
+                if items is None:
+                    break
+                in_flight.add(pool.submit(_embed_and_upsert, items))
+            if not in_flight:
+                break
+            finished, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                done += future.result()  # A batch that exhausted its retries aborts the run; committed batches stay
+            rate = done / max(time.time() - started, 1e-9)
+            print(f"   ↳ {done} documents embedded ({rate:.1f} docs/sec, {skipped} already indexed)")
+            if on_progress is not None:
+                on_progress(done, rate)
+
+    elapsed = time.time() - started
+    print(f"✅ Embedded {done} documents in {elapsed:.1f}s ({done / max(elapsed, 1e-9):.1f} docs/sec); {skipped} were already indexed.")
+    return done
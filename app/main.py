@@ -1,5 +1,11 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+import asyncio
 import sys
+import threading
+import time
+from app.services import telemetry
+from app.services.startup import WARMUP_BLOCKING, run_startup, startup_state
 
 # 1. Define the 'app' variable immediately.
 app = FastAPI(
@@ -9,15 +15,28 @@ app = FastAPI(
 )
 
 # 2. Use a try/except Exception block to catch ALL import errors
+_routers_import_started = time.perf_counter()
 try:
     # These imports are now safe because 'app' is already defined.
+    # Routers only import light service modules; prophet, langchain, chromadb and the
+    # sales data are loaded on first use (or by the warm-up stage, see app/services/startup.py).
     from app.routers import deals, forecast, pricing
-    from app.data_ingestion import run_full_ingestion 
+    from app.services.compute_scheduler import compute, ComputeRejected
+
+    @app.exception_handler(ComputeRejected)
+    async def compute_rejected_handler(request: Request, exc: ComputeRejected):
+        # 429 = queue full, 503 = timed out; both tell the client when to come back
+        return JSONResponse(
+            status_code=exc.status_code,
+            content={"detail": exc.detail},
+            headers={"Retry-After": str(exc.retry_after)},
+        )
 
     # --- Routers ---
     app.include_router(deals.router, prefix="/deals", tags=["RAG Deals"])
     app.include_router(forecast.router, prefix="/forecast", tags=["Demand Forecasting"])
     app.include_router(pricing.router, prefix="/pricing", tags=["Dynamic Pricing"])
+    startup_state.record_import("routers", time.perf_counter() - _routers_import_started)
     print("INFO:     All routers loaded successfully.")
 
 except Exception as e:
@@ -36,29 +55,153 @@ except Exception as e:
             detail=f"Server startup failed. Check console logs for: {e}"
         )
 
+# --- Request Timing (defined outside the try block) ---
+@app.middleware("http")
+async def record_request_timing(request: Request, call_next):
+    """Per-route latency histograms; X-Debug-Timing: 1 returns the stage breakdown as Server-Timing."""
+    token = telemetry.start_trace()
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        # Label by route template (/ingest/jobs/{job_id}), never the raw path, to keep cardinality bounded
+        route = telemetry.route_template(request.url.path, request.scope.get("path_params")) if "route" in request.scope else "unmatched"
+        telemetry.observe_request(request.method, route, status, elapsed)
+        trace = telemetry.request_trace()
+        telemetry.end_trace(token)
+    if telemetry.DEBUG_TIMING_HEADER and request.headers.get("x-debug-timing") == "1":
+        # Streaming bodies are still running here, so only stages finished before the first byte appear
+        stages = telemetry.server_timing_header(trace)
+        response.headers["Server-Timing"] = f"{stages + ', ' if stages else ''}total;dur={elapsed * 1000:.2f}"
+    return response
+
 # --- Health Check (defined outside the try block) ---
 @app.get("/health", summary="Health Check", tags=["System"])
 def health_check():
-    """Confirms the API is running."""
+    """Confirms the API is running (liveness; answers while warm-up is still in progress)."""
     return {"status": "ok", "message": "Assistant is operational."}
 
-# --- Ingestion Endpoint (defined outside the try block) ---
-# This endpoint will only work if the imports in the 'try' block succeeded.
-@app.post("/ingest/products", summary="Ingest Data from Kaggle to ChromaDB", tags=["System"])
-def ingest_data():
-    """Triggers the download, preprocessing, and loading of Kaggle data into the system."""
+@app.get("/ready", summary="Readiness Check", tags=["System"])
+def readiness_check():
+    """
+    200 once the configured warm-up components (WARMUP_COMPONENTS) are initialized, 503 before.
+    The body lists per-subsystem import times (STARTUP_PROFILE=1), per-component warm-up status,
+    and the state of forecast materialization (its last error does not affect readiness).
+    """
+    report = startup_state.to_dict()
+    try:
+        from app.services.forecast_materializer import forecast_materializer
+        report["forecast_materialization"] = forecast_materializer.health()
+    except Exception as e:
+        report["forecast_materialization"] = {"last_error": f"unavailable: {e}"}
+    return JSONResponse(status_code=200 if startup_state.ready else 503, content=report)
+
+@app.get("/embeddings/cache/stats", summary="Embedding Cache Statistics", tags=["System"])
+def embedding_cache_stats():
+    """Hit/miss counters of the shared query/document embedding cache."""
+    from app.services.rag_service import get_embedding_cache_stats
+    return get_embedding_cache_stats()
+
+@app.get("/deals/cache/stats", summary="Deal Result Cache Statistics", tags=["System"])
+def deal_cache_stats():
+    """Hit, miss and coalesced-request counters of the search_deals response cache."""
+    from app.services.rag_service import get_deal_cache_stats
+    return get_deal_cache_stats()
+
+@app.get("/deals/retrieval/stats", summary="Deal Retrieval Statistics", tags=["System"])
+def deal_retrieval_stats():
+    """How many deal queries were answered by the lexical index alone, hybrid, or vector search only."""
+    from app.services.rag_service import get_retrieval_stats
+    return get_retrieval_stats()
+
+@app.get("/compute/stats", summary="Compute Scheduler Statistics", tags=["System"])
+def compute_stats():
+    """Queue depth, running tasks, wait times and rejections per workload class (forecast, pricing, rag)."""
+    from app.services.compute_scheduler import compute
+    return compute.stats()
+
+@app.get("/metrics", summary="Prometheus Metrics", tags=["System"], response_class=PlainTextResponse)
+def metrics():
+    """Stage and per-route HTTP latency histograms plus compute queue gauges, in Prometheus text format."""
+    gauges = {}
     try:
-        # This function must be defined and imported in the 'try' block above
-        message = run_full_ingestion()
-        if "Failed" in message:
-            raise HTTPException(status_code=500, detail=message)
-        return {"status": "success", "message": message}
-    except NameError:
-        raise HTTPException(status_code=500, detail="Server failed to start: 'run_full_ingestion' not loaded. Check console logs.")
+        from app.services.compute_scheduler import compute
+        report = compute.stats()
+        gauges["compute_queue_depth"] = [({"workload": name}, s["queue_depth"]) for name, s in report.items()]
+        gauges["compute_running"] = [({"workload": name}, s["running"]) for name, s in report.items()]
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Ingestion failed: {e}")
+        print(f"Metrics: compute scheduler unavailable: {e}")
+    return PlainTextResponse(telemetry.render_prometheus(gauges), media_type="text/plain; version=0.0.4")
+
+# --- Ingestion Endpoints (defined outside the try block) ---
+# These endpoints will only work if the imports in the 'try' block succeeded.
+@app.post("/ingest/products", status_code=202, summary="Start Ingestion from Kaggle to ChromaDB", tags=["System"])
+def ingest_data(dry_run: bool = False):
+    """
+    Starts the download, preprocessing, and loading of Kaggle data as a background job
+    and returns its job_id immediately; poll /ingest/jobs/{job_id} for progress.
+    Only new or changed products are re-embedded; dry_run=true reports the diff without writing.
+    Returns 409 while another ingestion of the same collection is active.
+    """
+    from app.services.ingestion_jobs import ingestion_jobs, IngestionConflict
+    try:
+        # Imported on first use: the pipeline pulls in chromadb and langchain
+        from app.data_ingestion import run_full_ingestion as ingest, CHROMA_PATH, CHROMA_COLLECTION
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ingestion pipeline failed to load: {e}. Check console logs.")
+    try:
+        job = ingestion_jobs.submit(
+            f"{CHROMA_PATH}/{CHROMA_COLLECTION}", lambda progress: ingest(dry_run=dry_run, progress=progress), dry_run=dry_run
+        )
+    except IngestionConflict as e:
+        raise HTTPException(status_code=409, detail={"message": str(e), "job_id": e.job_id})
+    return {"job_id": job.job_id, "status": job.status, "status_url": f"/ingest/jobs/{job.job_id}"}
+
+@app.get("/ingest/jobs", summary="List Ingestion Jobs", tags=["System"])
+def list_ingestion_jobs():
+    """Active and recently finished ingestion jobs, newest first."""
+    from app.services.ingestion_jobs import ingestion_jobs
+    return [job.to_dict() for job in ingestion_jobs.list()]
+
+@app.get("/ingest/jobs/{job_id}", summary="Ingestion Job Status", tags=["System"])
+def get_ingestion_job(job_id: str):
+    """Status, final message and per-stage progress (rows, documents, throughput) of a job."""
+    from app.services.ingestion_jobs import ingestion_jobs
+    job = ingestion_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job {job_id}.")
+    return job.to_dict()
+
+@app.post("/ingest/jobs/{job_id}/cancel", summary="Cancel Ingestion Job", tags=["System"])
+def cancel_ingestion_job(job_id: str):
+    """Stops the job at its next chunk/batch boundary; already committed batches are kept."""
+    from app.services.ingestion_jobs import ingestion_jobs
+    job = ingestion_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown ingestion job {job_id}.")
+    return job.to_dict()
 
 # --- Startup Event ---
 @app.on_event("startup")
 async def startup_event():
-    print("FastAPI startup complete. Ensure Ollama is running.")
\ No newline at end of file
+    if WARMUP_BLOCKING:
+        # Uvicorn starts accepting connections only after this returns
+        await asyncio.to_thread(run_startup)
+    else:
+        threading.Thread(target=run_startup, name="startup-warmup", daemon=True).start()
+    try:
+        from app.services.forecast_materializer import MATERIALIZE_INTERVAL_SECONDS, forecast_materializer
+        forecast_materializer.start_schedule(MATERIALIZE_INTERVAL_SECONDS)
+    except Exception as e:
+        print(f"Forecast materialization schedule not started: {e}")
+    print("FastAPI startup complete. Ensure Ollama is running.")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from app.services.compute_scheduler import compute
+    from app.services.forecast_service import shutdown_process_pool
+    compute.shutdown()
+    shutdown_process_pool()
\ No newline at end of file
@@ -0,0 +1,70 @@
+# app/routers/deals.py
+import json
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import StreamingResponse
+from app.schemas import DealResponse
+from app.services.rag_service import search_deals, stream_deals
+from app.services.compute_scheduler import compute, ComputeRejected
+
+router = APIRouter()
+
+
+@router.get(
+    "/search",
+    response_model=DealResponse,
+    summary="Find Best Deals (RAG + LLM)",
+)
+async def get_deals(
+    query: str,
+    region: str,
+    channel: str,
+    top_k: int = Query(5, ge=1, le=50),
+    fast: bool = False
+):
+    """
+    Retrieves the best matching products for a natural-language query and returns them
+    ranked with a short reason each. fast=true skips the LLM and uses template reasons.
+    """
+    return await compute.run("rag", search_deals, query, region, channel, top_k, fast)
+
+
+@router.get(
+    "/search/stream",
+    summary="Find Best Deals, streamed as Server-Sent Events",
+)
+async def stream_deals_sse(
+    request: Request,
+    query: str,
+    region: str,
+    channel: str,
+    top_k: int = Query(5, ge=1, le=50),
+    fast: bool = False
+):
+    """
+    Same search as /search, delivered incrementally:
+    'candidates' (ranked products, immediately after retrieval), one 'deal' per LLM reason
+    as soon as it is generated, then 'explanation' and a final 'done' with the full response.
+    Disconnecting stops the LLM generation.
+    """
+
+    async def events():
+        deal_events = stream_deals(query, region, channel, top_k, fast)
+        try:
+            async for event, payload in deal_events:
+                if await request.is_disconnected():
+                    break
+                yield f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+        except ComputeRejected as e:
+            # Headers are already sent, so saturation is reported in-band
+            yield f"event: error\ndata: {json.dumps({'detail': e.detail, 'status_code': e.status_code, 'retry_after': e.retry_after})}\n\n"
+        except Exception as e:
+            print(f"Deal Streaming Error: {e}")
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            await deal_events.aclose()
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,28 +1,193 @@
 # app/routers/forecast.py
-from fastapi import APIRouter
-from app.schemas import ForecastRequest, ForecastResponse
-from app.services.forecast_service import generate_forecast
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from app.schemas import ForecastRequest, ForecastResponse, BatchForecastRequest, BatchForecastItem, HierarchicalForecastRequest, HierarchicalForecastResponse
+from app.services.forecast_service import (
+    HIERARCHY_LEVELS, RECONCILIATION_METHODS, generate_forecast_with_engine, generate_forecast_batch,
+    generate_forecast_hierarchical, select_series, get_model_cache_stats
+)
+from app.services.forecast_engines import ENGINES
+from app.services.forecast_materializer import (
+    FORECAST_ON_DEMAND_FALLBACK, FORECAST_SERVE_MATERIALIZED, forecast_materializer, freshness_headers, get_materialized_forecast
+)
+from app.services.compute_scheduler import compute
+from app.services.response_formats import (
+    FORECAST_ARROW_SCHEMA, arrow_response, check_response_format, chunked, compact_forecast, compact_response, encode_compact,
+    forecast_record_batch
+)
 
 router = APIRouter()
 
+
+def _check_engine(engine: Optional[str]) -> None:
+    if engine is not None and engine != "auto" and engine not in ENGINES:
+        raise HTTPException(status_code=400, detail=f"Unknown forecast engine '{engine}'. Choose one of: {', '.join(ENGINES)} or 'auto'.")
+
 @router.get(
     "/forecast",
     response_model=ForecastResponse,
-    summary="Generate Demand Forecast Series (Prophet)",
+    summary="Demand Forecast Series (precomputed, or Prophet / a vectorized engine on demand)",
 )
 async def get_forecast(
+    response: Response,
     sku: str, 
     region: str, 
     channel: str, 
-    horizon: str = '8w'
+    horizon: str = '8w',
+    engine: Optional[str] = None,
+    fallback: Optional[bool] = None,
+    response_format: str = Query("json", alias="format")
 ):
-    """Generates the next N periods demand forecast and confidence intervals for a specific SKU-Region-Channel combination."""
-    
-    forecast_data = generate_forecast(sku, region, channel, horizon)
+    """
+    Generates the next N periods demand forecast and confidence intervals for a specific SKU-Region-Channel combination.
+    engine: 'prophet', 'holt_winters', 'ets', 'seasonal_naive', or 'auto' (Prophet for high-volume series only);
+    the server's FORECAST_ENGINE policy applies when omitted.
+    Served from the materialized store when it holds the series (X-Forecast-Source, X-Forecast-Generated-At
+    and Age headers say so); otherwise forecast on demand unless fallback=false, which returns 404 instead.
+    format: 'json' (default), 'compact' (parallel arrays via orjson) or 'arrow' (Arrow IPC stream).
+    """
+    _check_engine(engine)
+    check_response_format(response_format)
+
+    materialized = None
+    if FORECAST_SERVE_MATERIALIZED:
+        # The lookup may reload the store file and hash series history: keep it off the event loop
+        materialized = await asyncio.to_thread(get_materialized_forecast, sku, region, channel, horizon, engine)
+    if materialized is not None:
+        forecast_data, entry = materialized
+        engine_used = entry.engine
+    else:
+        entry = None
+        if not (FORECAST_ON_DEMAND_FALLBACK if fallback is None else fallback):
+            raise HTTPException(status_code=404, detail="No materialized forecast for this series and horizon.")
+        # Prophet is blocking; run it on the forecast workers so the event loop stays free
+        forecast_data, engine_used = await compute.run("forecast", generate_forecast_with_engine, sku, region, channel, horizon, engine)
+    headers = freshness_headers(entry)
+    item = {'sku': sku, 'region': region, 'channel': channel, 'forecast_series': forecast_data, 'engine': engine_used}
+    if response_format == "compact":
+        return compact_response(compact_forecast(item), headers)
+    if response_format == "arrow":
+        return arrow_response(FORECAST_ARROW_SCHEMA, [forecast_record_batch([{**item, 'horizon': horizon, 'status': 'ok'}])], headers)
+    response.headers.update(headers)
     
     return ForecastResponse(
         sku=sku,
         region=region,
         channel=channel,
-        forecast_series=forecast_data
-    )
\ No newline at end of file
+        forecast_series=forecast_data,
+        engine=engine_used
+    )
+
+
+@router.post(
+    "/batch",
+    summary="Batch Demand Forecasts (parallel Prophet fits or vectorized passes, streamed as NDJSON)",
+)
+async def get_forecast_batch(request: BatchForecastRequest, response_format: str = Query("json", alias="format")):
+    """
+    Forecasts many SKU-Region-Channel series in parallel across worker processes.
+    Results are streamed back one JSON line per series as each fit completes;
+    failed series are reported with status 'error' without aborting the batch.
+    Admitted like /forecast: 429/503 when the forecast workers are saturated.
+    format=compact streams the same lines with columnar forecast_series (orjson);
+    format=arrow streams an Arrow IPC stream with one row per series instead.
+    """
+    if request.series is None and request.filter is None:
+        raise HTTPException(status_code=400, detail="Provide either 'series' or 'filter'.")
+    _check_engine(request.engine)
+    check_response_format(response_format)
+
+    series = [(s.sku, s.region, s.channel, s.horizon) for s in request.series or []]
+    if request.filter is not None:
+        keys = select_series(request.filter.sku, request.filter.region, request.filter.channel)
+        series.extend((sku, region, channel, request.horizon) for sku, region, channel in keys)
+
+    # Holds one forecast slot for the whole stream; the items are produced on the forecast workers.
+    # The background task frees it even if the body never starts (client gone before the first chunk)
+    items = await compute.stream("forecast", generate_forecast_batch, series, max_workers=request.max_workers, engine=request.engine)
+    release = BackgroundTask(items.aclose)
+    if response_format == "arrow":
+        return arrow_response(FORECAST_ARROW_SCHEMA, (forecast_record_batch(chunk) async for chunk in chunked(items)), background=release)
+
+    async def stream():
+        async for item in items:
+            if response_format == "compact":
+                yield encode_compact(compact_forecast(item)) + b"\n"
+            else:
+                yield BatchForecastItem(**item).model_dump_json() + "\n"
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson", background=release)
+
+
+
+@router.post(
+    "/hierarchical",
+    response_model=HierarchicalForecastResponse,
+    summary="Hierarchical Demand Forecasts (aggregate fits disaggregated to SKUs)",
+)
+async def get_forecast_hierarchical(request: HierarchicalForecastRequest, response_format: str = Query("json", alias="format")):
+    """
+    Forecasts SKU series through their dept/class-by-region aggregates: one model per aggregate
+    instead of one per SKU-Region-Channel series, split to SKUs by historical shares (top_down),
+    or reconciled with per-SKU vectorized base forecasts (bottom_up, mint).
+    format=compact returns every forecast_series as parallel arrays (orjson).
+    """
+    if request.series is None and request.filter is None:
+        raise HTTPException(status_code=400, detail="Provide either 'series' or 'filter'.")
+    if request.level not in HIERARCHY_LEVELS:
+        raise HTTPException(status_code=400, detail=f"Unknown level '{request.level}'. Choose one of: {', '.join(HIERARCHY_LEVELS)}.")
+    if request.reconciliation not in RECONCILIATION_METHODS:
+        raise HTTPException(status_code=400, detail=f"Unknown reconciliation '{request.reconciliation}'. Choose one of: {', '.join(RECONCILIATION_METHODS)}.")
+    _check_engine(request.engine)
+    check_response_format(response_format, ("json", "compact"))
+
+    series = [(s.sku, s.region, s.channel) for s in request.series or []]
+    if request.filter is not None:
+        series.extend(select_series(request.filter.sku, request.filter.region, request.filter.channel))
+
+    result = await compute.run(
+        "forecast", generate_forecast_hierarchical, series, request.horizon, request.level, request.reconciliation, request.engine
+    )
+    if response_format == "compact":
+        return compact_response({
+            **result,
+            'groups': [compact_forecast(group) for group in result['groups']],
+            'forecasts': [compact_forecast(forecast) for forecast in result['forecasts']],
+        })
+    return result
+
+
+@router.post(
+    "/materialize",
+    status_code=202,
+    summary="Start a Forecast Materialization Run",
+)
+def start_materialization(full: bool = False):
+    """
+    Precomputes forecasts in the background: only series whose sales data changed since their
+    last generation are recomputed (full=true recomputes all). A request arriving during a run
+    queues one follow-up run.
+    """
+    started = forecast_materializer.trigger("api", full=full)
+    return {"started": started, "queued": not started, "status_url": "/forecast/materialize/status"}
+
+
+@router.get(
+    "/materialize/status",
+    summary="Forecast Materialization Status",
+)
+def get_materialization_status():
+    """Whether a run is in progress, the last run's report, and lookup counters of the materialized store."""
+    return forecast_materializer.status()
+
+
+@router.get(
+    "/cache/stats",
+    summary="Fitted-Model Cache Statistics",
+)
+def get_forecast_cache_stats():
+    """Reports hits, misses and warm-start refits of the Prophet model store for this worker."""
+    return get_model_cache_stats()
@@ -1,7 +1,11 @@
 # app/routers/pricing.py
-from fastapi import APIRouter
-from app.schemas import PricingRecommendationRequest, PricingRecommendationResponse
-from app.services.pricing_service import recommend_price
+from fastapi import APIRouter, Query
+from app.schemas import PricingRecommendationRequest, PricingRecommendationResponse, BatchPricingRequest, BatchPricingResponse
+from app.services.pricing_service import recommend_price, recommend_prices_batch
+from app.services.compute_scheduler import compute
+from app.services.response_formats import (
+    PRICING_ARROW_SCHEMA, arrow_response, check_response_format, compact_response, pricing_record_batch, record_columns
+)
 
 router = APIRouter()
 
@@ -10,12 +14,38 @@ router = APIRouter()
     response_model=PricingRecommendationResponse,
     summary="Recommend Profit-Maximizing Price",
 )
-async def recommend_pricing(request: PricingRecommendationRequest):
+async def recommend_pricing(request: PricingRecommendationRequest, response_format: str = Query("json", alias="format")):
     """
     Estimates price elasticity of demand and recommends the profit-maximizing price 
     subject to margin and competitor constraints.
+    format: 'json' (default), 'compact' (orjson, no response model validation) or 'arrow' (Arrow IPC stream).
     """
+    check_response_format(response_format)
     
-    recommendation = recommend_price(request)
+    recommendation = await compute.run("pricing", recommend_price, request)
+    if response_format == "compact":
+        return compact_response(recommendation.model_dump())
+    if response_format == "arrow":
+        return arrow_response(PRICING_ARROW_SCHEMA, [pricing_record_batch([recommendation.model_dump()])])
     
-    return recommendation
\ No newline at end of file
+    return recommendation
+
+
+@router.post(
+    "/recommend/batch",
+    response_model=BatchPricingResponse,
+    summary="Recommend Profit-Maximizing Prices for a Portfolio",
+)
+async def recommend_pricing_batch(request: BatchPricingRequest, response_format: str = Query("json", alias="format")):
+    """
+    Bulk variant of /recommend for catalog-wide repricing. Constraints and profit
+    estimates are computed as array operations; results keep the request order.
+    format=compact returns `results` as one array per field (orjson); format=arrow one row per result.
+    """
+    check_response_format(response_format)
+    results = await compute.run("pricing", recommend_prices_batch, request.requests)
+    if response_format == "compact":
+        return compact_response({"results": record_columns([r.model_dump() for r in results], PRICING_ARROW_SCHEMA.names)})
+    if response_format == "arrow":
+        return arrow_response(PRICING_ARROW_SCHEMA, [pricing_record_batch([r.model_dump() for r in results])])
+    return BatchPricingResponse(results=results)
@@ -1,7 +1,29 @@
 # app/schemas.py
-from pydantic import BaseModel, Field
+import re
+import pandas as pd
+from pydantic import BaseModel, Field, field_validator
 from typing import List, Optional
 
+# Weeks or days ('8w', '14d'): parsed here, since pandas deprecates the lowercase units
+_HORIZON = re.compile(r"^\s*(\d+)\s*([wd])\s*$", re.IGNORECASE)
+
+
+def horizon_days(horizon: str) -> int:
+    """Whole days in a forecast horizon such as '8w', '2W' or '14d'. ValueError if it cannot be parsed."""
+    match = _HORIZON.match(str(horizon))
+    if match:
+        return int(match.group(1)) * (7 if match.group(2).lower() == "w" else 1)
+    return pd.to_timedelta(horizon).days  # Any other timedelta string pandas understands
+
+
+def _valid_horizon(horizon: str) -> str:
+    """Rejects horizons pandas cannot parse (e.g. '8x') before any forecasting starts."""
+    try:
+        horizon_days(horizon)
+    except ValueError as e:
+        raise ValueError(f"Invalid horizon '{horizon}': {e}")
+    return horizon
+
 # --- RAG Search + Best Deals Schemas ---
 class DealItem(BaseModel):
     sku: str = Field(..., description="Unique product SKU.")
@@ -16,6 +38,14 @@ class DealResponse(BaseModel):
     deals: List[DealItem] = Field(..., description="The ranked list of best deals.")
     explanation: str = Field(..., description="A general summary/friendly explanation of the top deals provided by the LLM.")
 
+class DealReason(BaseModel):
+    sku: str = Field(..., description="SKU of the product, exactly as given in the context.")
+    reason: str = Field(..., description="A friendly, short sentence explaining why this is a good deal.")
+
+class DealNarration(BaseModel):
+    reasons: List[DealReason] = Field(..., description="One reason per ranked product, in the given order.")
+    explanation: str = Field(..., description="A short paragraph summarizing why these deals stand out overall.")
+
 
 # --- Demand Forecasting Schemas ---
 class ForecastPoint(BaseModel):
@@ -30,11 +60,63 @@ class ForecastRequest(BaseModel):
     channel: str
     horizon: str = Field("8w", description="Forecast horizon (e.g., '4w', '8w', '60d').")
 
+    _check_horizon = field_validator("horizon")(_valid_horizon)
+
 class ForecastResponse(BaseModel):
     sku: str
     region: str
     channel: str
     forecast_series: List[ForecastPoint]
+    engine: Optional[str] = Field(None, description="Forecast engine that produced the series ('prophet', 'holt_winters', ...).")
+
+class BatchForecastFilter(BaseModel):
+    sku: Optional[str] = Field(None, description="Only series for this SKU (all SKUs if None).")
+    region: Optional[str] = Field(None, description="Only series in this region (all regions if None).")
+    channel: Optional[str] = Field(None, description="Only series in this channel (all channels if None).")
+
+class BatchForecastRequest(BaseModel):
+    series: Optional[List[ForecastRequest]] = Field(None, description="Explicit list of series to forecast.")
+    filter: Optional[BatchForecastFilter] = Field(None, description="Select series from sales history instead of listing them.")
+    horizon: str = Field("8w", description="Horizon applied to series selected via 'filter'.")
+    max_workers: Optional[int] = Field(None, ge=1, description="Worker processes of the shared pool this batch may use (capped at the server's FORECAST_MAX_WORKERS; all of them if None).")
+    engine: Optional[str] = Field(None, description="Forecast engine for every series: 'prophet', 'holt_winters', 'ets', 'seasonal_naive' or 'auto' (server default if None).")
+
+    _check_horizon = field_validator("horizon")(_valid_horizon)
+
+class BatchForecastItem(BaseModel):
+    sku: str
+    region: str
+    channel: str
+    horizon: str
+    engine: Optional[str] = Field(None, description="Forecast engine used for this series.")
+    status: str = Field(..., description="'ok' or 'error'.")
+    forecast_series: List[ForecastPoint] = Field(default_factory=list)
+    error: Optional[str] = Field(None, description="Failure reason when status is 'error'.")
+
+class HierarchicalForecastRequest(BaseModel):
+    series: Optional[List[ForecastRequest]] = Field(None, description="Explicit SKU series to return (their own horizon is ignored).")
+    filter: Optional[BatchForecastFilter] = Field(None, description="Select series from sales history instead of listing them.")
+    horizon: str = Field("8w", description="Forecast horizon for every series.")
+    level: str = Field("class", description="Aggregate level: 'class' (dept_name/class_name by region) or 'dept' (dept_name by region).")
+    reconciliation: str = Field("top_down", description="'top_down' (split aggregates by historical shares), 'bottom_up' or 'mint'.")
+    engine: Optional[str] = Field(None, description="Engine for the aggregate series (server default if None).")
+
+    _check_horizon = field_validator("horizon")(_valid_horizon)
+
+class HierarchyGroupForecast(BaseModel):
+    group: str = Field(..., description="Aggregate label, e.g. 'Audio/Headphones'.")
+    region: str
+    members: int = Field(..., description="SKU-Region-Channel series in the aggregate.")
+    engine: str
+    forecast_series: List[ForecastPoint]
+
+class HierarchicalForecastResponse(BaseModel):
+    level: str
+    reconciliation: str
+    aggregate_fits: int = Field(..., description="Aggregate series forecast (one model each).")
+    member_fits: int = Field(..., description="SKU series given their own base forecast (bottom_up/mint, one vectorized pass).")
+    groups: List[HierarchyGroupForecast] = Field(..., description="Reconciled forecast of every aggregate touched by the request.")
+    forecasts: List[ForecastResponse] = Field(..., description="Per-SKU forecasts in request order.")
 
 
 # --- Dynamic Pricing Schemas ---
@@ -53,4 +135,11 @@ class PricingRecommendationResponse(BaseModel):
     elasticity_coefficient: float = Field(..., description="The estimated price elasticity of demand (log-log coefficient).")
     recommended_price: float = Field(..., description="The profit-maximizing price.")
     max_profit_estimate: float = Field(..., description="Estimated weekly profit at the recommended price.")
-    rationale: str = Field(..., description="Detailed explanation of the price recommendation.")
\ No newline at end of file
+    rationale: str = Field(..., description="Detailed explanation of the price recommendation.")
+    demand_source: Optional[str] = Field(None, description="Where the demand estimate came from: 'cache', 'materialized', 'rolling', 'forecast', 'stale' (rolling estimate from a series whose history ends well before the rest of the sales data) or 'history'.")
+
+class BatchPricingRequest(BaseModel):
+    requests: List[PricingRecommendationRequest] = Field(..., description="Pricing requests to evaluate in one vectorized pass.")
+
+class BatchPricingResponse(BaseModel):
+    results: List[PricingRecommendationResponse] = Field(..., description="Recommendations in the same order as the requests.")
@@ -0,0 +1,264 @@
+# app/services/compute_scheduler.py
+import asyncio
+import contextvars
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator
+
+# --- CONFIGURATION ---
+# Per workload class: worker threads, extra requests allowed to wait, and end-to-end timeout (queue + run)
+_CPUS = os.cpu_count() or 2
+COMPUTE_CLASSES = {
+    "forecast": {
+        "concurrency": int(os.getenv("COMPUTE_FORECAST_CONCURRENCY", str(max(1, _CPUS // 2)))),
+        "max_queue": int(os.getenv("COMPUTE_FORECAST_MAX_QUEUE", "32")),
+        "timeout_seconds": float(os.getenv("COMPUTE_FORECAST_TIMEOUT_SECONDS", "120")),
+    },
+    "pricing": {
+        "concurrency": int(os.getenv("COMPUTE_PRICING_CONCURRENCY", str(_CPUS))),
+        "max_queue": int(os.getenv("COMPUTE_PRICING_MAX_QUEUE", "64")),
+        "timeout_seconds": float(os.getenv("COMPUTE_PRICING_TIMEOUT_SECONDS", "30")),
+    },
+    "rag": {
+        "concurrency": int(os.getenv("COMPUTE_RAG_CONCURRENCY", "4")),
+        "max_queue": int(os.getenv("COMPUTE_RAG_MAX_QUEUE", "32")),
+        "timeout_seconds": float(os.getenv("COMPUTE_RAG_TIMEOUT_SECONDS", "90")),
+    },
+}
+
+
+class ComputeRejected(Exception):
+    """
+    Raised when a workload class cannot take a request: 429 when its queue is full,
+    503 when the request timed out. retry_after is a hint in whole seconds.
+    """
+
+    def __init__(self, status_code: int, detail: str, retry_after: int):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class _ComputeClass:
+    def __init__(self, name: str, concurrency: int, max_queue: int, timeout_seconds: float):
+        self.name = name
+        self.concurrency = max(1, concurrency)
+        self.max_queue = max(0, max_queue)
+        self.timeout_seconds = timeout_seconds
+        self.executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=f"compute-{name}")
+        self.queued = 0
+        self.running = 0
+        self.stats = {"completed": 0, "failed": 0, "rejected": 0, "timed_out": 0,
+                      "wait_seconds_total": 0.0, "wait_seconds_max": 0.0, "run_seconds_total": 0.0}
+
+    def retry_after(self) -> int:
+        """Rough time until a slot frees up: queued work spread over the workers at the mean run time."""
+        done = self.stats["completed"] + self.stats["failed"]
+        mean_run = self.stats["run_seconds_total"] / done if done else 1.0
+        return max(1, math.ceil(mean_run * (self.queued + 1) / self.concurrency))
+
+
+class ComputeScheduler:
+    """
+    Runs blocking CPU-bound calls (Prophet fits, statsmodels/NumPy pricing, embedding +
+    vector search) off the event loop, in one dedicated thread pool per workload class.
+    Each class admits at most concurrency + max_queue requests; beyond that callers are
+    rejected immediately instead of piling up, so a burst of forecasts cannot starve
+    pricing, RAG or /health.
+    """
+
+    def __init__(self, classes: Dict[str, Dict] = COMPUTE_CLASSES):
+        self._classes = {name: _ComputeClass(name, **cfg) for name, cfg in classes.items()}
+        # Re-entrant: a dropped ComputeStream may release its slot from __del__ while this thread holds it
+        self._lock = threading.RLock()
+
+    def _admit(self, cls: _ComputeClass) -> float:
+        with self._lock:
+            if cls.queued + cls.running >= cls.concurrency + cls.max_queue:
+                cls.stats["rejected"] += 1
+                raise ComputeRejected(429, f"The {cls.name} workers are saturated; retry later.", cls.retry_after())
+            cls.queued += 1
+        return time.perf_counter()
+
+    def _start(self, cls: _ComputeClass, submitted: float) -> float:
+        started = time.perf_counter()
+        with self._lock:
+            cls.queued -= 1
+            cls.running += 1
+            waited = started - submitted
+            cls.stats["wait_seconds_total"] += waited
+            cls.stats["wait_seconds_max"] = max(cls.stats["wait_seconds_max"], waited)
+        return started
+
+    def _finish(self, cls: _ComputeClass, started: float, ok: bool) -> None:
+        with self._lock:
+            cls.running -= 1
+            cls.stats["completed" if ok else "failed"] += 1
+            cls.stats["run_seconds_total"] += time.perf_counter() - started
+
+    def _timed_out(self, cls: _ComputeClass, future) -> ComputeRejected:
+        # A queued task is dropped; one already running finishes in the background (threads cannot be killed)
+        with self._lock:
+            if future.cancel():
+                cls.queued -= 1
+            cls.stats["timed_out"] += 1
+        return ComputeRejected(503, f"The {cls.name} request timed out after {cls.timeout_seconds:g}s.", cls.retry_after())
+
+    async def run(self, workload: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        cls = self._classes[workload]
+        submitted = self._admit(cls)
+
+        def _task():
+            started = self._start(cls, submitted)
+            ok = False
+            try:
+                result = fn(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                self._finish(cls, started, ok)
+
+        # Run in a copy of the caller's context so spans inside fn land in the request's trace
+        future = cls.executor.submit(contextvars.copy_context().run, _task)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=cls.timeout_seconds)
+        except asyncio.TimeoutError:
+            raise self._timed_out(cls, future)
+
+    async def stream(self, workload: str, fn: Callable[..., Iterator[Any]], *args, **kwargs) -> "ComputeStream":
+        """
+        run() for a generator function whose results are streamed to the client. Admission and
+        the wait for a worker (bounded by the class timeout) happen before this returns, so a
+        rejection is still a plain 429/503. The returned ComputeStream then advances the generator
+        on the class's threads one item at a time and holds one running slot until it is
+        exhausted or released: aclose() (pass it as the response's background task), or when
+        the stream is dropped unread. The stream itself has no time limit.
+        """
+        cls = self._classes[workload]
+        submitted = self._admit(cls)
+        context = contextvars.copy_context()
+        started = {}
+
+        def _open():
+            started["at"] = self._start(cls, submitted)
+            return iter(fn(*args, **kwargs))
+
+        def _close_late(future) -> None:
+            # Started just as the wait timed out: nobody will consume it, so release the slot
+            if future.cancelled():
+                return
+            if future.exception() is None:
+                getattr(future.result(), "close", lambda: None)()
+            self._finish(cls, started["at"], ok=False)
+
+        future = cls.executor.submit(context.run, _open)
+        try:
+            iterator = await asyncio.wait_for(asyncio.wrap_future(future), timeout=cls.timeout_seconds)
+        except asyncio.TimeoutError:
+            rejection = self._timed_out(cls, future)
+            future.add_done_callback(_close_late)
+            raise rejection
+        except Exception:
+            if "at" in started:
+                self._finish(cls, started["at"], ok=False)
+            raise
+        return ComputeStream(self, cls, context, iterator, started["at"])
+
+    def stats(self) -> Dict[str, Dict]:
+        report = {}
+        with self._lock:
+            for name, cls in self._classes.items():
+                started = cls.stats["completed"] + cls.stats["failed"] + cls.running
+                report[name] = {
+                    "concurrency": cls.concurrency,
+                    "max_queue": cls.max_queue,
+                    "timeout_seconds": cls.timeout_seconds,
+                    "queue_depth": cls.queued,
+                    "running": cls.running,
+                    "completed": cls.stats["completed"],
+                    "failed": cls.stats["failed"],
+                    "rejected": cls.stats["rejected"],
+                    "timed_out": cls.stats["timed_out"],
+                    "mean_wait_seconds": round(cls.stats["wait_seconds_total"] / started, 4) if started else 0.0,
+                    "max_wait_seconds": round(cls.stats["wait_seconds_max"], 4),
+                }
+        return report
+
+    def shutdown(self) -> None:
+        for cls in self._classes.values():
+            cls.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class ComputeStream:
+    """
+    Async iterator returned by ComputeScheduler.stream(). Each item is produced on the class's
+    threads; the running slot is released exactly once: when the generator is exhausted or
+    fails, on aclose(), or when the stream is garbage-collected without being consumed (a
+    response that failed before its body started, a client gone before the first chunk).
+    """
+
+    _DONE = object()
+
+    def __init__(self, scheduler: ComputeScheduler, cls: _ComputeClass, context: contextvars.Context, iterator: Iterator[Any], started: float):
+        self._scheduler = scheduler
+        self._cls = cls
+        self._context = context
+        self._iterator = iterator
+        self._started = started
+        self._step = None
+        self._released = False
+        self._release_lock = threading.Lock()
+
+    def __aiter__(self) -> "ComputeStream":
+        return self
+
+    async def __anext__(self) -> Any:
+        if self._released:
+            raise StopAsyncIteration
+        self._step = self._cls.executor.submit(self._context.run, next, self._iterator, self._DONE)
+        try:
+            item = await asyncio.wrap_future(self._step)
+        except BaseException:
+            self.release(ok=False)
+            raise
+        if item is self._DONE:
+            self.release(ok=True)
+            raise StopAsyncIteration
+        return item
+
+    async def aclose(self) -> None:
+        self.release(ok=False)
+
+    def release(self, ok: bool = False) -> None:
+        """Closes the generator and frees the running slot; later calls do nothing."""
+        with self._release_lock:
+            if self._released:
+                return
+            self._released = True
+        cls, context, iterator = self._cls, self._context, self._iterator
+        # Closing runs the generator's cleanup (e.g. cancelling queued fits) off the event loop,
+        # after the step still in progress if the consumer was cancelled while waiting on it
+        def close(_=None) -> None:
+            try:
+                cls.executor.submit(context.run, getattr(iterator, "close", lambda: None))
+            except RuntimeError:
+                pass  # Executor already shut down (process exit)
+
+        step = self._step
+        if step is not None and not step.done():
+            step.add_done_callback(close)
+        elif not ok:
+            close()
+        self._scheduler._finish(cls, self._started, ok)
+
+    def __del__(self) -> None:
+        if not getattr(self, "_released", True):
+            self.release(ok=False)
+
+
+# Process-wide scheduler used by the routers
+compute = ComputeScheduler()
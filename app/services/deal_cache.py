@@ -0,0 +1,137 @@
+# app/services/deal_cache.py
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+from app.schemas import DealResponse
+
+# --- CONFIGURATION ---
+DEAL_CACHE_TTL_SECONDS = float(os.getenv("DEAL_CACHE_TTL_SECONDS", "300"))
+DEAL_CACHE_MAX_ENTRIES = int(os.getenv("DEAL_CACHE_MAX_ENTRIES", "1000"))
+VERSION_FILE = "collection_version"  # Written next to the Chroma files by ingestion
+
+
+def new_collection_version() -> str:
+    """A fresh collection version ID; ingestion stamps its indexes with it before publishing it."""
+    return f"{time.time_ns()}-{uuid.uuid4().hex[:8]}"
+
+
+def bump_collection_version(chroma_path: str, version: Optional[str] = None) -> str:
+    """Marks the vector collection as changed; cached deal results for older versions stop matching."""
+    version = version or new_collection_version()
+    os.makedirs(chroma_path, exist_ok=True)
+    tmp = os.path.join(chroma_path, f"{VERSION_FILE}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(chroma_path, VERSION_FILE))
+    return version
+
+
+def read_collection_version(chroma_path: str) -> str:
+    """Current collection version ('0' before the first versioned ingestion)."""
+    try:
+        with open(os.path.join(chroma_path, VERSION_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return "0"
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.split()).casefold()
+
+
+class DealCache:
+    """
+    TTL + LRU cache of DealResponse objects with request coalescing.
+
+    Concurrent callers with the same key share one computation: the first caller runs it,
+    the others wait on its Future. A computation that reports itself as not cacheable
+    (fallback/error responses) is returned to everyone waiting but never stored.
+    """
+
+    def __init__(self, ttl_seconds: float = DEAL_CACHE_TTL_SECONDS, max_entries: int = DEAL_CACHE_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Hashable, Tuple[float, DealResponse]]" = OrderedDict()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "coalesced": 0, "uncacheable": 0}
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Tuple[DealResponse, bool]]) -> DealResponse:
+        """compute() returns (response, cacheable)."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[0] <= self.ttl_seconds:
+                self._entries.move_to_end(key)
+                self._stats["hits"] += 1
+                return entry[1].model_copy(deep=True)
+            if entry is not None:
+                del self._entries[key]  # Expired
+
+            future = self._in_flight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._in_flight[key] = future
+                self._stats["misses"] += 1
+            else:
+                self._stats["coalesced"] += 1
+
+        if not leader:
+            return future.result().model_copy(deep=True)
+
+        try:
+            response, cacheable = compute()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            del self._in_flight[key]
+            if not cacheable:
+                self._stats["uncacheable"] += 1
+        if cacheable:
+            self.put(key, response)
+        future.set_result(response)
+        return response.model_copy(deep=True)
+
+    def peek(self, key: Hashable) -> Optional[DealResponse]:
+        """Returns a fresh cached response without starting or joining a computation."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                return None
+            self._entries.move_to_end(key)
+            self._stats["hits"] += 1
+            return entry[1].model_copy(deep=True)
+
+    def put(self, key: Hashable, response: DealResponse) -> None:
+        """Stores a response produced outside get_or_compute (e.g. by the streaming endpoint)."""
+        with self._lock:
+            self._entries[key] = (time.monotonic(), response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["entries"] = len(self._entries)
+            stats["in_flight"] = len(self._in_flight)
+        lookups = stats["hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = round((stats["hits"] + stats["coalesced"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# Process-wide cache used by rag_service.search_deals
+deal_cache = DealCache()
@@ -0,0 +1,131 @@
+# app/services/demand_provider.py
+import os
+import pandas as pd
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from app.services.forecast_service import generate_forecast_batch, get_cached_forecasts
+from app.services.forecast_materializer import get_materialized_forecasts
+from app.services.series_index import get_series_index
+
+# --- CONFIGURATION ---
+# Sources tried in order until one yields a fresh estimate:
+#   cache    - last forecast computed for the series (no model fit)
+#   materialized - precomputed forecast from the materialization job (no model fit)
+#   rolling  - same-weekday rolling mean over recent history (microseconds)
+#   forecast - full forecast (Prophet fit or cached-model predict); the slow path
+DEMAND_SOURCES = [s.strip() for s in os.getenv("DEMAND_SOURCES", "cache,materialized,rolling,forecast").split(",") if s.strip()]
+DEMAND_CACHE_MAX_AGE_SECONDS = float(os.getenv("DEMAND_CACHE_MAX_AGE_SECONDS", str(6 * 3600)))
+ROLLING_WINDOW_WEEKS = int(os.getenv("DEMAND_ROLLING_WINDOW_WEEKS", "4"))
+# Rolling estimates need this much history, ending no more than N days before the latest date in
+# the sales data (0 = no age limit), so a historical dataset is not stale as a whole. An older
+# rolling estimate is only used when no later source answers, reported as 'stale'.
+ROLLING_MIN_HISTORY_DAYS = int(os.getenv("DEMAND_ROLLING_MIN_HISTORY_DAYS", "28"))
+ROLLING_MAX_STALENESS_DAYS = int(os.getenv("DEMAND_ROLLING_MAX_STALENESS_DAYS", "28") or "0")
+
+
+SeriesKey = Tuple[str, str, str]  # (sku, region, channel)
+Estimate = Tuple[float, str]  # (q, rationale sentence)
+
+
+def _from_cache(keys: List[SeriesKey]) -> Dict[SeriesKey, Estimate]:
+    estimates = {}
+    for key, (points, age) in get_cached_forecasts(keys, DEMAND_CACHE_MAX_AGE_SECONDS).items():
+        q = points[0]['demand'] # First period's demand
+        estimates[key] = (q, f"Demand forecast (Q) used: {q} units/period (cached forecast, {age / 60:.0f} min old).")
+    return estimates
+
+
+def _from_materialized(keys: List[SeriesKey]) -> Dict[SeriesKey, Estimate]:
+    estimates = {}
+    for key, (points, entry) in get_materialized_forecasts(keys, horizon='1d').items():
+        q = points[0]['demand'] # First period's demand
+        estimates[key] = (q, f"Demand forecast (Q) used: {q} units/period (precomputed {entry.engine} forecast).")
+    return estimates
+
+
+def _history_age_days(history: pd.DataFrame, as_of: Optional[pd.Timestamp]) -> int:
+    """Days the series' last observation lags `as_of` (the latest date in the sales data)."""
+    last = pd.to_datetime(history['date'].iloc[-1])
+    return (as_of - last).days if as_of is not None else 0
+
+
+def _from_rolling(history: pd.DataFrame) -> Optional[Tuple[float, str]]:
+    """Mean of the last ROLLING_WINDOW_WEEKS observations on the weekday after the history ends."""
+    dates = pd.to_datetime(history['date'])
+    last = dates.iloc[-1]
+    if (last - dates.iloc[0]).days + 1 < ROLLING_MIN_HISTORY_DAYS:
+        return None
+
+    target = last + pd.Timedelta(days=1)
+    in_window = (dates > last - pd.Timedelta(weeks=ROLLING_WINDOW_WEEKS)).to_numpy()
+    recent = history['units_sold'].to_numpy()[in_window]
+    same_weekday = recent[dates.dt.dayofweek.to_numpy()[in_window] == target.dayofweek]
+    window = same_weekday if len(same_weekday) else recent
+    q = int(round(window.mean()))
+    return q, f"Demand estimate (Q) used: {q} units/period ({ROLLING_WINDOW_WEEKS}-week same-weekday average)."
+
+
+def _from_forecast(keys: List[SeriesKey]) -> Dict[SeriesKey, Estimate]:
+    """One forecast batch for every series still unresolved (vectorized engines, shared Prophet pool)."""
+    estimates = {}
+    for item in generate_forecast_batch([(*key, '1w') for key in keys]):
+        if item['status'] == 'ok' and item['forecast_series']:
+            q = item['forecast_series'][0]['demand'] # Use first period's demand
+            estimates[(item['sku'], item['region'], item['channel'])] = (q, f"Demand forecast (Q) used: {q} units/period.")
+    return estimates
+
+
+def estimate_demand_batch(keys: Sequence[SeriesKey], histories: Sequence[pd.DataFrame]) -> List[Tuple[float, str, str]]:
+    """
+    Next-period demand (Q) for many series, as (q, source, rationale sentence) in input order.
+    Each distinct series is resolved once, walking DEMAND_SOURCES in order: the cache and the
+    materialized store are read in one pass for all unresolved series, and the 'forecast' source
+    runs a single batch for whatever is left. A rolling estimate from history ending more than
+    ROLLING_MAX_STALENESS_DAYS before the latest sales date is held back and returned as 'stale' only if no later source
+    answers; the historical average ('history') is the last resort.
+    """
+    unique = dict(zip(keys, histories))
+    resolved: Dict[SeriesKey, Tuple[float, str, str]] = {}
+    stale: Dict[SeriesKey, Estimate] = {}
+    for source in DEMAND_SOURCES:
+        todo = [key for key in unique if key not in resolved]
+        if not todo:
+            break
+        if source == 'cache':
+            estimates = _from_cache(todo)
+        elif source == 'materialized':
+            estimates = _from_materialized(todo)
+        elif source == 'rolling':
+            estimates = {}
+            as_of = get_series_index().last_date
+            for key in todo:
+                history = unique[key]
+                estimate = _from_rolling(history) if not history.empty else None
+                if estimate is None:
+                    continue
+                age = _history_age_days(history, as_of)
+                if ROLLING_MAX_STALENESS_DAYS and age > ROLLING_MAX_STALENESS_DAYS:
+                    stale[key] = (estimate[0], f"{estimate[1][:-1]}, from history ending {age} days before the latest sales.")
+                else:
+                    estimates[key] = estimate
+        elif source == 'forecast':
+            estimates = _from_forecast(todo)
+        else:
+            continue
+        for key, (q, rationale) in estimates.items():
+            resolved[key] = (q, source, rationale)
+
+    for key, history in unique.items():
+        if key in resolved:
+            continue
+        if key in stale:
+            resolved[key] = (stale[key][0], 'stale', stale[key][1])
+        else:
+            q_forecast = history['units_sold'].mean() if not history.empty else 0.0 # Fallback to historical average
+            resolved[key] = (q_forecast, 'history', "Forecast unavailable, using historical average demand.")
+    return [resolved[key] for key in keys]
+
+
+def estimate_demand(sku: str, region: str, channel: str, history: pd.DataFrame) -> Tuple[float, str, str]:
+    """Next-period demand (Q) for the pricing profit simulation (see estimate_demand_batch)."""
+    return estimate_demand_batch([(sku, region, channel)], [history])[0]
@@ -0,0 +1,144 @@
+# app/services/elasticity_engine.py
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, Optional
+
+from app.services.series_index import SERIES_KEYS, SeriesIndex, get_series_index
+
+# Regressors of the log-log demand model: log(units_sold) ~ 1 + log(price) + promo + stock_level
+REGRESSORS = ['const', 'log_price', 'promo', 'stock_level']
+ELASTICITY_COLUMNS = ['elasticity', 'r_squared', 'n_obs', 'std_err']
+
+
+def compute_elasticity_table(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Estimates log-log price elasticities for every (sku, region, channel) series in one pass.
+
+    Instead of one OLS fit per series, the per-series normal equations (X'X, X'y, y'y)
+    are accumulated for all series at once with grouped sums and solved as a stacked
+    batch. Returns a frame indexed by the series keys with elasticity, R², sample count
+    and the standard error of the elasticity. The input frame is not modified.
+    """
+    valid = (df['units_sold'] > 0) & (df['price'] > 0)
+    data = df.loc[valid, SERIES_KEYS + ['units_sold', 'price', 'promo', 'stock_level']]
+    if data.empty:
+        return pd.DataFrame(columns=ELASTICITY_COLUMNS, index=pd.MultiIndex.from_tuples([], names=SERIES_KEYS))
+
+    # Combine per-column factor codes into one integer key per row, then number the series
+    combined = np.zeros(len(data), dtype=np.int64)
+    for col in SERIES_KEYS:
+        codes, uniques = pd.factorize(data[col].astype(str))
+        combined = combined * len(uniques) + codes
+    _, first_row, group_ids = np.unique(combined, return_index=True, return_inverse=True)
+    keys = data[SERIES_KEYS].astype(str).iloc[first_row]
+    n_groups, k = len(keys), len(REGRESSORS)
+
+    y = np.log(data['units_sold'].to_numpy(dtype=float))
+    X = np.column_stack([
+        np.ones(len(data)),
+        np.log(data['price'].to_numpy(dtype=float)),
+        data['promo'].fillna(0).to_numpy(dtype=float),
+        data['stock_level'].fillna(0).to_numpy(dtype=float),
+    ])
+
+    # Grouped sums of the cross products via weighted bincounts (one O(rows) pass each)
+    def group_sum(weights: np.ndarray) -> np.ndarray:
+        return np.bincount(group_ids, weights=weights, minlength=n_groups)
+
+    xtx = np.empty((n_groups, k, k))                    # (G, k, k)
+    for i in range(k):
+        for j in range(i, k):
+            xtx[:, i, j] = xtx[:, j, i] = group_sum(X[:, i] * X[:, j])
+    xty = np.column_stack([group_sum(X[:, i] * y) for i in range(k)])  # (G, k)
+    yty = group_sum(y * y)                              # (G,)
+    sum_y = group_sum(y)                                # (G,)
+    n_obs = np.bincount(group_ids, minlength=n_groups)  # (G,)
+
+    # Solve all systems at once; pinv keeps rank-deficient series (e.g. constant price) finite
+    xtx_inv = np.linalg.pinv(xtx)
+    beta = np.einsum('gij,gj->gi', xtx_inv, xty)
+
+    # SSR = y'y - 2b'X'y + b'X'Xb, SST = y'y - n * mean(y)^2
+    ssr = yty - 2 * np.einsum('gi,gi->g', beta, xty) + np.einsum('gi,gij,gj->g', beta, xtx, beta)
+    sst = yty - sum_y ** 2 / n_obs
+    with np.errstate(divide='ignore', invalid='ignore'):
+        r_squared = np.where(sst > 0, 1 - ssr / sst, 0.0)
+        dof = n_obs - np.linalg.matrix_rank(xtx)  # Residual degrees of freedom, as statsmodels counts them
+        sigma2 = np.where(dof > 0, np.maximum(ssr, 0) / dof, np.nan)
+        std_err = np.sqrt(sigma2 * xtx_inv[:, 1, 1])
+
+    # A price coefficient is only identifiable with price variation and enough rows
+    price_var = xtx[:, 1, 1] - xtx[:, 0, 1] ** 2 / n_obs
+    identified = (dof > 0) & (price_var > 1e-12)
+
+    return pd.DataFrame(
+        {
+            'elasticity': np.where(identified, beta[:, 1], np.nan),
+            'r_squared': np.where(identified, r_squared, np.nan),
+            'n_obs': n_obs,
+            'std_err': np.where(identified, std_err, np.nan),
+        },
+        index=pd.MultiIndex.from_frame(keys),
+    )
+
+
+# Global cache: elasticity table plus the series-index version it was computed from
+_table_cache: Dict[str, Optional[object]] = {"table": None, "version": None}
+_table_lock = threading.Lock()
+# Background recompute after the series index changes (at most one at a time)
+_refresh_state: Dict[str, Optional[threading.Thread]] = {"thread": None}
+_refresh_lock = threading.Lock()
+
+
+def _table_for(index: SeriesIndex) -> pd.DataFrame:
+    frames = [index.get(*key) for key in index.keys()]
+    sales = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SERIES_KEYS + ['units_sold', 'price', 'promo', 'stock_level'])
+    return compute_elasticity_table(sales)
+
+
+def _refresh(index: SeriesIndex) -> None:
+    try:
+        table = _table_for(index)
+        with _table_lock:
+            # Index versions only grow; never replace a newer table with an older one
+            if _table_cache["version"] is None or index.version > _table_cache["version"]:
+                _table_cache["table"], _table_cache["version"] = table, index.version
+        print(f"📉 Elasticity table recomputed for {len(table)} series.")
+    except Exception as e:
+        print(f"❌ Elasticity recompute failed: {e}")
+    finally:
+        with _refresh_lock:
+            _refresh_state["thread"] = None
+
+
+def refresh_elasticity_table() -> bool:
+    """
+    Recomputes a loaded elasticity table on a background thread if the series index has changed
+    since (called after ingestion). Requests keep the previous coefficients until it finishes.
+    Returns True if a recompute was started.
+    """
+    index = get_series_index()
+    with _refresh_lock:
+        if _table_cache["table"] is None or _table_cache["version"] == index.version or _refresh_state["thread"] is not None:
+            return False
+        thread = threading.Thread(target=_refresh, args=(index,), name="elasticity-refresh", daemon=True)
+        _refresh_state["thread"] = thread
+    thread.start()
+    return True
+
+
+def get_elasticity_table() -> pd.DataFrame:
+    """
+    Returns the precomputed elasticity table. Only the very first call computes it inline; after
+    the series index changes, the previous table is served while a background recompute runs.
+    """
+    index = get_series_index()
+    if _table_cache["table"] is None:
+        with _table_lock:
+            if _table_cache["table"] is None:
+                _table_cache["table"], _table_cache["version"] = _table_for(index), index.version
+    elif _table_cache["version"] != index.version:
+        refresh_elasticity_table()
+    return _table_cache["table"]
+
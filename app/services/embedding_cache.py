@@ -0,0 +1,163 @@
+# app/services/embedding_cache.py
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# --- CONFIGURATION ---
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "data/embedding_cache.sqlite")
+EMBEDDING_CACHE_MEMORY_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MEMORY_ENTRIES", "10000"))
+
+
+def normalize_text(text: str, kind: str) -> str:
+    """
+    Normalization applied before hashing: whitespace is always collapsed; queries are also
+    case-folded so 'Cheap  Headphones' and 'cheap headphones' share one entry.
+    """
+    text = " ".join(text.split())
+    return text.casefold() if kind == "query" else text
+
+
+class EmbeddingCache:
+    """
+    Content-addressed embedding cache: key = sha256(model name + kind + normalized text).
+    'kind' is 'query' or 'document', because Ollama embeddings prefix the two differently.
+
+    An in-memory LRU sits in front of a SQLite file that persists across restarts and
+    is shared by the API (query embeddings) and ingestion (document embeddings).
+    Every row records the model that produced it, so several models share the file
+    without invalidating each other; drop_model() removes one model's vectors.
+    """
+
+    def __init__(self, model: str, path: str = EMBEDDING_CACHE_PATH, max_memory_entries: int = EMBEDDING_CACHE_MEMORY_ENTRIES):
+        self.model = model
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, model TEXT, vector BLOB)")
+        self._migrate()
+        self._db.execute("CREATE INDEX IF NOT EXISTS embeddings_model ON embeddings (model)")
+        self._db.commit()
+
+    def _migrate(self) -> None:
+        """Older files had no model column and recorded their single model in a meta table."""
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(embeddings)")}
+        if "model" in columns:
+            return
+        self._db.execute("ALTER TABLE embeddings ADD COLUMN model TEXT")
+        has_meta = self._db.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'meta'").fetchone()
+        if has_meta:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'model'").fetchone()
+            if row is not None:
+                self._db.execute("UPDATE embeddings SET model = ?", (row[0],))
+            self._db.execute("DROP TABLE meta")
+
+    def key_for(self, text: str, kind: str) -> str:
+        return hashlib.sha256(f"{self.model}\n{kind}\n{normalize_text(text, kind)}".encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def get_many(self, texts: List[str], kind: str) -> List[Optional[List[float]]]:
+        """Cached vectors for each text (None where missing)."""
+        keys = [self.key_for(t, kind) for t in texts]
+        found: Dict[str, List[float]] = {}
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+            self._stats["memory_hits"] += len(found)
+
+            missing = list({k for k in keys if k not in found})
+            for start in range(0, len(missing), 500):  # Stay under SQLite's variable limit
+                part = missing[start:start + 500]
+                rows = self._db.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(part))})", part
+                ).fetchall()
+                for key, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32).tolist()
+                    found[key] = vector
+                    self._remember(key, vector)
+                    self._stats["disk_hits"] += 1
+            self._stats["misses"] += sum(1 for k in keys if k not in found)
+        return [found.get(k) for k in keys]
+
+    def put_many(self, texts: List[str], vectors: List[List[float]], kind: str) -> None:
+        rows = [(self.key_for(t, kind), self.model, np.asarray(v, dtype=np.float32).tobytes()) for t, v in zip(texts, vectors)]
+        with self._lock:
+            self._db.executemany("INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)", rows)
+            self._db.commit()
+            for (key, _, _), vector in zip(rows, vectors):
+                self._remember(key, list(vector))
+
+    def drop_model(self, model: str) -> int:
+        """Deletes every stored vector of `model` (e.g. one no longer in use). Returns the rows removed."""
+        with self._lock:
+            removed = self._db.execute("DELETE FROM embeddings WHERE model = ?", (model,)).rowcount
+            self._db.commit()
+            if model == self.model:
+                self._memory.clear()
+        return removed
+
+    def embed_with(self, texts: List[str], embed_fn: Callable[[List[str]], List[List[float]]], kind: str = "document") -> List[List[float]]:
+        """Returns vectors for texts, calling embed_fn only for the cache misses."""
+        cached = self.get_many(texts, kind)
+        missing = [i for i, v in enumerate(cached) if v is None]
+        if missing:
+            # Embed each distinct missing text once, even if it repeats within the batch
+            unique = list(dict.fromkeys(texts[i] for i in missing))
+            vectors = dict(zip(unique, embed_fn(unique)))
+            self.put_many(unique, [vectors[t] for t in unique], kind)
+            for i in missing:
+                cached[i] = vectors[texts[i]]
+        return cached
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        stats["model"] = self.model
+        return stats
+
+
+class CachedEmbeddings(Embeddings):
+    """LangChain Embeddings wrapper that serves repeated texts from an EmbeddingCache."""
+
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache):
+        self.underlying = underlying
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.cache.embed_with(texts, self.underlying.embed_documents, kind="document")
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.cache.embed_with([text], lambda t: [self.underlying.embed_query(t[0])], kind="query")[0]
+
+
+# One cache per embedding model per process (shared by RAG queries and ingestion)
+_caches: Dict[str, EmbeddingCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_embedding_cache(model: str) -> EmbeddingCache:
+    with _caches_lock:
+        if model not in _caches:
+            _caches[model] = EmbeddingCache(model)
+        return _caches[model]
@@ -0,0 +1,290 @@
+# app/services/forecast_engines.py
+import os
+import warnings
+from contextlib import contextmanager
+from statistics import NormalDist
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from app.services.series_index import SeriesKey
+from app.services.telemetry import span
+
+# --- CONFIGURATION ---
+# Engine used when a request does not name one: an engine name, or 'auto' for the volume policy
+FORECAST_ENGINE = os.getenv("FORECAST_ENGINE", "prophet")
+# 'auto': series selling at least this many units/day on average over the last
+# FORECAST_VOLUME_WINDOW_DAYS get Prophet, the long tail gets FORECAST_FAST_ENGINE
+FORECAST_FAST_ENGINE = os.getenv("FORECAST_FAST_ENGINE", "holt_winters")
+FORECAST_PROPHET_MIN_VOLUME = float(os.getenv("FORECAST_PROPHET_MIN_VOLUME", "20"))
+FORECAST_VOLUME_WINDOW_DAYS = int(os.getenv("FORECAST_VOLUME_WINDOW_DAYS", "90"))
+INTERVAL_WIDTH = 0.90  # Same 90% interval as the Prophet models
+INTERVAL_Z = NormalDist().inv_cdf(0.5 + INTERVAL_WIDTH / 2)  # Half-width of the interval in standard deviations
+WEEKLY_PERIOD = 7
+YEARLY_ORDER = 3  # Fourier pairs of the yearly component
+YEARLY_MIN_DAYS = 365  # Shorter histories get no yearly component
+DAMPING = 0.9  # Trend damping (phi) of the exponential-smoothing models
+
+# Smoothing-parameter grid searched per series in the same vectorized pass (alpha, beta, gamma)
+_ALPHAS = (0.05, 0.2, 0.5)
+_BETAS = (0.0, 0.05)
+_GAMMAS = (0.05, 0.2)
+
+
+class ForecastPoints(list):
+    """
+    ForecastPoint dicts that also keep the arrays they were formatted from in `columns`
+    (date as datetime64[D], demand/confidence_low/confidence_high as int64), so columnar
+    responses and the materialized store use the arrays instead of reading the dicts back.
+    Slicing keeps the arrays in step.
+    """
+
+    def __init__(self, points: List[Dict], columns: Dict[str, np.ndarray]):
+        super().__init__(points)
+        self.columns = columns
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            return ForecastPoints(list.__getitem__(self, item), {name: values[item] for name, values in self.columns.items()})
+        return list.__getitem__(self, item)
+
+
+def format_points(dates: np.ndarray, yhat: np.ndarray, low: np.ndarray, high: np.ndarray) -> ForecastPoints:
+    """ForecastPoint dicts from forecast arrays: rounded to non-negative integer demand."""
+    days = np.asarray(dates, dtype='datetime64[D]')
+    labels = np.datetime_as_string(days, unit='D')
+    demand, lower, upper = (np.maximum(0, np.round(a)).astype(np.int64) for a in (yhat, low, high))
+    points = [
+        {'date': d, 'demand': q, 'confidence_low': lo, 'confidence_high': hi}
+        for d, q, lo, hi in zip(labels.tolist(), demand.tolist(), lower.tolist(), upper.tolist())
+    ]
+    return ForecastPoints(points, {'date': days, 'demand': demand, 'confidence_low': lower, 'confidence_high': upper})
+
+
+@contextmanager
+def _quiet_nan_warnings() -> Iterator[None]:
+    """All-NaN slices are expected (short or sparse series); their NaN results are replaced."""
+    with warnings.catch_warnings(), np.errstate(invalid='ignore', divide='ignore'):
+        warnings.simplefilter('ignore', RuntimeWarning)
+        yield
+
+
+class ForecastEngine:
+    """
+    Forecasts a batch of daily series. `histories` maps each (sku, region, channel) key
+    to its (ds, y) history; the result maps each key to `horizon_days` ForecastPoint dicts
+    starting the day after that series' last observation.
+    """
+
+    name = "base"
+
+    def forecast(self, histories: Dict[SeriesKey, pd.DataFrame], horizon_days: int) -> Dict[SeriesKey, List[Dict]]:
+        raise NotImplementedError
+
+
+class ProphetEngine(ForecastEngine):
+    """One (cached, warm-started) Prophet fit per series; see forecast_service."""
+
+    name = "prophet"
+
+    def forecast(self, histories: Dict[SeriesKey, pd.DataFrame], horizon_days: int) -> Dict[SeriesKey, List[Dict]]:
+        from app.services.forecast_service import _fit_and_predict
+        return {key: _fit_and_predict(key, history, f"{horizon_days}d") for key, history in histories.items()}
+
+
+class _Grid:
+    """Histories laid out on one shared daily calendar: values (n_series, n_days), NaN where unobserved."""
+
+    def __init__(self, histories: List[pd.DataFrame]):
+        days = [np.asarray(h['ds'].to_numpy(), dtype='datetime64[D]') for h in histories]
+        all_days = np.concatenate(days)
+        self.start = all_days.min()
+        n_days = int((all_days.max() - self.start).astype(np.int64)) + 1
+        rows = np.repeat(np.arange(len(histories)), [len(d) for d in days])
+        self.values = np.full((len(histories), n_days), np.nan)
+        self.values[rows, (all_days - self.start).astype(np.int64)] = np.concatenate([h['y'].to_numpy(dtype=float) for h in histories])
+        observed = ~np.isnan(self.values)
+        self.first = observed.argmax(axis=1)
+        self.last = n_days - 1 - observed[:, ::-1].argmax(axis=1)
+
+    def dates(self, positions: np.ndarray) -> np.ndarray:
+        return self.start + positions.astype('timedelta64[D]')
+
+
+def _yearly_design(dates: np.ndarray) -> np.ndarray:
+    """Intercept plus YEARLY_ORDER sine/cosine pairs of the day of year; shape dates.shape + (1 + 2K,)."""
+    day = (dates - dates.astype('datetime64[Y]')).astype(np.int64).astype(float)
+    angle = 2 * np.pi * day[..., None] * np.arange(1, YEARLY_ORDER + 1) / 365.25
+    return np.concatenate([np.ones(day.shape + (1,)), np.sin(angle), np.cos(angle)], axis=-1)
+
+
+def _fit_yearly(grid: _Grid) -> np.ndarray:
+    """
+    Per-series yearly Fourier coefficients (n_series, 1 + 2K) by masked least squares,
+    all series solved at once from their normal equations. Zero for short histories.
+    """
+    design = _yearly_design(grid.dates(np.arange(grid.values.shape[1])))
+    k = design.shape[1]
+    mask = ~np.isnan(grid.values)
+    y = np.where(mask, grid.values, 0.0)
+    gram = (mask.astype(float) @ (design[:, :, None] * design[:, None, :]).reshape(len(design), k * k)).reshape(-1, k, k)
+    rhs = y @ design
+    coef = np.linalg.solve(gram + 1e-6 * np.eye(k), rhs[..., None])[..., 0]
+    eligible = (grid.last - grid.first + 1) >= YEARLY_MIN_DAYS
+    coef[~eligible] = 0.0
+    coef[:, 0] = 0.0  # The level is left to the smoothing model
+    return coef
+
+
+class VectorizedEngine(ForecastEngine):
+    """
+    Classical models fitted to thousands of series in one NumPy pass over the calendar.
+
+    methods:
+      seasonal_naive - repeats the last observed week
+      ets            - exponential smoothing with a damped additive trend
+      holt_winters   - ets plus additive weekly seasonality and a yearly Fourier component
+    Smoothing parameters are chosen per series from a small grid by in-sample one-step
+    error (every grid point runs in the same pass); missing days are skipped by treating
+    them as zero-error steps. Intervals use the analytic ETS(A,Ad,A) forecast variance.
+    """
+
+    def __init__(self, method: str):
+        self.name = method
+        self.seasonal = method == "holt_winters"
+        self.z = INTERVAL_Z
+
+    def forecast(self, histories: Dict[SeriesKey, pd.DataFrame], horizon_days: int) -> Dict[SeriesKey, List[Dict]]:
+        keys = [key for key, history in histories.items() if not history.empty]
+        if not keys:
+            return {}
+        with span(f"forecast.{self.name}"):
+            grid = _Grid([histories[key] for key in keys])
+            steps = np.arange(1, horizon_days + 1)
+            positions = grid.last[:, None] + steps
+            if self.name == "seasonal_naive":
+                yhat, sigma_h = self._seasonal_naive(grid, positions, steps)
+            else:
+                yhat, sigma_h = self._smoothing(grid, positions, steps)
+            dates = grid.dates(positions)
+            low, high = yhat - self.z * sigma_h, yhat + self.z * sigma_h
+            return {key: format_points(dates[i], yhat[i], low[i], high[i]) for i, key in enumerate(keys)}
+
+    def _seasonal_naive(self, grid: _Grid, positions: np.ndarray, steps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        values, m = grid.values, WEEKLY_PERIOD
+        n, n_days = values.shape
+        # Last observed value of each weekday slot (slot = calendar position mod 7)
+        last_by_slot = np.full((n, m), np.nan)
+        for slot in range(m):
+            column = values[:, slot::m]
+            seen = ~np.isnan(column)
+            latest = column.shape[1] - 1 - seen[:, ::-1].argmax(axis=1)
+            last_by_slot[:, slot] = np.where(seen.any(axis=1), column[np.arange(n), latest], np.nan)
+        with _quiet_nan_warnings():
+            fallback = np.nan_to_num(np.nanmean(values, axis=1))
+        last_by_slot = np.where(np.isnan(last_by_slot), fallback[:, None], last_by_slot)
+        yhat = np.take_along_axis(last_by_slot, positions % m, axis=1)
+
+        with _quiet_nan_warnings():
+            sigma = np.nanstd(values[:, m:] - values[:, :-m], axis=1)
+            # No same-weekday pairs a week apart (very sparse series): fall back to the plain spread
+            sigma = np.nan_to_num(np.where(np.isnan(sigma), np.nanstd(values, axis=1), sigma))
+        sigma_h = sigma[:, None] * np.sqrt(np.ceil(steps / m))[None, :]
+        return yhat, sigma_h
+
+    def _smoothing(self, grid: _Grid, positions: np.ndarray, steps: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        values, m, phi = grid.values, WEEKLY_PERIOD, DAMPING
+        n, n_days = values.shape
+        gammas = _GAMMAS if self.seasonal else (0.0,)
+        combos = np.array([(a, b, g) for a in _ALPHAS for b in _BETAS for g in gammas])
+        alpha, beta, gamma = (combos[:, j][:, None] for j in range(3))  # (C, 1)
+
+        coef = _fit_yearly(grid) if self.seasonal else np.zeros((n, 1 + 2 * YEARLY_ORDER))
+        yearly = coef @ _yearly_design(grid.dates(np.arange(n_days))).T  # (n, n_days)
+        adjusted = values - yearly
+
+        # Initial states: level from the first two weeks observed, weekday offsets from the whole history
+        with _quiet_nan_warnings():
+            head = np.where(np.arange(n_days)[None, :] < (grid.first + 2 * m)[:, None], adjusted, np.nan)
+            level0 = np.nan_to_num(np.nanmean(head, axis=1))
+            season0 = np.zeros((n, m))
+            if self.seasonal:
+                overall = np.nanmean(adjusted, axis=1)
+                for slot in range(m):
+                    season0[:, slot] = np.nan_to_num(np.nanmean(adjusted[:, slot::m], axis=1) - overall)
+
+        n_combos = len(combos)
+        level = np.broadcast_to(level0, (n_combos, n)).copy()
+        trend = np.zeros((n_combos, n))
+        season = np.broadcast_to(season0, (n_combos, n, m)).copy()
+        sse = np.zeros((n_combos, n))
+        count = np.zeros(n)
+        snap_level, snap_trend, snap_season = level.copy(), trend.copy(), season.copy()
+
+        for t in range(int(grid.first.min()), n_days):
+            slot = t % m
+            y = adjusted[:, t]
+            observed = ~np.isnan(y)
+            error = np.where(observed, y - (level + phi * trend + season[:, :, slot]), 0.0)
+            sse += error * error
+            count += observed
+            level += phi * trend + alpha * error
+            trend = phi * trend + beta * error
+            season[:, :, slot] += gamma * error
+            ends = grid.last == t
+            if ends.any():
+                snap_level[:, ends], snap_trend[:, ends], snap_season[:, ends] = level[:, ends], trend[:, ends], season[:, ends]
+
+        # Best grid point per series by in-sample one-step MSE
+        best = np.argmin(sse, axis=0)
+        rows = np.arange(n)
+        sigma2 = sse[best, rows] / np.maximum(count - 1, 1)
+        a, b, g = combos[best, 0][:, None], combos[best, 1][:, None], combos[best, 2][:, None]
+
+        damped = np.cumsum(phi ** steps)  # phi + phi^2 + ... + phi^h
+        future_yearly = np.einsum('nhk,nk->nh', _yearly_design(grid.dates(positions)), coef)
+        yhat = (
+            snap_level[best, rows][:, None]
+            + snap_trend[best, rows][:, None] * damped[None, :]
+            + np.take_along_axis(snap_season[best, rows], positions % m, axis=1)
+            + future_yearly
+        )
+
+        # Var(h) = sigma^2 * (1 + sum_{j<h} c_j^2), c_j = alpha + beta * phi_j + gamma * [j % m == 0]
+        c = a + b * damped[None, :] + g * (steps % m == 0)[None, :]
+        spread = np.concatenate([np.zeros((n, 1)), np.cumsum(c * c, axis=1)[:, :-1]], axis=1)
+        sigma_h = np.sqrt(sigma2[:, None] * (1 + spread))
+        return yhat, sigma_h
+
+
+ENGINES: Dict[str, ForecastEngine] = {
+    "prophet": ProphetEngine(),
+    "seasonal_naive": VectorizedEngine("seasonal_naive"),
+    "ets": VectorizedEngine("ets"),
+    "holt_winters": VectorizedEngine("holt_winters"),
+}
+
+
+def get_engine(name: str) -> ForecastEngine:
+    engine = ENGINES.get(name)
+    if engine is None:
+        raise ValueError(f"Unknown forecast engine '{name}'. Choose one of: {', '.join(ENGINES)} or 'auto'.")
+    return engine
+
+
+def select_engine(requested: Optional[str], history: pd.DataFrame) -> str:
+    """
+    Engine for one series: the requested name, else FORECAST_ENGINE. 'auto' picks Prophet
+    for series whose recent mean daily volume reaches FORECAST_PROPHET_MIN_VOLUME and
+    FORECAST_FAST_ENGINE for the long tail.
+    """
+    name = requested or FORECAST_ENGINE
+    if name != "auto":
+        get_engine(name)
+        return name
+    if history.empty:
+        return FORECAST_FAST_ENGINE
+    recent = history[history['ds'] > history['ds'].max() - pd.Timedelta(days=FORECAST_VOLUME_WINDOW_DAYS)]
+    volume = recent['y'].sum() / FORECAST_VOLUME_WINDOW_DAYS
+    return "prophet" if volume >= FORECAST_PROPHET_MIN_VOLUME else FORECAST_FAST_ENGINE
@@ -0,0 +1,285 @@
+# app/services/forecast_materializer.py
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.schemas import horizon_days
+from app.services.forecast_engines import FORECAST_ENGINE
+from app.services.forecast_service import _data_version, _filter_series, generate_forecast_batch, select_series
+from app.services.forecast_store import MaterializedForecastStore, SeriesKey, StoredForecast, forecast_store
+from app.services.series_index import get_series_index
+from app.services.telemetry import span
+
+# --- CONFIGURATION ---
+# Horizon precomputed for every series; requests for a longer horizon are forecast on demand
+MATERIALIZE_HORIZON = os.getenv("FORECAST_MATERIALIZE_HORIZON", "13w")
+# Engine (or 'auto') used by the job; empty = the FORECAST_ENGINE policy
+MATERIALIZE_ENGINE = os.getenv("FORECAST_MATERIALIZE_ENGINE", "") or None
+# Seconds between scheduled incremental runs in the API process (0 = no schedule;
+# enable it on one worker only, or run `python -m app.services.forecast_materializer` from cron)
+MATERIALIZE_INTERVAL_SECONDS = float(os.getenv("FORECAST_MATERIALIZE_INTERVAL_SECONDS", "0"))
+# 1 = start an incremental run after every successful ingestion
+MATERIALIZE_AFTER_INGEST = os.getenv("FORECAST_MATERIALIZE_AFTER_INGEST", "1") == "1"
+# Completed series between intermediate writes, so a long Prophet run is served as it progresses
+MATERIALIZE_FLUSH_SERIES = int(os.getenv("FORECAST_MATERIALIZE_FLUSH_SERIES", "5000"))
+# Serving: answer /forecast/forecast from the store; fall back to fitting when a series is missing
+FORECAST_SERVE_MATERIALIZED = os.getenv("FORECAST_SERVE_MATERIALIZED", "1") == "1"
+FORECAST_ON_DEMAND_FALLBACK = os.getenv("FORECAST_ON_DEMAND_FALLBACK", "1") == "1"
+# Materialized forecasts older than this are treated as missing (0 = no limit). Entries made from
+# history that has since changed are never served, whatever their age.
+FORECAST_MATERIALIZED_MAX_AGE_SECONDS = float(os.getenv("FORECAST_MATERIALIZED_MAX_AGE_SECONDS", str(7 * 86400)))
+
+
+class ForecastMaterializer:
+    """
+    Precomputes forecasts for every series into the materialized store.
+
+    Runs are incremental: each series' history is hashed (the same data version the
+    Prophet model store uses) and only new or changed series are forecast again; series
+    that disappeared from the sales data are dropped. A run is started by the schedule,
+    after ingestion, or via POST /forecast/materialize; requests arriving while a run is in
+    progress are coalesced into one follow-up run.
+    """
+
+    def __init__(
+        self,
+        store: MaterializedForecastStore = forecast_store,
+        horizon: str = MATERIALIZE_HORIZON,
+        engine: Optional[str] = MATERIALIZE_ENGINE
+    ):
+        self.store = store
+        self.horizon = horizon
+        self.engine = engine
+        self._run_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._schedule: Optional[threading.Thread] = None
+        self._rerun: Optional[Tuple[str, bool]] = None
+        self.last_run: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[float] = None
+
+    def run(self, full: bool = False, reason: str = "manual") -> Dict:
+        """Runs one materialization pass in the calling thread and returns its report."""
+        with self._run_lock:
+            started = time.time()
+            # Settings the stored forecasts depend on; when they change, everything is recomputed
+            config = {"horizon": self.horizon, "engine_policy": self.engine or FORECAST_ENGINE}
+            entries, metadata = ({}, {}) if full else self.store.snapshot()
+            if any(metadata.get(name) != value for name, value in config.items()):
+                entries, full = {}, True
+
+            with span("materialize.versions"):
+                index_version = get_series_index().version
+                versions = {key: _data_version(_filter_series(*key)) for key in select_series()}
+                remember_data_versions(index_version, versions)
+            removed = sum(1 for key in entries if key not in versions)
+            entries = {key: entry for key, entry in entries.items() if key in versions}
+            changed = [key for key, version in versions.items() if key not in entries or entries[key].data_version != version]
+
+            metadata = {**config, "generated_at": str(started)}
+            errors = done = 0
+            first_error = None
+            with span("materialize.forecast"):
+                for item in generate_forecast_batch([(*key, self.horizon) for key in changed], engine=self.engine):
+                    key = (item['sku'], item['region'], item['channel'])
+                    if item['status'] == 'ok' and item['forecast_series']:
+                        entries[key] = StoredForecast.from_points(item['forecast_series'], item['engine'], versions[key], time.time())
+                        done += 1
+                        if done % MATERIALIZE_FLUSH_SERIES == 0:
+                            self.store.write(entries, metadata)
+                    else:
+                        # The old data version of a previous forecast (if any) makes the next run retry
+                        errors += 1
+                        first_error = first_error or f"{key}: {item['error'] or 'empty forecast'}"
+            with span("materialize.write"):
+                self.store.write(entries, metadata)
+
+            report = {
+                "reason": reason,
+                "full": full,
+                "series": len(versions),
+                "recomputed": done,
+                "unchanged": len(versions) - len(changed),
+                "removed": removed,
+                "errors": errors,
+                "first_error": first_error,
+                "started_at": started,
+                "seconds": round(time.time() - started, 3),
+            }
+            self.last_run = report
+            print(
+                f"📈 Forecasts materialized ({reason}): {done} recomputed, {report['unchanged']} unchanged, "
+                f"{removed} removed, {errors} failed in {report['seconds']:.1f}s"
+            )
+            return report
+
+    def trigger(self, reason: str, full: bool = False) -> bool:
+        """
+        Starts a run on a background thread. If one is already running, a single follow-up
+        run is queued instead (so data ingested mid-run is picked up). Returns True if started now.
+        """
+        with self._state_lock:
+            if self._thread is not None:
+                queued_full = self._rerun[1] if self._rerun else False
+                self._rerun = (reason, full or queued_full)
+                return False
+            self._thread = threading.Thread(target=self._run_in_background, args=(reason, full), name="forecast-materialize", daemon=True)
+            self._thread.start()
+            return True
+
+    def _run_in_background(self, reason: str, full: bool) -> None:
+        while True:
+            try:
+                report = self.run(full=full, reason=reason)
+                # Series that failed are reported too: their stale entries are no longer served
+                self.last_error = f"{report['errors']} series failed, first: {report['first_error']}" if report["errors"] else None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Forecast materialization failed: {e}")
+            if self.last_error is not None:
+                self.last_error_at = time.time()
+            with self._state_lock:
+                if self._rerun is None:
+                    self._thread = None
+                    return
+                (reason, full), self._rerun = self._rerun, None
+
+    def wait(self) -> None:
+        """Blocks until the current run and any queued follow-up have finished."""
+        while True:
+            with self._state_lock:
+                thread = self._thread
+            if thread is None:
+                return
+            thread.join()
+
+    def start_schedule(self, interval_seconds: float = MATERIALIZE_INTERVAL_SECONDS) -> None:
+        """Triggers an incremental run every interval_seconds (the first one immediately)."""
+        if interval_seconds <= 0 or self._schedule is not None:
+            return
+
+        def _loop() -> None:
+            while True:
+                self.trigger("schedule")
+                time.sleep(interval_seconds)
+
+        self._schedule = threading.Thread(target=_loop, name="forecast-materialize-schedule", daemon=True)
+        self._schedule.start()
+
+    def status(self) -> Dict:
+        with self._state_lock:
+            running = self._thread is not None
+        return {
+            "running": running,
+            "schedule_interval_seconds": MATERIALIZE_INTERVAL_SECONDS if self._schedule is not None else None,
+            "last_run": self.last_run,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+            "store": self.store.stats(),
+        }
+
+    def health(self) -> Dict:
+        """Short summary for /ready: whether a run is active, when the last one finished, and its error."""
+        with self._state_lock:
+            running = self._thread is not None
+        last_run = self.last_run or {}
+        return {
+            "running": running,
+            "last_run_at": last_run.get("started_at"),
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at,
+        }
+
+
+# Data version of each series' current history, reset whenever the series index changes, so
+# serving checks an entry against the history it was made from without rehashing on every lookup
+_data_versions: Dict[str, object] = {"index_version": None, "versions": {}}
+_data_versions_lock = threading.Lock()
+
+
+def remember_data_versions(index_version: int, versions: Dict[SeriesKey, str]) -> None:
+    """Seeds the cache with versions computed against the given series index version."""
+    with _data_versions_lock:
+        if _data_versions["index_version"] != index_version:
+            _data_versions.update(index_version=index_version, versions={})
+        _data_versions["versions"].update(versions)
+
+
+def current_data_versions(keys: List[SeriesKey]) -> Dict[SeriesKey, str]:
+    index_version = get_series_index().version
+    with _data_versions_lock:
+        known = _data_versions["versions"] if _data_versions["index_version"] == index_version else {}
+        versions = {key: known[key] for key in keys if key in known}
+    missing = {key: _data_version(_filter_series(*key)) for key in keys if key not in versions}
+    if missing:
+        remember_data_versions(index_version, missing)
+    return {**versions, **missing}
+
+
+def get_materialized_forecasts(
+    keys: Iterable[SeriesKey],
+    horizon: str,
+    engine: Optional[str] = None
+) -> Dict[SeriesKey, Tuple[List[Dict], StoredForecast]]:
+    """
+    {series: (points, entry)} from the materialized store for the given series. Series are left
+    out when missing, made from history that has changed since, too old, materialized for a
+    shorter horizon, or by a different engine than the one requested.
+    """
+    keys = list(dict.fromkeys(keys))
+    found = forecast_store.get_many(keys)
+    days = horizon_days(horizon)
+    policy = forecast_store.metadata().get("engine_policy")
+    now = time.time()
+    candidates = {
+        key: entry
+        for key, entry in found.items()
+        if not (FORECAST_MATERIALIZED_MAX_AGE_SECONDS and now - entry.generated_at > FORECAST_MATERIALIZED_MAX_AGE_SECONDS)
+        and days <= len(entry.demand)
+        and engine in (None, entry.engine, policy)
+    }
+    versions = current_data_versions(list(candidates))
+    usable = {key: (entry.points(days), entry) for key, entry in candidates.items() if entry.data_version == versions[key]}
+    forecast_store.record("misses", len(keys) - len(found))
+    forecast_store.record("stale", len(found) - len(usable))
+    forecast_store.record("hits", len(usable))
+    return usable
+
+
+def get_materialized_forecast(
+    sku: str,
+    region: str,
+    channel: str,
+    horizon: str,
+    engine: Optional[str] = None
+) -> Optional[Tuple[List[Dict], StoredForecast]]:
+    """(points, entry) of one series from the materialized store, or None (see get_materialized_forecasts)."""
+    return get_materialized_forecasts([(sku, region, channel)], horizon, engine).get((sku, region, channel))
+
+
+def freshness_headers(entry: Optional[StoredForecast]) -> Dict[str, str]:
+    """Response headers telling the client where a forecast came from and how old it is."""
+    if entry is None:
+        return {"X-Forecast-Source": "on-demand"}
+    generated = datetime.fromtimestamp(entry.generated_at, tz=timezone.utc)
+    return {
+        "X-Forecast-Source": "materialized",
+        "X-Forecast-Generated-At": generated.isoformat(timespec="seconds"),
+        "Age": str(max(0, int(time.time() - entry.generated_at))),
+    }
+
+
+# Process-wide materializer (schedule, post-ingestion and manual runs share it)
+forecast_materializer = ForecastMaterializer()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Precompute forecasts for every series into the materialized store.")
+    parser.add_argument("--full", action="store_true", help="Recompute every series, not only the changed ones")
+    args = parser.parse_args()
+    print(forecast_materializer.run(full=args.full, reason="cli"))
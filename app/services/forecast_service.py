@@ -1,75 +1,510 @@
 # app/services/forecast_service.py
+import os
+import time
+import hashlib
+import threading
+import numpy as np
 import pandas as pd
-from prophet import Prophet
-from prophet.make_holidays import make_holidays_df
-from typing import List, Dict
-
-# In a real app, this data would be loaded from a persistent store,
-# but here we load a mock/processed DataFrame once.
-try:
-    # MOCK DATA LOAD: In a real app, sales data is pre-aggregated
-    # sales_df = pd.read_csv('data/sales.csv', parse_dates=['date'])
-    # For a placeholder, let's create a dummy DataFrame:
-    date_range = pd.date_range(start='2023-01-01', periods=365, freq='D')
-    sales_df = pd.DataFrame({
-        'date': date_range,
-        'units_sold': (100 + 5 * date_range.dayofyear + 50 * (date_range.month.isin([6, 12])) + 10 * (date_range.day_name() == 'Friday')).astype(int),
-        'sku': 'SKU123',
-        'region': 'North',
-        'channel': 'online'
-    })
-    sales_df.rename(columns={'date': 'ds', 'units_sold': 'y'}, inplace=True)
-    
-except FileNotFoundError:
-    print("Warning: Mock sales data not found.")
-    sales_df = pd.DataFrame()
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import TYPE_CHECKING, List, Dict, Iterable, Iterator, Optional, Tuple
+from app.schemas import horizon_days
+from app.services.model_store import model_store
+from app.services.forecast_engines import FORECAST_FAST_ENGINE, INTERVAL_WIDTH, INTERVAL_Z, format_points, get_engine, select_engine
+from app.services.series_index import SeriesKey, get_series_index
+from app.services.sales_store import PRODUCT_HIERARCHY_PATH, read_product_hierarchy
+from app.services.telemetry import span
 
+if TYPE_CHECKING:
+    from prophet import Prophet  # Imported on first fit; pulls in cmdstanpy and the Stan backend
+
+# Worker processes of the shared Prophet pool (one fit per process at a time); also the
+# most a single batch may ask for
+FORECAST_MAX_WORKERS = int(os.getenv("FORECAST_MAX_WORKERS", os.cpu_count() or 1))
+# Series submitted per worker before we wait for results, so a batch of thousands
+# does not pickle every history into the pool up front.
+BATCH_SUBMIT_FACTOR = 4
+# Series forecast together in one pass of a vectorized engine (bounds the batch's memory)
+FAST_ENGINE_BATCH_SERIES = int(os.getenv("FAST_ENGINE_BATCH_SERIES", "5000"))
+
+# Hierarchical mode: aggregation levels (product hierarchy columns, grouped within each region)
+HIERARCHY_LEVELS = {"class": ["dept_name", "class_name"], "dept": ["dept_name"]}
+RECONCILIATION_METHODS = ("top_down", "bottom_up", "mint")
+# Recent window over which each SKU's share of its aggregate is measured
+HIERARCHY_PROPORTION_WINDOW_DAYS = int(os.getenv("HIERARCHY_PROPORTION_WINDOW_DAYS", "90"))
+
+# Most recent forecast per series: {(sku, region, channel): (index_version, created_at, points)}
+# Lets cheap consumers (e.g. pricing) reuse a result instead of running Prophet again.
+_recent_forecasts: Dict[Tuple[str, str, str], Tuple[int, float, List[Dict]]] = {}
+_recent_lock = threading.Lock()
+
+
+def _filter_series(sku: str, region: str, channel: str) -> pd.DataFrame:
+    """Returns the (ds, y) history for a single SKU-Region-Channel series (O(1) index lookup)."""
+    series = get_series_index().get(sku, region, channel)
+    return pd.DataFrame({'ds': series['date'].to_numpy(), 'y': series['units_sold'].to_numpy()})
 
-def generate_forecast(sku: str, region: str, channel: str, horizon: str) -> List[Dict]:
-    # 1. Filter Data for specific Time Series (SKU-Region-Channel)
-    filtered_df = sales_df[
-        (sales_df['sku'] == sku) & 
-        (sales_df['region'] == region) & 
-        (sales_df['channel'] == channel)
-    ].copy()
-    
-    if filtered_df.empty:
-        # Fallback for missing data
-        return []
 
+def _new_model() -> "Prophet":
+    from prophet import Prophet
     # 2. Add Holidays (Customizing for Nordic retail)
     # Using holidays for Denmark as a Nordic example
     # Note: Prophet's holiday functionality needs a 'holidays' df.
     # The `make_holidays_df` function is usually for external use,
     # Prophet supports adding country holidays directly via `add_country_holidays`.
-    
-    # 3. Initialize and Fit Prophet Model
     m = Prophet(
-        interval_width=0.90, # 90% confidence interval
+        interval_width=INTERVAL_WIDTH, # 90% confidence interval
         yearly_seasonality=True,
         weekly_seasonality=True,
         daily_seasonality=False
     )
     # m.add_country_holidays(country_name='DK') # Denmark holidays for Nordic example
+    return m
+
+
+def _data_version(history: pd.DataFrame) -> str:
+    """Content hash of a series history; changes whenever rows are added or edited."""
+    return hashlib.sha1(pd.util.hash_pandas_object(history, index=False).values.tobytes()).hexdigest()
+
+
+def _warm_start_params(m: "Prophet") -> Dict:
+    """Fitted parameters of a previous model in the form Prophet.fit(init=...) expects."""
+    return {
+        'k': m.params['k'][0][0],
+        'm': m.params['m'][0][0],
+        'sigma_obs': m.params['sigma_obs'][0][0],
+        'delta': m.params['delta'][0],
+        'beta': m.params['beta'][0],
+    }
+
+
+def _get_or_fit_model(key: Tuple[str, str, str], history: pd.DataFrame) -> "Prophet":
+    """Serves a cached model when the series is unchanged, otherwise refits (warm-started if possible)."""
+    version = _data_version(history)
+    m = model_store.get(key, version)
+    if m is not None:
+        return m
+
+    previous = model_store.latest(key)
+    m = _new_model()
+    warm = False
+    with span("forecast.fit"):
+        if previous is not None:
+            try:
+                m.fit(history, init=_warm_start_params(previous))
+                warm = True
+            except Exception:
+                # Shapes can differ (e.g. fewer changepoints on a short history); fit cold instead
+                m = _new_model()
+        if not warm:
+            m.fit(history)
+
+    model_store.record_fit(warm_start=warm)
+    model_store.put(key, version, m)
+    return m
 
-    m.fit(filtered_df[['ds', 'y']])
+
+def _fit_and_predict(key: Tuple[str, str, str], history: pd.DataFrame, horizon: str) -> List[Dict]:
+    """
+    Fits (or reuses) the Prophet model for one series and returns the future points.
+    Kept at module level so it can be shipped to ProcessPoolExecutor workers.
+    """
+    # 3. Initialize and Fit Prophet Model (cached per series + data version)
+    m = _get_or_fit_model(key, history)
 
     # 4. Create Future Dataframe and Predict
     # horizon e.g., '8w' for 8 weeks
-    future = m.make_future_dataframe(periods=pd.to_timedelta(horizon).days, freq='D')
-    forecast = m.predict(future)
+    with span("forecast.predict"):
+        future = m.make_future_dataframe(periods=horizon_days(horizon), freq='D')
+        forecast = m.predict(future)
 
     # 5. Format Output
-    # Select only the future dates for the API response
-    future_forecast = forecast[forecast['ds'] > filtered_df['ds'].max()]
+    # Select only the future dates for the API response; demand must be a non-negative integer
+    with span("forecast.format"):
+        future_forecast = forecast[forecast['ds'] > history['ds'].max()]
+        result = format_points(
+            future_forecast['ds'].to_numpy(),
+            future_forecast['yhat'].to_numpy(),
+            future_forecast['yhat_lower'].to_numpy(),
+            future_forecast['yhat_upper'].to_numpy(),
+        )
+        
+    return result
+
+
+def generate_forecast_with_engine(
+    sku: str, 
+    region: str, 
+    channel: str, 
+    horizon: str, 
+    engine: Optional[str] = None
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    Forecasts one series with the requested engine (or the FORECAST_ENGINE policy).
+    Returns (points, engine name); no engine is reported when the series has no history.
+    """
+    # 1. Filter Data for specific Time Series (SKU-Region-Channel)
+    with span("forecast.filter"):
+        filtered_df = _filter_series(sku, region, channel)
+    name = select_engine(engine, filtered_df) # Raises ValueError for unknown engine names
     
-    result = []
-    for _, row in future_forecast.iterrows():
-        result.append({
-            'date': row['ds'].strftime('%Y-%m-%d'),
-            'demand': max(0, int(round(row['yhat']))), # Demand must be non-negative integer
-            'confidence_low': max(0, int(round(row['yhat_lower']))),
-            'confidence_high': max(0, int(round(row['yhat_upper']))),
+    if filtered_df.empty:
+        # Fallback for missing data
+        return [], None
+
+    key = (sku, region, channel)
+    result = get_engine(name).forecast({key: filtered_df}, horizon_days(horizon))[key]
+    _remember_forecast(key, result)
+    return result, name
+
+
+def generate_forecast(sku: str, region: str, channel: str, horizon: str, engine: Optional[str] = None) -> List[Dict]:
+    return generate_forecast_with_engine(sku, region, channel, horizon, engine)[0]
+
+
+def _remember_forecast(key: Tuple[str, str, str], points: List[Dict]) -> None:
+    if points:
+        with _recent_lock:
+            _recent_forecasts[key] = (get_series_index().version, time.time(), points)
+
+
+def get_cached_forecasts(keys: Iterable[Tuple[str, str, str]], max_age_seconds: float) -> Dict[Tuple[str, str, str], Tuple[List[Dict], float]]:
+    """
+    {series: (points, age_seconds)} of the last forecasts computed for the given series, for
+    those younger than max_age_seconds with no sales data ingested since. Never fits.
+    """
+    version, now = get_series_index().version, time.time()
+    with _recent_lock:
+        entries = {key: _recent_forecasts.get(key) for key in keys}
+    return {
+        key: (entry[2], now - entry[1])
+        for key, entry in entries.items()
+        if entry is not None and entry[0] == version and now - entry[1] <= max_age_seconds
+    }
+
+
+# One process pool per API worker, shared by batch requests and the materialization job,
+# so concurrent batches neither fork extra processes nor pay the Prophet import again
+_pool_cache: Dict[str, Optional[ProcessPoolExecutor]] = {"pool": None}
+_pool_lock = threading.Lock()
+
+
+def _process_pool(broken: Optional[ProcessPoolExecutor] = None) -> ProcessPoolExecutor:
+    """The shared Prophet pool, created on first use and replaced when `broken` (a dead worker) is still current."""
+    with _pool_lock:
+        if broken is not None and _pool_cache["pool"] is broken:
+            broken.shutdown(wait=False, cancel_futures=True)
+            _pool_cache["pool"] = None
+        if _pool_cache["pool"] is None:
+            _pool_cache["pool"] = ProcessPoolExecutor(max_workers=max(1, FORECAST_MAX_WORKERS))
+        return _pool_cache["pool"]
+
+
+def shutdown_process_pool() -> None:
+    with _pool_lock:
+        if _pool_cache["pool"] is not None:
+            _pool_cache["pool"].shutdown(wait=False, cancel_futures=True)
+            _pool_cache["pool"] = None
+
+
+def select_series(
+    sku: Optional[str] = None, 
+    region: Optional[str] = None, 
+    channel: Optional[str] = None
+) -> List[Tuple[str, str, str]]:
+    """Lists the distinct (sku, region, channel) series matching the optional filter values."""
+    return get_series_index().select(sku, region, channel)
+
+
+def generate_forecast_batch(
+    series: List[Tuple[str, str, str, str]], 
+    max_workers: Optional[int] = None,
+    engine: Optional[str] = None
+) -> Iterator[Dict]:
+    """
+    Forecasts many (sku, region, channel, horizon) series. Prophet series are fitted on the
+    shared process pool, with max_workers (capped at FORECAST_MAX_WORKERS) sizing how many
+    fits this batch keeps queued there; series routed to a vectorized engine (by `engine` or
+    the FORECAST_ENGINE policy) are forecast together in passes of up to FAST_ENGINE_BATCH_SERIES.
+    Yields one result dict per series as soon as it is done (completion order, not input
+    order). A failing series yields status='error' and the batch carries on.
+    """
+    workers = min(max(1, max_workers or FORECAST_MAX_WORKERS), max(1, FORECAST_MAX_WORKERS))
+    max_in_flight = workers * BATCH_SUBMIT_FACTOR
+    pending = iter(series)
+    in_flight = {}
+    fast_groups: Dict[str, List[Tuple[Tuple[str, str, str, str], pd.DataFrame, int]]] = {}
+
+    def _item(key: Tuple[str, str, str, str], status: str, points: List[Dict] = None, error: str = None, engine_name: str = None) -> Dict:
+        sku, region, channel, horizon = key
+        return {
+            'sku': sku, 'region': region, 'channel': channel, 'horizon': horizon, 'engine': engine_name,
+            'status': status, 'forecast_series': points or [], 'error': error,
+        }
+
+    def _run_fast(name: str, group: List[Tuple[Tuple[str, str, str, str], pd.DataFrame, int]]) -> Iterator[Dict]:
+        try:
+            forecasts = get_engine(name).forecast({key[:3]: history for key, history, _ in group}, max(d for _, _, d in group))
+        except Exception as e:
+            for key, _, _ in group:
+                yield _item(key, 'error', error=str(e), engine_name=name)
+            return
+        for key, _, n_days in group:
+            points = forecasts[key[:3]][:n_days]
+            _remember_forecast(key[:3], points)
+            yield _item(key, 'ok', points=points, engine_name=name)
+
+    pool = _process_pool()
+    try:
+        while True:
+            # Top up the pool without materializing every history at once
+            exhausted = False
+            while len(in_flight) < max_in_flight:
+                key = next(pending, None)
+                if key is None:
+                    exhausted = True
+                    break
+                try:
+                    n_days = horizon_days(key[3])
+                except ValueError as e:
+                    # Reported for this series only; the rest of the stream carries on
+                    yield _item(key, 'error', error=f"Invalid horizon '{key[3]}': {e}")
+                    continue
+                history = _filter_series(*key[:3])
+                if history.empty:
+                    yield _item(key, 'error', error="Insufficient historical sales data for this series.")
+                    continue
+                name = select_engine(engine, history)
+                if name != "prophet":
+                    group = fast_groups.setdefault(name, [])
+                    group.append((key, history, n_days))
+                    if len(group) >= FAST_ENGINE_BATCH_SERIES:
+                        yield from _run_fast(name, fast_groups.pop(name))
+                    continue
+                try:
+                    in_flight[pool.submit(_fit_and_predict, key[:3], history, key[3])] = key
+                except BrokenProcessPool:
+                    # A worker process died (e.g. killed for memory); start a fresh pool for the rest
+                    pool = _process_pool(broken=pool)
+                    in_flight[pool.submit(_fit_and_predict, key[:3], history, key[3])] = key
+
+            if exhausted:
+                # Vectorized passes finish in seconds; emit them before waiting on Prophet fits
+                for name in list(fast_groups):
+                    yield from _run_fast(name, fast_groups.pop(name))
+
+            if not in_flight:
+                if exhausted:
+                    break
+                continue
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                key = in_flight.pop(future)
+                try:
+                    points = future.result()
+                    _remember_forecast(key[:3], points)
+                    yield _item(key, 'ok', points=points, engine_name="prophet")
+                except Exception as e:
+                    yield _item(key, 'error', error=str(e), engine_name="prophet")
+    finally:
+        # Consumer went away (e.g. client disconnect): drop fits that have not started;
+        # running ones finish in the shared pool and their results are discarded
+        for future in in_flight:
+            future.cancel()
+
+
+# --- Hierarchical forecasting ---
+_labels_cache: Dict[Tuple[str, Optional[float]], Dict[str, str]] = {}
+_labels_lock = threading.Lock()
+
+
+def _product_labels(level: str) -> Dict[str, str]:
+    """SKU -> aggregate label at `level` (e.g. 'Audio/Headphones'); reloaded when ingestion rewrites the table."""
+    mtime = os.path.getmtime(PRODUCT_HIERARCHY_PATH) if os.path.exists(PRODUCT_HIERARCHY_PATH) else None
+    with _labels_lock:
+        labels = _labels_cache.get((level, mtime))
+    if labels is None:
+        hierarchy = read_product_hierarchy()
+        columns = HIERARCHY_LEVELS[level]
+        label = hierarchy[columns[0]].astype(str)
+        for column in columns[1:]:
+            label = label + "/" + hierarchy[column].astype(str)
+        labels = dict(zip(hierarchy['sku'].astype(str), label))
+        with _labels_lock:
+            _labels_cache.clear()
+            _labels_cache[(level, mtime)] = labels
+    return labels
+
+
+def _as_arrays(points: List[Dict]) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """(dates, demand, low, high) arrays of a formatted forecast series."""
+    return (
+        np.array([p['date'] for p in points], dtype='datetime64[D]'),
+        np.array([p['demand'] for p in points], dtype=float),
+        np.array([p['confidence_low'] for p in points], dtype=float),
+        np.array([p['confidence_high'] for p in points], dtype=float),
+    )
+
+
+def _forecast_aggregates(histories: Dict[SeriesKey, pd.DataFrame], days: int, engine: Optional[str]) -> Dict[SeriesKey, Tuple[str, List[Dict]]]:
+    """Forecasts every aggregate with its engine (one call per engine); returns key -> (engine, points)."""
+    by_engine: Dict[str, Dict[SeriesKey, pd.DataFrame]] = {}
+    for key, history in histories.items():
+        by_engine.setdefault(select_engine(engine, history), {})[key] = history
+    results = {}
+    for name, group in by_engine.items():
+        for key, points in get_engine(name).forecast(group, days).items():
+            results[key] = (name, points)
+    return results
+
+
+def generate_forecast_hierarchical(
+    series: List[SeriesKey],
+    horizon: str,
+    level: str = "class",
+    reconciliation: str = "top_down",
+    engine: Optional[str] = None
+) -> Dict:
+    """
+    Forecasts SKU series through their (dept_name[/class_name], region) aggregates.
+
+    Every aggregate touched by the request is summed from all of its member series and
+    each member's share of it is measured over the last HIERARCHY_PROPORTION_WINDOW_DAYS,
+    both in one grouped pass over the members' histories. Then:
+      top_down  - one model per aggregate (`engine` or the FORECAST_ENGINE policy), split by share
+      bottom_up - members forecast by FORECAST_FAST_ENGINE in one vectorized pass, summed upwards
+      mint      - both levels forecast, then the aggregate/member gap is distributed by
+                  forecast variance (MinT with a diagonal covariance), so the levels add up
+    Returns {'groups': [...], 'forecasts': [...], 'aggregate_fits', 'member_fits'}; requested
+    series without history come back with an empty forecast_series.
+    """
+    if level not in HIERARCHY_LEVELS:
+        raise ValueError(f"Unknown hierarchy level '{level}'. Choose one of: {', '.join(HIERARCHY_LEVELS)}.")
+    if reconciliation not in RECONCILIATION_METHODS:
+        raise ValueError(f"Unknown reconciliation '{reconciliation}'. Choose one of: {', '.join(RECONCILIATION_METHODS)}.")
+    days = horizon_days(horizon)
+    labels = _product_labels(level)
+
+    def group_of(key: SeriesKey) -> Tuple[str, str]:
+        return labels.get(key[0], "unknown"), key[1]
+
+    # 1. Members: every indexed series in an aggregate the request touches
+    with span("forecast.hierarchy.aggregate"):
+        wanted = {group_of(key) for key in series}
+        members = [key for key in get_series_index().keys() if group_of(key) in wanted]
+        histories = {key: _filter_series(*key) for key in members}
+        if not members:
+            return {'level': level, 'reconciliation': reconciliation, 'aggregate_fits': 0, 'member_fits': 0, 'groups': [],
+                    'forecasts': [{'sku': k[0], 'region': k[1], 'channel': k[2], 'forecast_series': [], 'engine': None} for k in series]}
+        groups = sorted({group_of(key) for key in members})
+        group_codes = {group: i for i, group in enumerate(groups)}
+        member_group = np.array([group_codes[group_of(key)] for key in members], dtype=np.int64)
+
+        long = pd.DataFrame({
+            'member': np.repeat(np.arange(len(members)), [len(histories[key]) for key in members]),
+            'ds': np.concatenate([histories[key]['ds'].to_numpy() for key in members]),
+            'y': np.concatenate([histories[key]['y'].to_numpy(dtype=float) for key in members]),
         })
-        
-    return result
\ No newline at end of file
+        long['group'] = member_group[long['member'].to_numpy()]
+
+        # Aggregate histories: one (ds, y) series per group
+        totals = long.groupby(['group', 'ds'], sort=True)['y'].sum().reset_index()
+        aggregate_keys = [(f"{level}:{label}", region, "*") for label, region in groups]
+        aggregates = {
+            aggregate_keys[g]: frame[['ds', 'y']].reset_index(drop=True)
+            for g, frame in totals.groupby('group', sort=True)
+        }
+
+        # Shares of the recent group total (equal split when a group sold nothing recently)
+        window_start = long.groupby('group')['ds'].transform('max') - pd.Timedelta(days=HIERARCHY_PROPORTION_WINDOW_DAYS)
+        recent = long[long['ds'] > window_start]
+        member_sum = recent.groupby('member')['y'].sum().reindex(np.arange(len(members)), fill_value=0.0).to_numpy()
+        group_sum = np.bincount(member_group, weights=member_sum, minlength=len(groups))
+        group_size = np.bincount(member_group, minlength=len(groups))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            share = np.where(group_sum[member_group] > 0, member_sum / group_sum[member_group], 1.0 / group_size[member_group])
+
+        # Days between each member's last observation and its group's: the aggregate forecast
+        # starts after the group's, so earlier-ending members are forecast that much further
+        member_end = long.groupby('member')['ds'].max().to_numpy()
+        group_end = long.groupby('group')['ds'].max().to_numpy()
+        lag = ((group_end[member_group] - member_end) // np.timedelta64(1, 'D')).astype(np.int64)
+
+    # 2. Base forecasts
+    aggregate_fc = _forecast_aggregates(aggregates, days, engine) if reconciliation != "bottom_up" else {}
+    member_fc = get_engine(FORECAST_FAST_ENGINE).forecast(histories, days + int(lag.max())) if reconciliation != "top_down" else {}
+
+    # 3. Disaggregate / reconcile, group by group
+    member_points: Dict[SeriesKey, Tuple[str, List[Dict]]] = {}
+    group_results = []
+    with span("forecast.hierarchy.reconcile"):
+        for g, (label, region) in enumerate(groups):
+            idx = np.flatnonzero(member_group == g)
+            keys = [members[i] for i in idx]
+            if reconciliation == "top_down":
+                name, points = aggregate_fc[aggregate_keys[g]]
+                dates, total, low, high = _as_arrays(points)
+                for i, key in zip(idx, keys):
+                    member_points[key] = (f"top_down/{name}", format_points(dates, share[i] * total, share[i] * low, share[i] * high))
+            else:
+                # Every member cut to the group calendar, so the arrays are summed date by date
+                base = [_as_arrays(member_fc[key][lag[i]:lag[i] + days]) for i, key in zip(idx, keys)]
+                dates = base[0][0]
+                yhat = np.stack([b[1] for b in base])
+                low = np.stack([b[2] for b in base])
+                high = np.stack([b[3] for b in base])
+                # Per-step forecast variances recovered from the interval widths
+                member_var = ((high - low) / (2 * INTERVAL_Z)) ** 2
+                if reconciliation == "bottom_up":
+                    name = f"bottom_up/{FORECAST_FAST_ENGINE}"
+                    total, spread = yhat.sum(axis=0), INTERVAL_Z * np.sqrt(member_var.sum(axis=0))  # Independent member errors
+                    points = format_points(dates, total, total - spread, total + spread)
+                else:
+                    aggregate_name, aggregate_points = aggregate_fc[aggregate_keys[g]]
+                    dates, total, total_low, total_high = _as_arrays(aggregate_points)
+                    # Diagonal MinT: the gap moves each forecast in proportion to its variance
+                    total_var = ((total_high - total_low) / (2 * INTERVAL_Z)) ** 2
+                    gap = total - yhat.sum(axis=0)
+                    denominator = total_var + member_var.sum(axis=0)
+                    with np.errstate(divide='ignore', invalid='ignore'):
+                        weights = np.where(denominator > 0, member_var / denominator, 1.0 / (len(keys) + 1))
+                        total_weight = np.where(denominator > 0, total_var / denominator, 1.0 / (len(keys) + 1))
+                    adjustment = weights * gap
+                    yhat, low, high = yhat + adjustment, low + adjustment, high + adjustment
+                    shift = -total_weight * gap  # Reconciled total = sum of reconciled members
+                    name = f"mint/{aggregate_name}+{FORECAST_FAST_ENGINE}"
+                    points = format_points(dates, total + shift, total_low + shift, total_high + shift)
+                for row, key in enumerate(keys):
+                    member_points[key] = (name, format_points(dates, yhat[row], low[row], high[row]))
+            group_results.append({'group': label, 'region': region, 'members': len(keys), 'engine': name, 'forecast_series': points})
+
+    forecasts = []
+    for key in series:
+        name, points = member_points.get(tuple(key), (None, []))
+        _remember_forecast(tuple(key), points)
+        forecasts.append({'sku': key[0], 'region': key[1], 'channel': key[2], 'forecast_series': points, 'engine': name})
+    return {
+        'level': level,
+        'reconciliation': reconciliation,
+        'aggregate_fits': len(aggregate_fc),
+        'member_fits': len(member_fc),
+        'groups': group_results,
+        'forecasts': forecasts,
+    }
+
+
+def warm_up_backend(days: int = 60) -> None:
+    """
+    Imports Prophet and fits a throwaway model on a short synthetic series, so the compiled
+    Stan model is loaded before the first real request. Nothing is written to the model store.
+    """
+    dates = pd.date_range(end=pd.Timestamp.today().normalize(), periods=days, freq='D')
+    history = pd.DataFrame({'ds': dates, 'y': 10.0 + (dates.dayofweek == 4)})
+    with span("forecast.warmup"):
+        _new_model().fit(history)
+
+
+def get_model_cache_stats() -> Dict[str, float]:
+    """Hit/miss/refit counters of the fitted-model store (this process)."""
+    return model_store.stats()
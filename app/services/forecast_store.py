@@ -0,0 +1,188 @@
+# app/services/forecast_store.py
+import os
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from app.services.forecast_engines import format_points
+
+# --- CONFIGURATION ---
+FORECAST_STORE_PATH = os.getenv("FORECAST_STORE_PATH", "data/forecasts.parquet")
+
+SeriesKey = Tuple[str, str, str]  # (sku, region, channel)
+
+FORECAST_SCHEMA = pa.schema([
+    ('sku', pa.string()),
+    ('region', pa.string()),
+    ('channel', pa.string()),
+    ('engine', pa.dictionary(pa.int8(), pa.string())),
+    ('data_version', pa.string()),  # Content hash of the history the forecast was made from
+    ('generated_at', pa.float64()),  # Unix time
+    ('start', pa.date32()),  # First forecast day; point i is start + i days
+    ('demand', pa.list_(pa.int32())),
+    ('confidence_low', pa.list_(pa.int32())),
+    ('confidence_high', pa.list_(pa.int32())),
+])
+
+
+class StoredForecast(NamedTuple):
+    engine: str
+    data_version: str
+    generated_at: float
+    start: np.datetime64
+    demand: np.ndarray
+    low: np.ndarray
+    high: np.ndarray
+
+    @classmethod
+    def from_points(cls, points: List[Dict], engine: str, data_version: str, generated_at: float) -> "StoredForecast":
+        columns = getattr(points, 'columns', None)
+        if columns is not None:
+            return cls(
+                engine, data_version, generated_at, columns['date'][0],
+                *(columns[name].astype(np.int32) for name in ('demand', 'confidence_low', 'confidence_high'))
+            )
+        return cls(
+            engine, data_version, generated_at, np.datetime64(points[0]['date'], 'D'),
+            np.array([p['demand'] for p in points], dtype=np.int32),
+            np.array([p['confidence_low'] for p in points], dtype=np.int32),
+            np.array([p['confidence_high'] for p in points], dtype=np.int32),
+        )
+
+    def points(self, days: Optional[int] = None) -> List[Dict]:
+        n = len(self.demand) if days is None else min(days, len(self.demand))
+        dates = self.start + np.arange(n)
+        return format_points(dates, self.demand[:n], self.low[:n], self.high[:n])
+
+
+class MaterializedForecastStore:
+    """
+    Precomputed forecasts, one row per series, in a single Parquet file written by the
+    materialization job (forecast_materializer.py).
+
+    Every process keeps the whole table in memory as a dict of small int32 arrays, so
+    serving a forecast is a key lookup plus formatting; no history is touched and no model
+    is fitted. The file is swapped atomically, and readers reload it when its mtime changes.
+    Table metadata records how the run was configured (horizon, engine policy).
+    """
+
+    def __init__(self, path: str = FORECAST_STORE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: Dict[SeriesKey, StoredForecast] = {}
+        self._metadata: Dict[str, str] = {}
+        self._mtime: Optional[float] = None
+        self._stats = {"hits": 0, "misses": 0, "stale": 0}
+
+    def _refresh(self) -> None:
+        try:
+            mtime = os.path.getmtime(self.path)
+        except FileNotFoundError:
+            mtime = None
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime == self._mtime:
+                return
+            self._entries, self._metadata = self._read() if mtime is not None else ({}, {})
+            self._mtime = mtime
+
+    def _read(self) -> Tuple[Dict[SeriesKey, StoredForecast], Dict[str, str]]:
+        table = pq.read_table(self.path)
+        metadata = {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+        if table.num_rows == 0:
+            return {}, metadata
+
+        columns = {name: table.column(name).to_pylist() for name in ('sku', 'region', 'channel', 'engine', 'data_version', 'generated_at')}
+        starts = table.column('start').to_numpy().astype('datetime64[D]')
+        series = []
+        for name in ('demand', 'confidence_low', 'confidence_high'):
+            values = table.column(name).combine_chunks()
+            offsets = values.offsets.to_numpy()
+            # Views into one flat array per column instead of a Python list per series
+            series.append(np.split(values.values.to_numpy(), offsets[1:-1]))
+
+        entries = {
+            (sku, region, channel): StoredForecast(engine, version, generated_at, start, demand, low, high)
+            for sku, region, channel, engine, version, generated_at, start, demand, low, high in zip(
+                columns['sku'], columns['region'], columns['channel'], columns['engine'],
+                columns['data_version'], columns['generated_at'], starts, *series
+            )
+        }
+        return entries, metadata
+
+    def get(self, key: SeriesKey) -> Optional[StoredForecast]:
+        """The materialized forecast of a series, or None."""
+        self._refresh()
+        return self._entries.get(key)
+
+    def get_many(self, keys: Iterable[SeriesKey]) -> Dict[SeriesKey, StoredForecast]:
+        """The materialized forecasts of those series that have one (one freshness check for all)."""
+        self._refresh()
+        entries = self._entries
+        return {key: entries[key] for key in keys if key in entries}
+
+    def metadata(self) -> Dict[str, str]:
+        """How the loaded table was produced (horizon, engine_policy, generated_at)."""
+        self._refresh()
+        with self._lock:
+            return dict(self._metadata)
+
+    def record(self, outcome: str, count: int = 1) -> None:
+        """Counts serving outcomes: 'hits', 'misses' or 'stale' (present but not usable)."""
+        with self._lock:
+            self._stats[outcome] += count
+
+    def snapshot(self) -> Tuple[Dict[SeriesKey, StoredForecast], Dict[str, str]]:
+        """All entries plus the table metadata (the starting point of an incremental run)."""
+        self._refresh()
+        with self._lock:
+            return dict(self._entries), dict(self._metadata)
+
+    def write(self, entries: Dict[SeriesKey, StoredForecast], metadata: Dict[str, str]) -> None:
+        """Replaces the whole table (readers see either the old or the new file, never half of one)."""
+        keys = list(entries)
+        rows = [entries[key] for key in keys]
+        table = pa.table({
+            'sku': [k[0] for k in keys],
+            'region': [k[1] for k in keys],
+            'channel': [k[2] for k in keys],
+            'engine': pa.array([r.engine for r in rows]).dictionary_encode().cast(FORECAST_SCHEMA.field('engine').type),
+            'data_version': [r.data_version for r in rows],
+            'generated_at': pa.array([r.generated_at for r in rows], pa.float64()),
+            'start': pa.array(np.array([r.start for r in rows], dtype='datetime64[D]')),
+            **{
+                name: pa.ListArray.from_arrays(
+                    np.concatenate([[0], np.cumsum([len(a) for a in arrays])]).astype(np.int32),
+                    pa.array(np.concatenate(arrays) if arrays else np.array([], dtype=np.int32), pa.int32()),
+                )
+                for name, arrays in (
+                    ('demand', [r.demand for r in rows]),
+                    ('confidence_low', [r.low for r in rows]),
+                    ('confidence_high', [r.high for r in rows]),
+                )
+            },
+        }, schema=FORECAST_SCHEMA.with_metadata(metadata))
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        pq.write_table(table, tmp)
+        os.replace(tmp, self.path)
+
+    def stats(self) -> Dict:
+        """Lookup counters for this process plus the size and metadata of the loaded table."""
+        self._refresh()
+        with self._lock:
+            stats = dict(self._stats)
+            stats["series"] = len(self._entries)
+            stats["metadata"] = dict(self._metadata)
+        lookups = stats["hits"] + stats["misses"] + stats["stale"]
+        stats["hit_rate"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# Process-wide store (every worker reads the same file)
+forecast_store = MaterializedForecastStore()
@@ -0,0 +1,209 @@
+# app/services/ingestion_jobs.py
+import fcntl
+import hashlib
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import IO, Callable, Dict, List, Optional
+
+# --- CONFIGURATION ---
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "50"))  # Finished jobs kept for polling
+# One lock file per collection here, held while a job runs, so API workers and CLI runs exclude each other
+INGEST_LOCK_DIR = os.getenv("INGEST_LOCK_DIR", "data")
+STAGES = ("download", "preprocess", "embed", "persist")
+ACTIVE = ("queued", "running")
+
+
+class JobCancelled(Exception):
+    """Raised inside the pipeline at the next checkpoint after a job was cancelled."""
+
+
+class IngestionConflict(Exception):
+    """Raised when a collection already has an active ingestion job."""
+
+    def __init__(self, job_id: str):
+        super().__init__(f"Ingestion job {job_id} is already running for this collection.")
+        self.job_id = job_id
+
+
+def lock_collection(collection: str, job_id: str) -> IO:
+    """
+    Takes the collection's ingestion file lock without blocking and records job_id in it.
+    The lock is released when the returned file is closed (or the process exits).
+    Raises IngestionConflict with the holder's job ID if another process or job has it.
+    """
+    os.makedirs(INGEST_LOCK_DIR, exist_ok=True)
+    digest = hashlib.sha1(collection.encode("utf-8")).hexdigest()[:12]
+    handle = open(os.path.join(INGEST_LOCK_DIR, f"ingest-{digest}.lock"), "a+", encoding="utf-8")
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        handle.seek(0)
+        holder = handle.read().strip() or "unknown"
+        handle.close()
+        raise IngestionConflict(holder)
+    handle.truncate(0)
+    handle.write(job_id)
+    handle.flush()
+    return handle
+
+
+class IngestionProgress:
+    """
+    Per-stage progress of one ingestion run (download, preprocess, embed, persist).
+    The pipeline reports into it and calls checkpoint() between chunks/batches, which
+    is where a cancellation takes effect. A standalone instance (CLI runs) just records.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self.stages = {
+            name: {"status": "pending", "rows": 0, "documents": 0, "started_at": None, "finished_at": None}
+            for name in STAGES
+        }
+
+    def start(self, stage: str) -> None:
+        with self._lock:
+            if self.stages[stage]["started_at"] is None:
+                self.stages[stage].update(status="running", started_at=time.time())
+
+    def add(self, stage: str, rows: int = 0, documents: int = 0) -> None:
+        self.start(stage)
+        with self._lock:
+            self.stages[stage]["rows"] += rows
+            self.stages[stage]["documents"] += documents
+
+    def finish(self, stage: str, status: str = "completed") -> None:
+        self.start(stage)
+        with self._lock:
+            if self.stages[stage]["finished_at"] is None:
+                self.stages[stage].update(status=status, finished_at=time.time())
+
+    def cancel(self) -> None:
+        self._cancel.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel.is_set()
+
+    def checkpoint(self) -> None:
+        if self._cancel.is_set():
+            raise JobCancelled("Ingestion cancelled.")
+
+    def close_open_stages(self, status: str) -> None:
+        """Marks stages still running (or never reached) when the job ends early."""
+        with self._lock:
+            for stage in self.stages.values():
+                if stage["status"] == "running":
+                    stage.update(status=status, finished_at=time.time())
+                elif stage["status"] == "pending":
+                    stage["status"] = "skipped"
+
+    def snapshot(self) -> Dict[str, Dict]:
+        now = time.time()
+        with self._lock:
+            report = {}
+            for name, stage in self.stages.items():
+                entry = dict(stage)
+                if stage["started_at"] is not None:
+                    elapsed = max((stage["finished_at"] or now) - stage["started_at"], 1e-9)
+                    entry["elapsed_seconds"] = round(elapsed, 2)
+                    entry["rows_per_second"] = round(stage["rows"] / elapsed, 1)
+                    entry["documents_per_second"] = round(stage["documents"] / elapsed, 1)
+                report[name] = entry
+            return report
+
+
+class IngestionJob:
+    def __init__(self, collection: str, dry_run: bool):
+        self.job_id = uuid.uuid4().hex
+        self.collection = collection
+        self.dry_run = dry_run
+        self.status = "queued"
+        self.message: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.progress = IngestionProgress()
+        self._lock_file: Optional[IO] = None
+
+    def to_dict(self) -> Dict:
+        return {
+            "job_id": self.job_id,
+            "collection": self.collection,
+            "dry_run": self.dry_run,
+            "status": self.status,
+            "message": self.message,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "stages": self.progress.snapshot(),
+        }
+
+
+class IngestionJobManager:
+    """
+    Runs ingestion jobs on background threads so the HTTP request returns immediately.
+    At most one active job per collection, across processes (a file lock under INGEST_LOCK_DIR
+    is held for the job's lifetime); a second submission raises IngestionConflict.
+    Statuses: queued -> running -> succeeded | failed | cancelled.
+    """
+
+    def __init__(self, history: int = INGEST_JOB_HISTORY):
+        self.history = history
+        self._jobs: "OrderedDict[str, IngestionJob]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def submit(self, collection: str, run: Callable[[IngestionProgress], str], dry_run: bool = False) -> IngestionJob:
+        """run(progress) performs the ingestion and returns its summary message."""
+        with self._lock:
+            for job in self._jobs.values():
+                if job.collection == collection and job.status in ACTIVE:
+                    raise IngestionConflict(job.job_id)
+            job = IngestionJob(collection, dry_run)
+            job._lock_file = lock_collection(collection, job.job_id)
+            self._jobs[job.job_id] = job
+            self._prune()
+        threading.Thread(target=self._run, args=(job, run), name=f"ingest-{job.job_id[:8]}", daemon=True).start()
+        return job
+
+    def _run(self, job: IngestionJob, run: Callable[[IngestionProgress], str]) -> None:
+        job.status = "running"
+        try:
+            job.progress.checkpoint()  # Cancelled while still queued
+            job.message = run(job.progress)
+            job.status = "failed" if "Failed" in job.message else "succeeded"
+        except JobCancelled:
+            job.status, job.message = "cancelled", "🛑 Ingestion cancelled; batches committed before the cancel are kept."
+        except Exception as e:
+            job.status, job.message = "failed", f"❌ Ingestion Failed: {e}"
+        finally:
+            job._lock_file.close()
+        job.progress.close_open_stages("cancelled" if job.status == "cancelled" else "failed")
+        job.finished_at = time.time()
+        print(f"📦 Ingestion job {job.job_id} finished: {job.status}")
+
+    def _prune(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job.status not in ACTIVE]
+        for job_id in finished[:max(0, len(self._jobs) - self.history)]:
+            del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[IngestionJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> List[IngestionJob]:
+        with self._lock:
+            return list(reversed(self._jobs.values()))
+
+    def cancel(self, job_id: str) -> Optional[IngestionJob]:
+        """Requests cancellation; the job stops at its next checkpoint. Returns None for unknown IDs."""
+        job = self.get(job_id)
+        if job is not None and job.status in ACTIVE:
+            job.progress.cancel()
+        return job
+
+
+# Process-wide job registry used by the ingestion endpoints
+ingestion_jobs = IngestionJobManager()
@@ -0,0 +1,212 @@
+# app/services/lexical_index.py
+import math
+import os
+import pickle
+import re
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from langchain_core.documents import Document
+
+# --- CONFIGURATION ---
+LEXICAL_INDEX_FILE = "lexical_index.pkl"  # Written next to the Chroma files by ingestion
+INDEXED_FIELDS = ("sku", "name", "dept_name", "class_name")
+# Share of a query's product words that must be indexed terms before the vector search is skipped
+LEXICAL_MIN_COVERAGE = float(os.getenv("LEXICAL_MIN_COVERAGE", "1.0"))
+# Query words that carry intent rather than product vocabulary; ignored for matching
+STOPWORDS = {
+    "a", "an", "and", "the", "for", "in", "on", "of", "to", "with", "or", "me", "my", "show", "find",
+    "best", "good", "great", "cheap", "cheapest", "deal", "deals", "offer", "offers", "discount",
+    "discounts", "sale", "under", "some", "any", "please", "i", "want", "need", "looking",
+}
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN.findall(str(text).casefold())
+
+
+class _Partition:
+    """
+    Inverted index of one (region, channel) slice. Postings are stored CSR-style:
+    the documents containing vocab[token] are indices[indptr[id]:indptr[id + 1]].
+    """
+
+    def __init__(self):
+        self.frame = pd.DataFrame()  # One row per document: metadata columns + page_content
+        self.by_sku: Dict[str, int] = {}
+        self.vocab: Dict[str, int] = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.indices = np.zeros(0, dtype=np.int32)
+        self.prior = np.zeros(0, dtype=np.float32)  # Tie-breaker between equally matching documents
+        # Build buffers, emptied by finalize()
+        self._rows: List[Dict] = []
+        self._token_ids: List[int] = []
+        self._positions: List[int] = []
+        self._prior: List[float] = []
+
+    def postings(self, token: str) -> np.ndarray:
+        token_id = self.vocab[token]
+        return self.indices[self.indptr[token_id]:self.indptr[token_id + 1]]
+
+    def finalize(self) -> None:
+        if self._rows:
+            self.frame = pd.concat([self.frame, pd.DataFrame(self._rows)], ignore_index=True)
+        token_ids = np.asarray(self._token_ids, dtype=np.int64)
+        positions = np.asarray(self._positions, dtype=np.int32)
+        if len(self.indices):
+            # Merge with postings from an earlier finalize()
+            old_ids = np.repeat(np.arange(len(self.indptr) - 1), np.diff(self.indptr))
+            token_ids = np.concatenate([old_ids, token_ids])
+            positions = np.concatenate([self.indices, positions])
+        order = np.lexsort((positions, token_ids))
+        counts = np.bincount(token_ids, minlength=len(self.vocab))
+        self.indptr = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self.indices = positions[order]
+        self.prior = np.concatenate([self.prior, np.asarray(self._prior, dtype=np.float32)])
+        self._rows, self._token_ids, self._positions, self._prior = [], [], [], []
+
+    def documents(self, positions: Iterable[int]) -> List[Document]:
+        rows = self.frame.iloc[list(positions)]
+        records = rows.drop(columns=["page_content"]).to_dict("records")
+        return [
+            Document(page_content=text, metadata={k: v for k, v in meta.items() if not (isinstance(v, float) and math.isnan(v))})
+            for text, meta in zip(rows["page_content"].tolist(), records)
+        ]
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        for buffer in ("_rows", "_token_ids", "_positions", "_prior"):
+            state[buffer] = []
+        return state
+
+
+class LexicalIndex:
+    """
+    In-process keyword/SKU index over the catalog fields in INDEXED_FIELDS, partitioned by
+    (region, channel) exactly like the Chroma metadata filter. Built during ingestion from
+    the same Documents that are embedded, persisted next to the collection and stamped with
+    the collection version it was built for.
+    """
+
+    def __init__(self, version: str = "0"):
+        self.version = version
+        self.partitions: Dict[Tuple[str, str], _Partition] = {}
+
+    def add(self, docs: Iterable[Document], prior: Optional[Callable[[Dict], float]] = None) -> None:
+        """Indexes documents; prior(metadata) ranks documents that match a query equally well (e.g. deal score)."""
+        for doc in docs:
+            meta = doc.metadata
+            key = (str(meta.get("region")), str(meta.get("channel")))
+            part = self.partitions.get(key)
+            if part is None:
+                part = self.partitions[key] = _Partition()
+            position = len(part.frame) + len(part._rows)
+            part._rows.append({**meta, "page_content": doc.page_content})
+            part._prior.append(prior(meta) if prior is not None else 0.0)
+            part.by_sku[str(meta.get("sku")).casefold()] = position
+            for token in set(tokenize(" ".join(str(meta.get(field, "")) for field in INDEXED_FIELDS))):
+                part._token_ids.append(part.vocab.setdefault(token, len(part.vocab)))
+                part._positions.append(position)
+
+    def finalize(self) -> "LexicalIndex":
+        """Compacts everything added so far into the searchable arrays."""
+        for part in self.partitions.values():
+            part.finalize()
+        return self
+
+    def __len__(self) -> int:
+        return sum(len(p.frame) for p in self.partitions.values())
+
+    def search(self, query: str, region: str, channel: str, k: int) -> Tuple[List[Document], bool]:
+        """
+        Returns (top-k documents by IDF-weighted term overlap, confident).
+        Ties are broken by the prior given at build time. confident=True means the lexical
+        answer is good enough on its own: the query names an exact SKU, or at least
+        LEXICAL_MIN_COVERAGE of its product words are indexed and k or more documents
+        contain all of those words. Otherwise the caller should also run the vector search.
+        """
+        part = self.partitions.get((region, channel))
+        if part is None or part.frame.empty:
+            return [], False
+
+        tokens = [t for t in dict.fromkeys(tokenize(query)) if t not in STOPWORDS]
+        exact = [part.by_sku[t] for t in tokens if t in part.by_sku]
+        if not exact and query.strip().casefold() in part.by_sku:
+            exact = [part.by_sku[query.strip().casefold()]]
+        if exact:
+            return part.documents(dict.fromkeys(exact)), True
+
+        known = [t for t in tokens if t in part.vocab]
+        if not known:
+            return [], False
+
+        n_docs = len(part.frame)
+        postings = [part.postings(t) for t in known]
+        positions = np.concatenate(postings)
+        weights = np.concatenate([np.full(len(p), math.log(1.0 + n_docs / len(p))) for p in postings])
+        scores = np.bincount(positions, weights=weights, minlength=n_docs)
+        hits = np.bincount(positions, minlength=n_docs)
+
+        matched = np.flatnonzero(scores)
+        top = matched[np.lexsort((-part.prior[matched], -scores[matched]))[:k]]
+        full_matches = int((hits == len(known)).sum())
+        confident = len(known) / len(tokens) >= LEXICAL_MIN_COVERAGE and full_matches >= k
+        return part.documents(top), confident
+
+    def save(self, chroma_path: str) -> str:
+        path = os.path.join(chroma_path, LEXICAL_INDEX_FILE)
+        os.makedirs(chroma_path, exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            pickle.dump({"version": self.version, "partitions": self.partitions}, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+        return path
+
+    @classmethod
+    def load(cls, chroma_path: str) -> Optional["LexicalIndex"]:
+        path = os.path.join(chroma_path, LEXICAL_INDEX_FILE)
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            payload = pickle.load(f)
+        index = cls(payload["version"])
+        index.partitions = payload["partitions"]
+        return index
+
+
+# Loaded index per Chroma path, with the collection version it was built for
+_loaded: Dict[str, Tuple[str, LexicalIndex]] = {}
+_loaded_lock = threading.Lock()
+
+
+def get_lexical_index(chroma_path: str, version: str) -> Optional[LexicalIndex]:
+    """
+    Loaded index for the collection, reloaded when ingestion publishes a new version. None if
+    absent or stale; only a matching index is kept, so a later call looks again.
+    """
+    with _loaded_lock:
+        looked_up, index = _loaded.get(chroma_path, (None, None))
+        if looked_up == version:
+            return index
+        index = LexicalIndex.load(chroma_path)
+        if index is None or index.version != version:
+            return None
+        _loaded[chroma_path] = (version, index)
+    return index
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int = 60) -> List[Document]:
+    """Merges ranked document lists by sum of 1 / (k + rank), keyed by SKU."""
+    scores: Dict[str, float] = defaultdict(float)
+    first: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking):
+            sku = str(doc.metadata.get("sku"))
+            scores[sku] += 1.0 / (k + rank + 1)
+            first.setdefault(sku, doc)
+    return [first[sku] for sku in sorted(scores, key=scores.get, reverse=True)]
@@ -0,0 +1,110 @@
+# app/services/model_store.py
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+# --- CONFIGURATION ---
+MODEL_STORE_PATH = os.getenv("MODEL_STORE_PATH", "data/models")
+MODEL_CACHE_SIZE = int(os.getenv("MODEL_CACHE_SIZE", "256"))  # Fitted models kept in memory
+
+SeriesKey = Tuple[str, str, str]  # (sku, region, channel)
+
+
+class ForecastModelStore:
+    """
+    Two-tier store of fitted Prophet models keyed by series and data version.
+
+    - Memory tier: LRU of the most recently used series (one model per series).
+    - Disk tier: one JSON file per series (Prophet's own serializer), shared by
+      every process, so batch workers and restarts reuse earlier fits.
+
+    A lookup only counts as a hit when the stored data version matches; a stale
+    model is still returned by `latest()` so the caller can warm-start a refit.
+    """
+
+    def __init__(self, path: str = MODEL_STORE_PATH, max_entries: int = MODEL_CACHE_SIZE):
+        self.path = path
+        self.max_entries = max_entries
+        self._memory: "OrderedDict[SeriesKey, Tuple[str, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "refits": 0, "cold_fits": 0}
+
+    def _file_for(self, key: SeriesKey) -> str:
+        digest = hashlib.sha1("|".join(key).encode("utf-8")).hexdigest()
+        return os.path.join(self.path, f"{digest}.json")
+
+    def _remember(self, key: SeriesKey, data_version: str, model) -> None:
+        with self._lock:
+            self._memory[key] = (data_version, model)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def _load_from_disk(self, key: SeriesKey) -> Optional[Tuple[str, object]]:
+        try:
+            with open(self._file_for(key), "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            from prophet.serialize import model_from_json  # Deferred: importing prophet loads the Stan backend
+            return payload["data_version"], model_from_json(payload["model"])
+        except (FileNotFoundError, KeyError, ValueError):
+            return None
+
+    def get(self, key: SeriesKey, data_version: str):
+        """Returns the fitted model for this exact data version, or None (a miss)."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and entry[0] == data_version:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return entry[1]
+
+        entry = self._load_from_disk(key)
+        if entry is not None and entry[0] == data_version:
+            self._remember(key, *entry)
+            with self._lock:
+                self._stats["disk_hits"] += 1
+            return entry[1]
+
+        with self._lock:
+            self._stats["misses"] += 1
+        return None
+
+    def latest(self, key: SeriesKey):
+        """Returns the most recent model for the series regardless of data version (for warm starts)."""
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None:
+            entry = self._load_from_disk(key)
+        return entry[1] if entry is not None else None
+
+    def put(self, key: SeriesKey, data_version: str, model) -> None:
+        """Stores a freshly fitted model in both tiers."""
+        from prophet.serialize import model_to_json
+        self._remember(key, data_version, model)
+
+        os.makedirs(self.path, exist_ok=True)
+        target = self._file_for(key)
+        tmp = f"{target}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"key": list(key), "data_version": data_version, "model": model_to_json(model)}, f)
+        os.replace(tmp, target)  # Atomic, so concurrent workers never read half a file
+
+    def record_fit(self, warm_start: bool) -> None:
+        with self._lock:
+            self._stats["refits" if warm_start else "cold_fits"] += 1
+
+    def stats(self) -> Dict[str, float]:
+        """Hit/miss/refit counters for this process plus the memory tier size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+# Process-wide store shared by the forecast service
+model_store = ForecastModelStore()
@@ -1,51 +1,77 @@
+import asyncio
 import json
-from typing import List, Dict, Optional, Tuple
-from langchain_community.llms import Ollama
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import OllamaEmbeddings
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema.output_parser import PydanticOutputParser
-from app.schemas import DealResponse
+import threading
+from typing import TYPE_CHECKING, AsyncIterator, Iterator, List, Dict, Optional, Tuple
+from app.schemas import DealItem, DealNarration, DealResponse
+from app.services.deal_cache import deal_cache, normalize_query, read_collection_version
+from app.services.compute_scheduler import compute
+from app.services.telemetry import span
+
+if TYPE_CHECKING:
+    from langchain.prompts import ChatPromptTemplate
+
+# langchain, chromadb and the lexical/vector indexes (langchain_core) are imported on first
+# use, so importing this module (and the deals router) stays cheap at worker startup.
 import os
 import sys
 
 # Configuration
-OLLAMA_URL = "http://localhost:11434"
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
 OLLAMA_MODEL = "llama3.2" 
 EMBEDDING_MODEL = "nomic-embed-text" 
-CHROMA_PATH = "./chroma_db"
+CHROMA_PATH = os.getenv("CHROMA_PATH", "./chroma_db")
 CHROMA_COLLECTION = "retail_products"
+HYBRID_RETRIEVAL = os.getenv("HYBRID_RETRIEVAL", "1") == "1"  # Use the lexical/SKU index alongside vector search
+
+_retrieval_stats = {"lexical_only": 0, "hybrid": 0, "vector_only": 0}
+_stats_lock = threading.Lock()
 
 # Global cache for components (initialized only once)
 _rag_cache: Dict[str, Optional[any]] = {
     "llm": None,
     "embeddings": None,
     "vectorstore": None,
-    "parser": PydanticOutputParser(pydantic_object=DealResponse)
+    "parser": None
 }
+_rag_lock = threading.Lock()
 
 def get_rag_components():
     """Initializes and returns Ollama and Chroma components, caching them after first use."""
-    global _rag_cache
-    
-    if _rag_cache["vectorstore"] is None:
-        try:
-            print("RAG: Initializing Ollama embeddings and Chroma connection...")
-            _rag_cache["llm"] = Ollama(model=OLLAMA_MODEL, base_url=OLLAMA_URL)
-            _rag_cache["embeddings"] = OllamaEmbeddings(model=EMBEDDING_MODEL, base_url=OLLAMA_URL)
-            
-            _rag_cache["vectorstore"] = Chroma(
-                persist_directory=CHROMA_PATH, 
-                embedding_function=_rag_cache["embeddings"],
-                collection_name=CHROMA_COLLECTION
-            )
-        except Exception as e:
-            print(f"RAG Service Initialization Error: {e}")
-            raise ConnectionError(f"RAG service failed to connect to Ollama or Chroma. Error: {e}")
+    # Concurrent first requests (threadpool workers) initialize once
+    with _rag_lock:
+        if _rag_cache["vectorstore"] is None:
+            _init_rag_components()
 
     return _rag_cache["llm"], _rag_cache["vectorstore"], _rag_cache["parser"]
 
 
+def _init_rag_components() -> None:
+    """Builds the Ollama/Chroma components into _rag_cache (called under _rag_lock)."""
+    try:
+        print("RAG: Initializing Ollama embeddings and Chroma connection...")
+        from langchain_community.llms import Ollama
+        from langchain_community.vectorstores import Chroma
+        from langchain_community.embeddings import OllamaEmbeddings
+        from langchain.schema.output_parser import PydanticOutputParser
+        from app.services.embedding_cache import CachedEmbeddings, get_embedding_cache
+        _rag_cache["parser"] = PydanticOutputParser(pydantic_object=DealNarration)
+        _rag_cache["llm"] = Ollama(model=OLLAMA_MODEL, base_url=OLLAMA_URL)
+        # Query embeddings are served from the shared content-addressed cache when possible
+        _rag_cache["embeddings"] = CachedEmbeddings(
+            OllamaEmbeddings(model=EMBEDDING_MODEL, base_url=OLLAMA_URL),
+            get_embedding_cache(EMBEDDING_MODEL)
+        )
+        
+        _rag_cache["vectorstore"] = Chroma(
+            persist_directory=CHROMA_PATH, 
+            embedding_function=_rag_cache["embeddings"],
+            collection_name=CHROMA_COLLECTION
+        )
+    except Exception as e:
+        print(f"RAG Service Initialization Error: {e}")
+        raise ConnectionError(f"RAG service failed to connect to Ollama or Chroma. Error: {e}")
+
+
 def format_docs(docs: List) -> str:
     """Formats retrieved documents into a string for the LLM prompt."""
     context_list = []
@@ -63,70 +89,341 @@ def format_docs(docs: List) -> str:
     return "\n".join(context_list)
 
 
-def search_deals(query: str, region: str, channel: str, top_k: int) -> DealResponse:
-    llm, vectorstore, parser = get_rag_components() # Initialize components here
-    
+def deal_score(metadata: Dict) -> float:
+    """Balanced deal score (Discount * QualityScore) / Price, computed exactly from Chroma metadata."""
+    price = float(metadata.get('price', 999.0))
+    if price <= 0:
+        return 0.0
+    return float(metadata.get('discount', 0.0)) * float(metadata.get('quality_score', 5)) / price
+
+
+def rank_candidates(docs: List, top_k: int) -> List:
+    """Orders retrieved documents by deal_score (best first), drops duplicate SKUs and keeps top_k."""
+    ranked, seen = [], set()
+    for doc in sorted(docs, key=lambda d: deal_score(d.metadata), reverse=True):
+        sku = doc.metadata.get('sku')
+        if sku in seen:
+            continue
+        seen.add(sku)
+        ranked.append(doc)
+        if len(ranked) == top_k:
+            break
+    return ranked
+
+
+def template_reason(metadata: Dict) -> str:
+    """Deterministic one-sentence reason used in fast mode and when the LLM gives none."""
+    discount = float(metadata.get('discount', 0.0))
+    quality = int(metadata.get('quality_score', 5))
+    price = float(metadata.get('price', 999.0))
+    if discount >= 1.0:
+        return f"{discount:.0f}% off a {quality}/10 quality product, now ${price:.2f}."
+    return f"Solid {quality}/10 quality for ${price:.2f}."
+
+
+def to_deal_item(doc, reason: str) -> DealItem:
+    metadata = doc.metadata
+    return DealItem(
+        sku=str(metadata.get('sku', 'N/A')),
+        name=str(metadata.get('name', 'N/A')),
+        price=float(metadata.get('price', 999.0)),
+        quality_score=int(metadata.get('quality_score', 5)),
+        discount_percent=float(metadata.get('discount', 0.0)),
+        reason=reason,
+    )
+
+
+def template_explanation(query: str, items: List[DealItem]) -> str:
+    best = items[0]
+    return (
+        f"Top {len(items)} deals for '{query}', ranked by discount and quality relative to price. "
+        f"Best value: {best.name} at ${best.price:.2f} ({best.discount_percent:.0f}% off, quality {best.quality_score}/10)."
+    )
+
+
+def _vector_search(query: str, region: str, channel: str, k: int) -> List:
+    from app.services.vector_index import VECTOR_BACKEND, get_vector_index
+    _, vectorstore, _ = get_rag_components() # Initialize components here
+    with span("deals.embed"):
+        query_vector = _rag_cache["embeddings"].embed_query(query)
+
+    if VECTOR_BACKEND == "numpy":
+        # Memory-mapped index: the region/channel filter is a partition lookup
+        index = get_vector_index(CHROMA_PATH, read_collection_version(CHROMA_PATH))
+        if index is not None:
+            with span("deals.vector_search"):
+                return index.search(query_vector, region, channel, k)
+        print("RAG: numpy vector index not built for this collection version; using Chroma.")
+
     chroma_filter = {
         "$and": [
             {"region": {"$eq": region}},
             {"channel": {"$eq": channel}}
         ]
     }
-    
-    retrieved_docs = vectorstore.similarity_search(query, k=top_k * 3, where=chroma_filter)
 
-    if not retrieved_docs:
-        return DealResponse(query=query, deals=[], explanation=f"No products found matching '{query}' in {region}/{channel}. Run ingestion first?")
+    with span("deals.vector_search"):
+        return vectorstore.similarity_search_by_vector(query_vector, k=k, filter=chroma_filter)
 
-    context_str = format_docs(retrieved_docs)
 
-    template = f"""
-    You are an expert retail deals analyzer. Your task is to rank the best product deals from the provided context 
-    based on the user's query, prioritizing products with a low price, high quality_score (1-10), and a high discount.
-    
-    User Query: {{query}}
-    Filter Details: Region={{region}}, Channel={{channel}}
+def _count_retrieval(kind: str) -> None:
+    with _stats_lock:
+        _retrieval_stats[kind] += 1
+
+
+def retrieve_candidates(query: str, region: str, channel: str, top_k: int) -> List:
+    """
+    Hybrid retrieval within the region/channel, then deterministic pre-ranking down to top_k.
+    Exact SKU lookups and confident keyword matches are answered from the lexical index
+    without embedding the query; otherwise lexical and vector results are merged with
+    reciprocal-rank fusion (vector search only when no lexical index is available).
+    """
+    from app.services.lexical_index import get_lexical_index, reciprocal_rank_fusion
+    with span("deals.retrieve"):
+        pool = top_k * 3
+        lexical = get_lexical_index(CHROMA_PATH, read_collection_version(CHROMA_PATH)) if HYBRID_RETRIEVAL else None
+        if lexical is None:
+            _count_retrieval("vector_only")
+            docs = _vector_search(query, region, channel, pool)
+        else:
+            with span("deals.lexical_search"):
+                lexical_docs, confident = lexical.search(query, region, channel, pool)
+            if confident:
+                _count_retrieval("lexical_only")
+                docs = lexical_docs
+            else:
+                _count_retrieval("hybrid")
+                vector_docs = _vector_search(query, region, channel, pool)
+                docs = reciprocal_rank_fusion([lexical_docs, vector_docs])[:pool]
+        with span("deals.rank"):
+            return rank_candidates(docs, top_k)
+
+
+def build_deal_prompt(parser) -> "ChatPromptTemplate":
+    """Prompt asking the LLM only for the text fields of already-ranked deals."""
+    from langchain.prompts import ChatPromptTemplate
+    template = """
+    You are an expert retail deals assistant. The products below have ALREADY been selected and ranked
+    (best first) by a balanced score of (Discount * QualityScore) / Price for the user's query.
+    Do not re-rank, add or remove products.
     
-    **CRITERIA**: Rank by a balanced score of (Discount * QualityScore) / Price. Select only the top {{{{top_k}}}} items.
+    User Query: {query}
+    Filter Details: Region={region}, Channel={channel}
     
-    CONTEXT (Retrieved Products):
-    {{context}}
+    CONTEXT (Ranked Products):
+    {context}
     
     INSTRUCTIONS: 
     1. STRICTLY follow the JSON schema provided below for your response.
     2. Do NOT include any text outside the JSON block.
-    3. The 'reason' field for each deal must be a single, friendly, and concise sentence.
-    4. The 'explanation' field must be a short paragraph summarizing why these deals were chosen overall.
+    3. Give one entry in 'reasons' per product, in the same order, with its exact SKU. Each 'reason' must be a single, friendly, and concise sentence.
+    4. The 'explanation' field must be a short paragraph summarizing why these deals stand out overall.
     
     JSON Schema:
-    {{format_instructions}}
+    {format_instructions}
     """
+    return ChatPromptTemplate.from_messages([
+        ("system", template),
+        ("human", "Find the best deals for: {query}")
+    ]).partial(format_instructions=parser.get_format_instructions())
+
+
+def deal_cache_key(query: str, region: str, channel: str, top_k: int, fast: bool) -> Tuple:
+    return (normalize_query(query), region, channel, top_k, fast, read_collection_version(CHROMA_PATH))
+
+
+def search_deals(query: str, region: str, channel: str, top_k: int, fast: bool = False) -> DealResponse:
+    """
+    Finds and ranks the best deals for a query. Ranking is computed from metadata; the LLM
+    only writes the reasons and explanation, and fast=True skips the LLM entirely.
+    Identical requests (normalized query, filters, top_k, mode) against the same collection
+    version are served from the deal cache, and concurrent identical requests share one call.
+    """
+    key = deal_cache_key(query, region, channel, top_k, fast)
+    response = deal_cache.get_or_compute(key, lambda: _search_deals(query, region, channel, top_k, fast))
+    response.query = query  # Cached entries may come from a differently-cased query
+    return response
+
+
+def _search_deals(query: str, region: str, channel: str, top_k: int, fast: bool) -> Tuple[DealResponse, bool]:
+    """Runs retrieve -> rank -> (LLM narration). Returns (response, cacheable); fallbacks are not cacheable."""
+    ranked_docs = retrieve_candidates(query, region, channel, top_k)
+
+    if not ranked_docs:
+        return DealResponse(query=query, deals=[], explanation=f"No products found matching '{query}' in {region}/{channel}. Run ingestion first?"), False
+
+    if fast:
+        items = [to_deal_item(doc, template_reason(doc.metadata)) for doc in ranked_docs]
+        return DealResponse(query=query, deals=items, explanation=template_explanation(query, items)), True
+
+    llm, _, parser = get_rag_components()
     
-    # 1. Create the prompt template
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", template.replace("{{format_instructions}}", parser.get_format_instructions())),
-        ("human", f"Find the best deals for: {{query}}")
-    ])
-
-    # 2. Define the input variables for the chain
-    # This dictionary provides all the necessary values for the prompt templates.
+    # 1. Define the input variables for the prompt (the LLM sees only the final top_k products)
     chain_input = {
         "query": query,
         "region": region,
         "channel": channel,
-        "top_k": top_k,
-        "context": context_str
+        "context": format_docs(ranked_docs)
     }
     
-    # 3. Create the final chain: prompt -> llm -> parser
-    # The PydanticOutputParser (parser) is now correctly integrated at the end of the chain.
-    chain = prompt | llm | parser
-    
-    # 4. Invoke the chain
+    # 2. Run prompt -> llm -> parser step by step (so each stage is timed) and merge the text onto the ranking
     try:
-        # Pass the prepared input dictionary to the chain
-        return chain.invoke(chain_input)
+        with span("deals.prompt"):
+            prompt_value = build_deal_prompt(parser).invoke(chain_input)
+        with span("deals.generate"):
+            raw = llm.invoke(prompt_value)
+        with span("deals.parse"):
+            narration = parser.parse(raw)
     except Exception as e:
         print(f"LLM Chain Invocation or Parsing Error: {e}")
-        # Fallback response if LLM output cannot be parsed
-        return DealResponse(query=query, deals=[], explanation=f"AI parsing failed. Error: {e}. Check Ollama server logs.")
\ No newline at end of file
+        # Fallback: keep the ranking, use template text, and do not cache
+        items = [to_deal_item(doc, template_reason(doc.metadata)) for doc in ranked_docs]
+        return DealResponse(query=query, deals=items, explanation=f"AI explanation unavailable (check Ollama server logs). {template_explanation(query, items)}"), False
+
+    reasons = {r.sku: r.reason for r in narration.reasons}
+    items = [to_deal_item(doc, reasons.get(str(doc.metadata.get('sku'))) or template_reason(doc.metadata)) for doc in ranked_docs]
+    return DealResponse(query=query, deals=items, explanation=narration.explanation), True
+
+
+def iter_json_objects(text: str, array_key: str, start: int = 0) -> Iterator[Tuple[Dict, int]]:
+    """
+    Yields (object, end_offset) for every complete JSON object inside the array under
+    `array_key` in a possibly truncated JSON document. Lets the streaming endpoint emit
+    each deal as soon as its closing brace arrives; pass the last end_offset as `start`.
+    """
+    key_pos = text.find(f'"{array_key}"')
+    if key_pos < 0:
+        return
+    array_pos = text.find('[', key_pos)
+    if array_pos < 0:
+        return
+    i = max(start, array_pos + 1)
+    depth, obj_start, in_string, escaped = 0, None, False, False
+    while i < len(text):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == '\\':
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == '{':
+            if depth == 0:
+                obj_start = i
+            depth += 1
+        elif ch == '}':
+            depth -= 1
+            if depth == 0 and obj_start is not None:
+                try:
+                    yield json.loads(text[obj_start:i + 1]), i + 1
+                except ValueError:
+                    pass
+                obj_start = None
+        elif ch == ']' and depth == 0:
+            return
+        i += 1
+
+
+async def stream_deals(query: str, region: str, channel: str, top_k: int, fast: bool = False) -> AsyncIterator[Tuple[str, Dict]]:
+    """
+    Streaming variant of search_deals yielding (event, payload) pairs:
+      candidates  - ranked DealItems with template reasons, right after retrieval
+      deal        - each DealItem with its LLM reason, as soon as it parses from the partial output
+      explanation - the overall explanation
+      done        - the final DealResponse
+    Closing the iterator (e.g. on client disconnect) stops the Ollama generation.
+    """
+    # Everything that can block (file reads, lazy Ollama/Chroma init, embedding and vector
+    # search, prompt rendering) runs on worker threads, never on the event loop
+    key = await asyncio.to_thread(deal_cache_key, query, region, channel, top_k, fast)
+    cached = deal_cache.peek(key)
+    if cached is not None:
+        cached.query = query
+        yield "candidates", {"deals": [d.model_dump() for d in cached.deals], "cached": True}
+        yield "explanation", {"explanation": cached.explanation}
+        yield "done", cached.model_dump()
+        return
+
+    ranked_docs = await compute.run("rag", retrieve_candidates, query, region, channel, top_k)
+    candidates = [to_deal_item(doc, template_reason(doc.metadata)) for doc in ranked_docs]
+    yield "candidates", {"deals": [d.model_dump() for d in candidates], "cached": False}
+
+    if not ranked_docs:
+        response = DealResponse(query=query, deals=[], explanation=f"No products found matching '{query}' in {region}/{channel}. Run ingestion first?")
+        yield "explanation", {"explanation": response.explanation}
+        yield "done", response.model_dump()
+        return
+
+    if fast:
+        response = DealResponse(query=query, deals=candidates, explanation=template_explanation(query, candidates))
+        deal_cache.put(key, response)
+        yield "explanation", {"explanation": response.explanation}
+        yield "done", response.model_dump()
+        return
+
+    llm, _, parser = await asyncio.to_thread(get_rag_components)
+    def _render_prompt():
+        return build_deal_prompt(parser).invoke({
+            "query": query,
+            "region": region,
+            "channel": channel,
+            "context": format_docs(ranked_docs)
+        })
+
+    with span("deals.prompt"):
+        prompt_value = await asyncio.to_thread(_render_prompt)
+
+    by_sku = {item.sku: item for item in candidates}
+    reasons: Dict[str, str] = {}
+    buffer, offset = "", 0
+    stream = llm.astream(prompt_value)
+    try:
+        with span("deals.generate"):
+            async for chunk in stream:
+                buffer += chunk
+                for obj, offset in iter_json_objects(buffer, "reasons", offset):
+                    sku = str(obj.get("sku", ""))
+                    if sku in by_sku and sku not in reasons and obj.get("reason"):
+                        reasons[sku] = obj["reason"]
+                        yield "deal", by_sku[sku].model_copy(update={"reason": reasons[sku]}).model_dump()
+    finally:
+        await stream.aclose()  # Cancels the HTTP request to Ollama if we stop early
+
+    items = [by_sku[item.sku].model_copy(update={"reason": reasons[item.sku]}) if item.sku in reasons else item for item in candidates]
+    try:
+        with span("deals.parse"):
+            explanation = (await asyncio.to_thread(parser.parse, buffer)).explanation
+        cacheable = True
+    except Exception as e:
+        print(f"LLM Streaming Parse Error: {e}")
+        explanation = f"AI explanation unavailable (check Ollama server logs). {template_explanation(query, items)}"
+        cacheable = False
+
+    response = DealResponse(query=query, deals=items, explanation=explanation)
+    if cacheable:
+        deal_cache.put(key, response)
+    yield "explanation", {"explanation": explanation}
+    yield "done", response.model_dump()
+
+
+def get_embedding_cache_stats() -> Dict:
+    """Hit-rate metrics of the embedding cache used for query embeddings."""
+    from app.services.embedding_cache import get_embedding_cache
+    return get_embedding_cache(EMBEDDING_MODEL).stats()
+
+
+def get_retrieval_stats() -> Dict:
+    """How deal queries were answered: lexical index only (no embedding), hybrid, or vector only."""
+    with _stats_lock:
+        stats = dict(_retrieval_stats)
+    total = sum(stats.values())
+    stats["embedding_skip_rate"] = round(stats["lexical_only"] / total, 4) if total else 0.0
+    return stats
+
+
+def get_deal_cache_stats() -> Dict:
+    """Hit/coalescing counters of the deal-result cache."""
+    return deal_cache.stats()
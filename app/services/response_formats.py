@@ -0,0 +1,190 @@
+# app/services/response_formats.py
+import asyncio
+import io
+import time
+from typing import AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Union
+
+import numpy as np
+import orjson
+import pyarrow as pa
+from fastapi import HTTPException
+from fastapi.responses import Response, StreamingResponse
+from starlette.background import BackgroundTask
+
+# --- CONFIGURATION ---
+# json    - the documented Pydantic response models (default)
+# compact - forecast series as parallel arrays (date, demand, confidence_low, confidence_high)
+#           and batch results as one array per field, encoded by orjson without model validation
+# arrow   - Apache Arrow IPC stream, one row per series (forecasts) or per recommendation (pricing)
+RESPONSE_FORMATS = ("json", "compact", "arrow")
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+POINT_FIELDS = ('date', 'demand', 'confidence_low', 'confidence_high')
+# Streamed Arrow results are sent in record batches of up to this many rows, or whatever
+# has arrived after ARROW_FLUSH_SECONDS (slow Prophet fits still show up promptly)
+ARROW_BATCH_ROWS = 256
+ARROW_FLUSH_SECONDS = 1.0
+
+# Forecast rows: series identity and status, then the points as list columns (one list per series)
+FORECAST_ARROW_SCHEMA = pa.schema([
+    ('sku', pa.string()),
+    ('region', pa.string()),
+    ('channel', pa.string()),
+    ('horizon', pa.string()),
+    ('engine', pa.string()),
+    ('status', pa.string()),
+    ('error', pa.string()),
+    ('date', pa.list_(pa.date32())),
+    ('demand', pa.list_(pa.int32())),
+    ('confidence_low', pa.list_(pa.int32())),
+    ('confidence_high', pa.list_(pa.int32())),
+])
+PRICING_ARROW_SCHEMA = pa.schema([
+    ('sku', pa.string()),
+    ('elasticity_coefficient', pa.float64()),
+    ('recommended_price', pa.float64()),
+    ('max_profit_estimate', pa.float64()),
+    ('rationale', pa.string()),
+    ('demand_source', pa.string()),
+])
+
+
+def check_response_format(response_format: str, allowed: Sequence[str] = RESPONSE_FORMATS) -> None:
+    if response_format not in allowed:
+        raise HTTPException(status_code=400, detail=f"Unknown format '{response_format}'. Choose one of: {', '.join(allowed)}.")
+
+
+def point_columns(points: List[Dict]) -> Dict[str, Union[List, np.ndarray]]:
+    """A forecast series as parallel arrays instead of one object per day (from the engine arrays when kept)."""
+    columns = getattr(points, 'columns', None)
+    if columns is None:
+        return {field: [p[field] for p in points] for field in POINT_FIELDS}
+    return {'date': np.datetime_as_string(columns['date'], unit='D').tolist(), **{field: columns[field] for field in POINT_FIELDS[1:]}}
+
+
+def compact_forecast(item: Dict) -> Dict:
+    """A forecast result dict with its forecast_series in columnar form."""
+    return {**item, 'forecast_series': point_columns(item.get('forecast_series') or [])}
+
+
+def record_columns(records: List[Dict], fields: Sequence[str]) -> Dict[str, List]:
+    """Records (e.g. pricing results) as one array per field."""
+    return {field: [r.get(field) for r in records] for field in fields}
+
+
+def encode_compact(content) -> bytes:
+    return orjson.dumps(content, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def compact_response(content, headers: Optional[Dict[str, str]] = None) -> Response:
+    return Response(encode_compact(content), media_type="application/json", headers=headers)
+
+
+def _series_arrays(points: List[Dict]) -> Dict[str, np.ndarray]:
+    columns = getattr(points, 'columns', None)
+    if columns is not None:
+        return columns
+    return {
+        'date': np.array([p['date'] for p in points], dtype='datetime64[D]'),
+        **{field: np.array([p[field] for p in points], dtype=np.int64) for field in POINT_FIELDS[1:]},
+    }
+
+
+def forecast_record_batch(items: List[Dict]) -> pa.RecordBatch:
+    """Forecast result dicts (GET /forecast or batch items) as one Arrow record batch."""
+    series = [_series_arrays(item.get('forecast_series') or []) for item in items]
+    offsets = pa.array(np.concatenate([[0], np.cumsum([len(s['date']) for s in series])]), pa.int32())
+
+    def _lists(field: str, dtype, value_type: pa.DataType) -> pa.ListArray:
+        values = np.concatenate([s[field] for s in series]).astype(dtype) if series else np.array([], dtype=dtype)
+        return pa.ListArray.from_arrays(offsets, pa.array(values, value_type))
+
+    scalars = [field.name for field in FORECAST_ARROW_SCHEMA if not pa.types.is_list(field.type)]
+    return pa.record_batch(
+        [pa.array([item.get(name) for item in items], pa.string()) for name in scalars]
+        + [_lists('date', 'datetime64[D]', pa.date32())]
+        + [_lists(field, np.int32, pa.int32()) for field in POINT_FIELDS[1:]],
+        schema=FORECAST_ARROW_SCHEMA,
+    )
+
+
+def pricing_record_batch(results: List[Dict]) -> pa.RecordBatch:
+    return pa.RecordBatch.from_pylist(results, schema=PRICING_ARROW_SCHEMA)
+
+
+async def _aiter(items: Union[Iterable, AsyncIterable]) -> AsyncIterator:
+    if hasattr(items, "__aiter__"):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def chunked(
+    items: Union[Iterable[Dict], AsyncIterable[Dict]],
+    rows: int = ARROW_BATCH_ROWS,
+    max_seconds: float = ARROW_FLUSH_SECONDS
+) -> AsyncIterator[List[Dict]]:
+    """
+    Groups a result stream into lists of up to `rows`. A partial list is flushed once its first
+    item has waited `max_seconds`, even while the next item is still being produced.
+    """
+    iterator = _aiter(items)
+    chunk: List[Dict] = []
+    deadline = 0.0
+    pending: Optional[asyncio.Future] = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            # asyncio.wait (unlike wait_for) leaves the pending item running when the timer fires
+            finished, _ = await asyncio.wait({pending}, timeout=max(0.0, deadline - time.monotonic()) if chunk else None)
+            if not finished:
+                yield chunk
+                chunk = []
+                continue
+            step, pending = pending, None
+            try:
+                item = step.result()
+            except StopAsyncIteration:
+                break
+            if not chunk:
+                deadline = time.monotonic() + max_seconds
+            chunk.append(item)
+            if len(chunk) >= rows:
+                yield chunk
+                chunk = []
+    finally:
+        if pending is not None:
+            # Consumer went away mid-wait: stop the pending step first
+            pending.cancel()
+            await asyncio.wait({pending})
+        await iterator.aclose()  # Lets the source release its resources (e.g. a compute slot)
+    if chunk:
+        yield chunk
+
+
+async def arrow_stream(schema: pa.Schema, batches: Union[Iterable[pa.RecordBatch], AsyncIterable[pa.RecordBatch]]) -> AsyncIterator[bytes]:
+    """Arrow IPC stream bytes, yielded batch by batch so large results start flowing early."""
+    buffer = io.BytesIO()
+
+    def _drain() -> bytes:
+        data = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return data
+
+    with pa.ipc.new_stream(buffer, schema) as writer:
+        async for batch in _aiter(batches):
+            writer.write_batch(batch)
+            yield _drain()
+    yield _drain()  # Schema (if no batch was written) and the end-of-stream marker
+
+
+def arrow_response(
+    schema: pa.Schema,
+    batches: Union[Iterable[pa.RecordBatch], AsyncIterable[pa.RecordBatch]],
+    headers: Optional[Dict[str, str]] = None,
+    background: Optional[BackgroundTask] = None
+) -> StreamingResponse:
+    return StreamingResponse(arrow_stream(schema, batches), media_type=ARROW_MEDIA_TYPE, headers=headers, background=background)
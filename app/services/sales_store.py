@@ -0,0 +1,173 @@
+# app/services/sales_store.py
+import os
+import shutil
+import uuid
+from contextlib import contextmanager
+from datetime import date
+from typing import Iterator, List, Optional, Sequence, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+# --- CONFIGURATION ---
+SALES_STORE_PATH = os.getenv("SALES_STORE_PATH", "data/sales_store")
+# SKU -> dept_name/class_name from the catalog, used for hierarchical forecasting
+PRODUCT_HIERARCHY_PATH = os.getenv("PRODUCT_HIERARCHY_PATH", "data/product_hierarchy.parquet")
+HIERARCHY_COLUMNS = ['sku', 'dept_name', 'class_name']
+
+# Fixed schema so every appended chunk lines up (region is the hive partition key)
+SALES_SCHEMA = pa.schema([
+    ('date', pa.timestamp('ns')),
+    ('sku', pa.string()),
+    ('channel', pa.string()),
+    ('price', pa.float64()),
+    ('units_sold', pa.float64()),
+    ('cost', pa.float64()),
+    ('promo', pa.int8()),
+    ('stock_level', pa.int32()),
+    ('region', pa.string()),
+])
+PARTITIONING = ds.partitioning(pa.schema([('region', pa.string())]), flavor='hive')
+ROW_GROUP_ROWS = 128_000  # Smaller row groups = finer-grained sku/date statistics for pushdown
+
+Values = Union[str, Sequence[str], None]
+
+
+def sales_store_exists(path: str = SALES_STORE_PATH) -> bool:
+    return os.path.isdir(path) and any(os.scandir(path))
+
+
+def reset_sales_store(path: str = SALES_STORE_PATH) -> None:
+    """Drops all partitions so the store mirrors the dataset being ingested."""
+    if os.path.islink(path):
+        target = os.path.realpath(path)
+        os.unlink(path)
+        shutil.rmtree(target, ignore_errors=True)
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def _publish(version_dir: str, path: str) -> None:
+    """
+    Points `path` (a symlink) at a fully written version directory in one os.replace, then
+    deletes the version it replaced. Readers that already opened the old files keep their
+    memory maps (unlinked files stay readable until closed).
+    """
+    previous = os.path.realpath(path) if os.path.islink(path) else None
+    if os.path.isdir(path) and not os.path.islink(path):
+        # Store from before versioning: a plain directory cannot be replaced by a symlink, so move it aside once
+        previous = f"{path}.v-legacy-{uuid.uuid4().hex}"
+        os.rename(path, previous)
+    link = f"{path}.link-{os.getpid()}.tmp"
+    os.symlink(os.path.abspath(version_dir), link)
+    os.replace(link, path)
+    if previous and previous != os.path.realpath(path):
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+@contextmanager
+def staged_sales_store(path: str = SALES_STORE_PATH) -> Iterator[str]:
+    """
+    Yields a fresh directory to append the new dataset to (append_sales(df, staging)).
+    On success it replaces the store atomically; on failure or cancellation the staging
+    directory is discarded and readers keep seeing the previous, complete store.
+    """
+    staging = f"{os.path.abspath(path)}.v-{uuid.uuid4().hex}"
+    os.makedirs(staging)
+    try:
+        yield staging
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+    _publish(staging, path)
+
+
+def append_sales(df: pd.DataFrame, path: str = SALES_STORE_PATH) -> None:
+    """
+    Appends processed sales rows as Parquet files partitioned by region.
+    Rows are sorted by (sku, date) first so row-group statistics let readers skip
+    everything outside a requested SKU or date range.
+    """
+    if df.empty:
+        return
+    frame = df.reindex(columns=SALES_SCHEMA.names).sort_values(['sku', 'date'], kind='stable')
+    frame['sku'] = frame['sku'].astype(str)
+    frame['region'] = frame['region'].astype(str)
+    table = pa.Table.from_pandas(frame, schema=SALES_SCHEMA, preserve_index=False, safe=False)
+    ds.write_dataset(
+        table,
+        path,
+        format='parquet',
+        partitioning=PARTITIONING,
+        basename_template=f"part-{uuid.uuid4().hex}-{{i}}.parquet",
+        existing_data_behavior='overwrite_or_ignore',
+        max_rows_per_group=ROW_GROUP_ROWS,
+        min_rows_per_group=min(ROW_GROUP_ROWS, len(frame)),
+    )
+
+
+def _isin(field: str, values: Values) -> Optional[ds.Expression]:
+    if values is None:
+        return None
+    if isinstance(values, str):
+        return ds.field(field) == values
+    return ds.field(field).isin(list(values))
+
+
+def read_sales(
+    columns: Optional[List[str]] = None,
+    sku: Values = None,
+    region: Values = None,
+    channel: Values = None,
+    start: Optional[Union[str, date]] = None,
+    end: Optional[Union[str, date]] = None,
+    path: str = SALES_STORE_PATH,
+) -> pd.DataFrame:
+    """
+    Reads sales rows with column projection and predicate pushdown.
+    Region filters prune whole partitions; sku/channel/date filters are evaluated against
+    Parquet statistics before any row is decoded. Files are memory-mapped, not copied.
+    """
+    if not sales_store_exists(path):
+        return pd.DataFrame(columns=columns or SALES_SCHEMA.names)
+
+    dataset = ds.dataset(
+        path,
+        format='parquet',
+        schema=SALES_SCHEMA,
+        partitioning=PARTITIONING,
+        filesystem=fs.LocalFileSystem(use_mmap=True),
+    )
+
+    conditions = [
+        _isin('sku', sku),
+        _isin('region', region),
+        _isin('channel', channel),
+        ds.field('date') >= pd.Timestamp(start).to_datetime64() if start is not None else None,
+        ds.field('date') <= pd.Timestamp(end).to_datetime64() if end is not None else None,
+    ]
+    expression = None
+    for condition in conditions:
+        if condition is not None:
+            expression = condition if expression is None else expression & condition
+
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def write_product_hierarchy(catalog: pd.DataFrame, path: str = PRODUCT_HIERARCHY_PATH) -> int:
+    """Replaces the SKU -> dept_name/class_name table (one row per SKU, last occurrence wins)."""
+    frame = catalog.reindex(columns=HIERARCHY_COLUMNS).astype(str).drop_duplicates('sku', keep='last')
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    frame.to_parquet(tmp, index=False)
+    os.replace(tmp, path)  # Readers never see a half-written file
+    return len(frame)
+
+
+def read_product_hierarchy(path: str = PRODUCT_HIERARCHY_PATH) -> pd.DataFrame:
+    """The SKU -> dept_name/class_name table (empty if no catalog has been ingested)."""
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=HIERARCHY_COLUMNS)
+    return pd.read_parquet(path, columns=HIERARCHY_COLUMNS)
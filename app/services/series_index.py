@@ -0,0 +1,136 @@
+# app/services/series_index.py
+import threading
+import numpy as np
+import pandas as pd
+from typing import Dict, List, Optional, Tuple
+
+from app.services.sales_store import read_sales, sales_store_exists
+
+SERIES_KEYS = ['sku', 'region', 'channel']
+SALES_COLUMNS = ['date', 'sku', 'region', 'channel', 'price', 'units_sold', 'promo', 'stock_level']
+SeriesKey = Tuple[str, str, str]  # (sku, region, channel)
+
+
+def load_sales_frame() -> pd.DataFrame:
+    """
+    Sales history shared by the forecasting and pricing services.
+    Reads the columnar sales store written by ingestion (only the columns the services use);
+    falls back to a small mock series when nothing has been ingested yet.
+    Columns: date, sku, region, channel, price, units_sold, promo, stock_level.
+    """
+    if sales_store_exists():
+        return read_sales(columns=SALES_COLUMNS)
+
+    # MOCK DATA LOAD: placeholder series until the first ingestion
+    date_range = pd.date_range(start='2023-01-01', periods=365, freq='D')
+    price = 125 + np.random.normal(0, 10, len(date_range))  # Price variation
+    seasonal = 100 + 5 * date_range.dayofyear + 50 * (date_range.month.isin([6, 12])) + 10 * (date_range.day_name() == 'Friday')
+    return pd.DataFrame({
+        'date': date_range,
+        'sku': 'SKU123',
+        'region': 'North',
+        'channel': 'online',
+        'price': price,
+        'units_sold': np.clip(np.asarray(seasonal * (price / 125.0) ** -1.5).astype(int), 10, None),  # Price-sensitive demand
+        'promo': np.random.randint(0, 2, len(date_range)),
+        'stock_level': np.random.randint(100, 500, len(date_range)),
+    })
+
+
+class SeriesIndex:
+    """
+    Per-series view of the sales history keyed by (sku, region, channel).
+
+    Built once: keys are categorical-coded, rows are sorted by (key, date) in a
+    single pass and each series is stored as a contiguous row slice, so a lookup
+    is a dict access instead of three boolean masks over the whole table.
+    Immutable once built: ingestion publishes a new index (see rebuild_series_index).
+    """
+
+    def __init__(self, df: Optional[pd.DataFrame] = None, version: int = 0):
+        self._series: Dict[SeriesKey, pd.DataFrame] = {}
+        self._columns: List[str] = list(df.columns) if df is not None else []
+        self.version = version  # Bumped on every rebuild so derived caches can detect changes
+        self.last_date: Optional[pd.Timestamp] = None  # Latest sales date across all series
+        if df is not None and not df.empty:
+            self._series = self._split(df)
+            self.last_date = pd.to_datetime(df['date']).max()
+
+    @staticmethod
+    def _split(df: pd.DataFrame) -> Dict[SeriesKey, pd.DataFrame]:
+        """Sorts rows by (series, date) once and slices out each series without copying."""
+        keys = [df[k].astype(str).astype('category') for k in SERIES_KEYS]
+        codes = [k.cat.codes.to_numpy() for k in keys]
+        order = np.lexsort([df['date'].to_numpy()] + codes[::-1])
+        sorted_df = df.iloc[order].reset_index(drop=True)
+        sorted_codes = [c[order] for c in codes]
+
+        changed = np.zeros(len(sorted_df), dtype=bool)
+        changed[0] = True
+        for c in sorted_codes:
+            changed[1:] |= c[1:] != c[:-1]
+        starts = np.flatnonzero(changed)
+        stops = np.append(starts[1:], len(sorted_df))
+
+        categories = [k.cat.categories for k in keys]
+        return {
+            tuple(cats[c[start]] for cats, c in zip(categories, sorted_codes)): sorted_df.iloc[start:stop]
+            for start, stop in zip(starts, stops)
+        }
+
+    def get(self, sku: str, region: str, channel: str) -> pd.DataFrame:
+        """Returns the date-sorted rows of one series (empty frame if unknown). Treat as read-only."""
+        frame = self._series.get((sku, region, channel))
+        if frame is None:
+            return pd.DataFrame(columns=self._columns)
+        return frame
+
+    def keys(self) -> List[SeriesKey]:
+        return list(self._series)
+
+    def select(
+        self,
+        sku: Optional[str] = None,
+        region: Optional[str] = None,
+        channel: Optional[str] = None
+    ) -> List[SeriesKey]:
+        """Lists series keys matching the optional filter values."""
+        wanted = (sku, region, channel)
+        return [
+            key for key in self._series
+            if all(w is None or w == k for w, k in zip(wanted, key))
+        ]
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+
+# Global cache (built once on first use, shared by forecast and pricing services)
+_index_cache: Dict[str, Optional[SeriesIndex]] = {"index": None}
+_build_lock = threading.Lock()
+
+
+def get_series_index() -> SeriesIndex:
+    """Returns the shared series index, building it from the sales data on first use."""
+    if _index_cache["index"] is None:
+        with _build_lock:
+            if _index_cache["index"] is None:
+                _index_cache["index"] = SeriesIndex(load_sales_frame())
+    return _index_cache["index"]
+
+
+def rebuild_series_index() -> int:
+    """
+    Replaces the shared index with one built from the current sales store, called once after
+    ingestion publishes a new store (series missing from the new data disappear). Requests keep
+    using the old index until the swap. Does nothing if the index was never built, since the
+    first get_series_index() call reads the store anyway. Returns the number of series.
+    """
+    previous = _index_cache["index"]
+    if previous is None:
+        return 0
+    # Continue the version sequence so caches keyed on it (elasticities, recent forecasts) see a change
+    index = SeriesIndex(load_sales_frame(), version=previous.version + 1)
+    with _build_lock:
+        _index_cache["index"] = index
+    return len(index)
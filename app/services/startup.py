@@ -0,0 +1,173 @@
+# app/services/startup.py
+import importlib
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from app.services.telemetry import span
+
+# --- CONFIGURATION ---
+# Components pre-initialized before the worker reports ready (comma-separated):
+#   sales_store - read the sales store and build the shared series index
+#   rag         - connect the Ollama/Chroma components and load the lexical index
+#   prophet     - import Prophet and run one tiny fit so the compiled Stan model is loaded
+#   forecasts   - load the materialized forecast table into memory
+WARMUP_COMPONENTS = [c.strip() for c in os.getenv("WARMUP_COMPONENTS", "").split(",") if c.strip()]
+# 1 = warm up inside the startup event (uvicorn accepts no connections until it is done);
+# 0 = warm up in a background thread while /health already answers and /ready returns 503
+WARMUP_BLOCKING = os.getenv("WARMUP_BLOCKING", "0") == "1"
+# 1 = a failed component keeps /ready at 503; 0 = report it and become ready anyway
+# (the component is then initialized lazily on first use, as without warm-up)
+WARMUP_STRICT = os.getenv("WARMUP_STRICT", "0") == "1"
+# 1 = import every subsystem at startup and report the time each one takes
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "0") == "1"
+
+# Heavy modules behind each subsystem, imported in this order by the startup profile.
+# A module shared by two subsystems is charged to the first one that imports it.
+SUBSYSTEMS: Dict[str, Tuple[str, ...]] = {
+    "sales_store": ("pyarrow.dataset", "app.services.sales_store", "app.services.series_index"),
+    "forecast": ("prophet", "app.services.model_store", "app.services.forecast_service"),
+    "pricing": ("app.services.elasticity_engine", "app.services.pricing_service"),
+    "rag": (
+        "langchain_community.llms", "langchain_community.vectorstores", "langchain_community.embeddings",
+        "langchain.prompts", "app.services.embedding_cache", "app.services.lexical_index",
+        "app.services.vector_index", "app.services.rag_service",
+    ),
+    "ingestion": ("chromadb", "app.data_ingestion"),
+}
+
+
+def _warm_sales_store() -> None:
+    from app.services.series_index import get_series_index
+    get_series_index()
+
+
+def _warm_rag() -> None:
+    from app.services.deal_cache import read_collection_version
+    from app.services.lexical_index import get_lexical_index
+    from app.services.rag_service import CHROMA_PATH, HYBRID_RETRIEVAL, get_rag_components
+    get_rag_components()
+    if HYBRID_RETRIEVAL:
+        get_lexical_index(CHROMA_PATH, read_collection_version(CHROMA_PATH))
+
+
+def _warm_prophet() -> None:
+    from app.services.forecast_service import warm_up_backend
+    warm_up_backend()
+
+
+def _warm_forecasts() -> None:
+    from app.services.forecast_store import forecast_store
+    forecast_store.metadata()
+
+
+WARMUP_STEPS: Dict[str, Callable[[], None]] = {
+    "sales_store": _warm_sales_store,
+    "rag": _warm_rag,
+    "prophet": _warm_prophet,
+    "forecasts": _warm_forecasts,
+}
+
+
+class StartupState:
+    """
+    Import timings and warm-up progress of this worker, as reported by /ready.
+    status: 'starting' -> 'warming' -> 'ready' (or 'failed' when a strict warm-up step fails).
+    """
+
+    def __init__(self, components: List[str]):
+        self._lock = threading.Lock()
+        self.status = "starting"
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self.imports: Dict[str, Dict] = {}
+        self.components: Dict[str, Dict] = {
+            name: {"status": "pending", "seconds": None, "error": None} for name in components
+        }
+
+    def record_import(self, subsystem: str, seconds: float, error: Optional[str] = None) -> None:
+        with self._lock:
+            self.imports[subsystem] = {"seconds": round(seconds, 4), "error": error}
+
+    def set_component(self, name: str, **fields) -> None:
+        with self._lock:
+            self.components[name].update(fields)
+
+    def begin(self) -> None:
+        with self._lock:
+            self.status = "warming"
+
+    def finish(self, status: str) -> None:
+        with self._lock:
+            self.status = status
+            self.ready_at = time.time()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    def to_dict(self) -> Dict:
+        with self._lock:
+            return {
+                "status": self.status,
+                "startup_seconds": round((self.ready_at or time.time()) - self.started_at, 4),
+                "imports": {name: dict(entry) for name, entry in self.imports.items()},
+                "components": {name: dict(entry) for name, entry in self.components.items()},
+            }
+
+
+# Process-wide startup state (one per uvicorn worker)
+startup_state = StartupState(WARMUP_COMPONENTS)
+
+
+def profile_imports(state: StartupState = startup_state) -> None:
+    """Imports each subsystem's heavy modules in turn and records how long each subsystem took."""
+    for subsystem, modules in SUBSYSTEMS.items():
+        started = time.perf_counter()
+        error = None
+        with span(f"startup.import.{subsystem}"):
+            for module in modules:
+                try:
+                    importlib.import_module(module)
+                except Exception as e:
+                    # Optional dependency missing: the subsystem will fail on first use instead
+                    error = f"{module}: {e}"
+                    break
+        state.record_import(subsystem, time.perf_counter() - started, error)
+
+
+def run_warmup(state: StartupState = startup_state) -> None:
+    """Pre-initializes the configured components in order, then marks the worker ready (or failed)."""
+    state.begin()
+    failed = False
+    for name in list(state.components):
+        step = WARMUP_STEPS.get(name)
+        if step is None:
+            state.set_component(name, status="skipped", error=f"Unknown warm-up component '{name}'.")
+            continue
+        state.set_component(name, status="running")
+        started = time.perf_counter()
+        try:
+            with span(f"startup.warmup.{name}"):
+                step()
+            state.set_component(name, status="ready", seconds=round(time.perf_counter() - started, 4))
+        except Exception as e:
+            print(f"Warm-up of '{name}' failed: {e}")
+            failed = True
+            state.set_component(name, status="failed", seconds=round(time.perf_counter() - started, 4), error=str(e))
+    state.finish("failed" if failed and WARMUP_STRICT else "ready")
+
+
+def run_startup(state: StartupState = startup_state) -> None:
+    """Startup profile (if enabled) followed by warm-up; prints a per-subsystem timing report."""
+    if STARTUP_PROFILE:
+        profile_imports(state)
+    run_warmup(state)
+    report = state.to_dict()
+    for subsystem, entry in report["imports"].items():
+        print(f"STARTUP:  import {subsystem:<12} {entry['seconds'] * 1000:9.1f} ms{'  (' + entry['error'] + ')' if entry['error'] else ''}")
+    for name, entry in report["components"].items():
+        seconds = entry["seconds"] if entry["seconds"] is not None else 0.0
+        print(f"STARTUP:  warmup {name:<12} {seconds * 1000:9.1f} ms  {entry['status']}")
+    print(f"STARTUP:  worker {report['status']} after {report['startup_seconds']:.2f}s")
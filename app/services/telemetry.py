@@ -0,0 +1,157 @@
+# app/services/telemetry.py
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# --- CONFIGURATION ---
+# Upper bounds (seconds) of the latency histogram buckets; +Inf is implicit
+LATENCY_BUCKETS = tuple(float(b) for b in os.getenv(
+    "METRICS_LATENCY_BUCKETS", "0.001,0.005,0.01,0.025,0.05,0.1,0.25,0.5,1,2.5,5,10,30,60"
+).split(","))
+METRICS_PREFIX = "techspark"
+# Clients may send X-Debug-Timing: 1 to get the per-stage breakdown back in a Server-Timing header
+DEBUG_TIMING_HEADER = os.getenv("DEBUG_TIMING_HEADER", "1") == "1"
+
+# Stage timings of the request being handled (None outside a traced request)
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float]]]] = contextvars.ContextVar("stage_trace", default=None)
+
+
+class Histogram:
+    """Prometheus-style cumulative histogram (bucket counts, sum, count); thread-safe."""
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    def snapshot(self) -> Tuple[List[int], float, int]:
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative, running = [], 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, total, count
+
+
+_stage_histograms: Dict[str, Histogram] = {}
+_http_histograms: Dict[Tuple[str, str, str], Histogram] = {}
+_registry_lock = threading.Lock()
+
+
+def _histogram(registry: Dict, key) -> Histogram:
+    histogram = registry.get(key)
+    if histogram is None:
+        with _registry_lock:
+            histogram = registry.setdefault(key, Histogram())
+    return histogram
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """
+    Times a named stage (e.g. 'deals.embed', 'forecast.fit') into its histogram and, inside
+    a traced HTTP request, into that request's stage breakdown. Failed stages are timed too.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _histogram(_stage_histograms, stage).observe(elapsed)
+        trace = _trace.get()
+        if trace is not None:
+            trace.append((stage, elapsed))
+
+
+def start_trace() -> contextvars.Token:
+    """Begins collecting stage timings for the current request (see request_trace)."""
+    return _trace.set([])
+
+
+def request_trace() -> List[Tuple[str, float]]:
+    return list(_trace.get() or [])
+
+
+def end_trace(token: contextvars.Token) -> None:
+    _trace.reset(token)
+
+
+def route_template(path: str, path_params: Optional[Dict[str, str]]) -> str:
+    """Puts '{name}' back in place of each path parameter of a matched request path."""
+    segments = path.split("/")
+    for name, value in (path_params or {}).items():
+        for i in range(len(segments) - 1, -1, -1):
+            if segments[i] == str(value):
+                segments[i] = f"{{{name}}}"
+                break
+    return "/".join(segments)
+
+
+def observe_request(method: str, route: str, status: int, seconds: float) -> None:
+    _histogram(_http_histograms, (method, route, str(status))).observe(seconds)
+
+
+def server_timing_header(trace: List[Tuple[str, float]]) -> str:
+    """Stage breakdown as a Server-Timing header value (durations in ms, repeated stages summed)."""
+    totals: Dict[str, float] = {}
+    for stage, seconds in trace:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    return ", ".join(f"{stage.replace('.', '-')};dur={seconds * 1000:.2f}" for stage, seconds in totals.items())
+
+
+def _label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _render_histogram(lines: List[str], name: str, labels: Dict[str, str], histogram: Histogram) -> None:
+    cumulative, total, count = histogram.snapshot()
+    base = ",".join(f'{k}="{_label_value(v)}"' for k, v in labels.items())
+    for bound, value in zip(list(histogram.buckets) + ["+Inf"], cumulative):
+        le = bound if bound == "+Inf" else repr(float(bound))
+        lines.append(f'{name}_bucket{{{base},le="{le}"}} {value}')
+    lines.append(f"{name}_sum{{{base}}} {total}")
+    lines.append(f"{name}_count{{{base}}} {count}")
+
+
+def render_prometheus(gauges: Optional[Dict[str, List[Tuple[Dict[str, str], float]]]] = None) -> str:
+    """
+    All histograms (and optional extra gauges: name -> [(labels, value)]) in the
+    Prometheus text exposition format, version 0.0.4.
+    """
+    # Copy the registries first: request threads register new stages/routes while we render
+    with _registry_lock:
+        stages, routes = sorted(_stage_histograms.items()), sorted(_http_histograms.items())
+    lines: List[str] = []
+    stage_name = f"{METRICS_PREFIX}_stage_duration_seconds"
+    lines.append(f"# HELP {stage_name} Duration of service stages (embed, retrieve, fit, predict, ...).")
+    lines.append(f"# TYPE {stage_name} histogram")
+    for stage, histogram in stages:
+        _render_histogram(lines, stage_name, {"stage": stage}, histogram)
+
+    http_name = f"{METRICS_PREFIX}_http_request_duration_seconds"
+    lines.append(f"# HELP {http_name} HTTP request latency by route template.")
+    lines.append(f"# TYPE {http_name} histogram")
+    for (method, route, status), histogram in routes:
+        _render_histogram(lines, http_name, {"method": method, "route": route, "status": status}, histogram)
+
+    for name, samples in (gauges or {}).items():
+        full = f"{METRICS_PREFIX}_{name}"
+        lines.append(f"# TYPE {full} gauge")
+        for labels, value in samples:
+            base = ",".join(f'{k}="{_label_value(v)}"' for k, v in labels.items())
+            lines.append(f"{full}{{{base}}} {value}")
+    return "\n".join(lines) + "\n"
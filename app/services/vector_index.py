@@ -0,0 +1,236 @@
+# app/services/vector_index.py
+import json
+import os
+import shutil
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from langchain_core.documents import Document
+
+# --- CONFIGURATION ---
+# 'chroma' (default) or 'numpy': serve deal retrieval from the memory-mapped arrays below
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")
+VECTOR_INDEX_DIR = "vector_index"  # Created next to the Chroma files by ingestion
+# Partitions with at least this many rows also get an IVF coarse quantizer (0 disables IVF)
+VECTOR_IVF_MIN_ROWS = int(os.getenv("VECTOR_IVF_MIN_ROWS", "200000"))
+VECTOR_IVF_NPROBE = int(os.getenv("VECTOR_IVF_NPROBE", "8"))  # Lists scanned per query
+SCAN_BLOCK_ROWS = 65536  # Rows scored per matmul, bounds the float32 temporaries
+CHROMA_PAGE_SIZE = 5000
+
+DOCUMENT_SCHEMA = pa.schema([('page_content', pa.string()), ('metadata', pa.string())])  # metadata as JSON
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _kmeans(vectors: np.ndarray, n_lists: int, iterations: int = 10, sample: int = 100_000, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on a sample; returns unit-norm centroids (n_lists x dim)."""
+    rng = np.random.default_rng(seed)
+    rows = vectors[rng.choice(len(vectors), size=min(sample, len(vectors)), replace=False)].astype(np.float32)
+    centroids = rows[rng.choice(len(rows), size=n_lists, replace=False)]
+    for _ in range(iterations):
+        assign = np.argmax(rows @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, rows)
+        empty = np.bincount(assign, minlength=n_lists) == 0
+        sums[empty] = centroids[empty]  # Keep empty lists where they were
+        centroids = _normalize(sums)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    return np.concatenate([
+        np.argmax(vectors[start:start + SCAN_BLOCK_ROWS].astype(np.float32) @ centroids.T, axis=1)
+        for start in range(0, len(vectors), SCAN_BLOCK_ROWS)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+class _Partition:
+    """Vectors of one (region, channel): float16 rows on disk, opened as a read-only memmap."""
+
+    def __init__(self, directory: str, spec: Dict):
+        self.count = spec["count"]
+        self.dim = spec["dim"]
+        self.vectors = np.memmap(os.path.join(directory, "vectors.f16"), dtype=np.float16, mode="r", shape=(self.count, self.dim))
+        self.frame = pd.read_parquet(os.path.join(directory, "documents.parquet"))
+        self.centroids = np.load(os.path.join(directory, "centroids.npy")) if spec.get("ivf") else None
+        self.list_offsets = np.load(os.path.join(directory, "list_offsets.npy")) if spec.get("ivf") else None
+
+    def _scan(self, query: np.ndarray, start: int, stop: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = np.concatenate([
+            self.vectors[block:min(block + SCAN_BLOCK_ROWS, stop)].astype(np.float32) @ query
+            for block in range(start, stop, SCAN_BLOCK_ROWS)
+        ]) if stop > start else np.zeros(0, dtype=np.float32)
+        return np.arange(start, stop), scores
+
+    def search(self, query: np.ndarray, k: int, nprobe: int) -> List[int]:
+        if self.centroids is None:
+            rows, scores = self._scan(query, 0, self.count)
+        else:
+            # Scan only the nprobe lists whose centroids are closest to the query (rows are stored list by list)
+            lists = np.argsort(-(self.centroids @ query))[:nprobe]
+            parts = [self._scan(query, self.list_offsets[i], self.list_offsets[i + 1]) for i in lists]
+            rows = np.concatenate([p[0] for p in parts])
+            scores = np.concatenate([p[1] for p in parts])
+        if len(rows) > k:
+            best = np.argpartition(-scores, k - 1)[:k]
+            rows, scores = rows[best], scores[best]
+        return rows[np.argsort(-scores, kind="stable")].tolist()
+
+    def documents(self, rows: List[int]) -> List[Document]:
+        selected = self.frame.iloc[rows]
+        metadata = [json.loads(m) for m in selected["metadata"].tolist()]
+        return [Document(page_content=text, metadata=meta) for text, meta in zip(selected["page_content"].tolist(), metadata)]
+
+
+class VectorIndex:
+    """
+    Read-mostly vector index: L2-normalized embeddings stored as float16 memory-mapped
+    arrays, one directory per (region, channel), so the metadata filter is just a choice
+    of partition. Search is an exact top-k dot product, or an IVF probe of the closest
+    lists for partitions built with a coarse quantizer. Rebuilt by ingestion.
+    """
+
+    def __init__(self, root: str, manifest: Dict):
+        self.root = root
+        self.version = manifest["version"]
+        self._specs = manifest["partitions"]
+        self._partitions: Dict[str, _Partition] = {}
+        self._lock = threading.Lock()
+
+    def _partition(self, region: str, channel: str) -> Optional[_Partition]:
+        key = f"{region}|{channel}"
+        spec = self._specs.get(key)
+        if spec is None:
+            return None
+        with self._lock:
+            if key not in self._partitions:
+                self._partitions[key] = _Partition(os.path.join(self.root, spec["dir"]), spec)
+            return self._partitions[key]
+
+    def search(self, query_vector: List[float], region: str, channel: str, k: int, nprobe: int = VECTOR_IVF_NPROBE) -> List[Document]:
+        part = self._partition(region, channel)
+        if part is None or part.count == 0:
+            return []
+        query = _normalize(np.asarray(query_vector, dtype=np.float32)[None, :])[0]
+        return part.documents(part.search(query, k, nprobe))
+
+
+def _add_ivf(directory: str, spec: Dict) -> None:
+    """Clusters a written partition and rewrites its vectors and documents grouped by IVF list."""
+    path = os.path.join(directory, "vectors.f16")
+    vectors = np.memmap(path, dtype=np.float16, mode="r", shape=(spec["count"], spec["dim"]))
+    n_lists = int(np.sqrt(spec["count"]))
+    centroids = _kmeans(vectors, n_lists)
+    assign = _assign(vectors, centroids)
+    order = np.argsort(assign, kind="stable")
+    grouped = np.memmap(f"{path}.ivf", dtype=np.float16, mode="w+", shape=vectors.shape)
+    for start in range(0, len(order), SCAN_BLOCK_ROWS):
+        grouped[start:start + SCAN_BLOCK_ROWS] = vectors[order[start:start + SCAN_BLOCK_ROWS]]
+    grouped.flush()
+    del vectors, grouped
+    os.replace(f"{path}.ivf", path)
+    documents = os.path.join(directory, "documents.parquet")
+    pq.write_table(pq.read_table(documents).take(pa.array(order)), f"{documents}.ivf")
+    os.replace(f"{documents}.ivf", documents)
+    offsets = np.concatenate([[0], np.cumsum(np.bincount(assign, minlength=n_lists))])
+    np.save(os.path.join(directory, "centroids.npy"), centroids.astype(np.float32))
+    np.save(os.path.join(directory, "list_offsets.npy"), offsets.astype(np.int64))
+    spec["ivf"] = True
+
+
+def build_vector_index(collection, chroma_path: str, version: str, keep: Iterable[str] = ()) -> Dict[str, int]:
+    """
+    Exports every embedding in the Chroma collection into a new version of the index.
+    Vectors and documents are streamed page by page straight into each partition's files,
+    so memory holds one page at a time. The version is built in a temporary directory and
+    renamed into place once complete; older versions except `keep` (the one still being
+    served until the new version is published) are removed afterwards. Returns rows per partition.
+    """
+    root = os.path.join(chroma_path, VECTOR_INDEX_DIR)
+    version_dir = os.path.join(root, version)
+    build_dir = os.path.join(root, f".{version}.{os.getpid()}.tmp")
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+
+    partitions: Dict[str, Dict] = {}
+    files, writers = {}, {}
+    offset = 0
+    try:
+        while True:
+            page = collection.get(include=["embeddings", "metadatas", "documents"], limit=CHROMA_PAGE_SIZE, offset=offset)
+            if not page["ids"]:
+                break
+            keys = [f"{m.get('region')}|{m.get('channel')}" for m in page["metadatas"]]
+            vectors = _normalize(np.asarray(page["embeddings"], dtype=np.float32)).astype(np.float16)
+            for key in dict.fromkeys(keys):
+                rows = [i for i, k in enumerate(keys) if k == key]
+                if key not in partitions:
+                    directory = os.path.join(build_dir, f"p{len(partitions):05d}")
+                    os.makedirs(directory)
+                    partitions[key] = {"dir": os.path.basename(directory), "count": 0, "dim": int(vectors.shape[1]), "ivf": False}
+                    files[key] = open(os.path.join(directory, "vectors.f16"), "wb")
+                    writers[key] = pq.ParquetWriter(os.path.join(directory, "documents.parquet"), DOCUMENT_SCHEMA)
+                files[key].write(vectors[rows].tobytes())
+                partitions[key]["count"] += len(rows)
+                writers[key].write_table(pa.table({
+                    "page_content": [page["documents"][i] for i in rows],
+                    "metadata": [json.dumps(page["metadatas"][i], default=str) for i in rows],
+                }, schema=DOCUMENT_SCHEMA))
+            if len(page["ids"]) < CHROMA_PAGE_SIZE:
+                break
+            offset += len(page["ids"])
+    except BaseException:
+        for handle in [*files.values(), *writers.values()]:
+            handle.close()
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    for handle in [*files.values(), *writers.values()]:
+        handle.close()
+
+    for spec in partitions.values():
+        if VECTOR_IVF_MIN_ROWS and spec["count"] >= VECTOR_IVF_MIN_ROWS:
+            _add_ivf(os.path.join(build_dir, spec["dir"]), spec)
+
+    with open(os.path.join(build_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"version": version, "partitions": partitions}, f)
+    # A rebuild of the same version (e.g. an unchanged catalog) moves the old copy aside first;
+    # processes that already memory-mapped it keep reading the unlinked files
+    if os.path.exists(version_dir):
+        os.replace(version_dir, f"{build_dir}.old")
+    os.replace(build_dir, version_dir)
+
+    keep = {version, *keep}
+    for entry in os.listdir(root):
+        if entry not in keep:
+            shutil.rmtree(os.path.join(root, entry), ignore_errors=True)
+    return {key: spec["count"] for key, spec in partitions.items()}
+
+
+_loaded: Dict[str, Tuple[str, VectorIndex]] = {}
+_loaded_lock = threading.Lock()
+
+
+def get_vector_index(chroma_path: str, version: str) -> Optional[VectorIndex]:
+    """
+    Index for the current collection version, or None if it was never built for it. Only a
+    found index is kept, so a version whose build finishes later is picked up on the next call.
+    """
+    with _loaded_lock:
+        looked_up, index = _loaded.get(chroma_path, (None, None))
+        if looked_up == version:
+            return index
+        version_dir = os.path.join(chroma_path, VECTOR_INDEX_DIR, version)
+        manifest_path = os.path.join(version_dir, "manifest.json")
+        if not os.path.exists(manifest_path):
+            return None
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            index = VectorIndex(version_dir, json.load(f))
+        _loaded[chroma_path] = (version, index)
+    return index
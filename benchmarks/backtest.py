@@ -0,0 +1,155 @@
+# benchmarks/backtest.py
+"""
+Backtest of the forecast engines on the same held-out data.
+
+The last --horizon days of every series are held out; each engine forecasts them from
+the remaining history, and its accuracy (MAE, WAPE, MASE against a weekly naive
+forecast, 90% interval coverage) is reported next to its wall time and per-series latency.
+
+    python -m benchmarks.backtest --scale small --engines prophet,holt_winters,ets,seasonal_naive --series 200
+    python -m benchmarks.backtest --sales-store data/sales_store --series 500 --horizon 28
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.generate_data import SCALES, write_sales_store
+
+SeriesKey = Tuple[str, str, str]
+
+
+def split_holdout(histories: Dict[SeriesKey, pd.DataFrame], horizon_days: int) -> Tuple[Dict, Dict]:
+    """(train, actual) per series; series with fewer than two horizons of training data are dropped."""
+    train, actual = {}, {}
+    for key, history in histories.items():
+        cutoff = history['ds'].max() - pd.Timedelta(days=horizon_days)
+        head, tail = history[history['ds'] <= cutoff], history[history['ds'] > cutoff]
+        if len(head) >= 2 * horizon_days and not tail.empty:
+            train[key], actual[key] = head.reset_index(drop=True), tail.reset_index(drop=True)
+    return train, actual
+
+
+def score(forecasts: Dict[SeriesKey, List[Dict]], train: Dict, actual: Dict) -> Dict:
+    """Accuracy of one engine's forecasts over the held-out days (pooled over all series)."""
+    abs_errors, actuals, covered, scaled = [], [], [], []
+    for key, points in forecasts.items():
+        truth = dict(zip(actual[key]['ds'].dt.strftime('%Y-%m-%d'), actual[key]['y'].to_numpy(dtype=float)))
+        matched = [(p, truth[p['date']]) for p in points if p['date'] in truth]
+        if not matched:
+            continue
+        y = np.array([t for _, t in matched])
+        yhat = np.array([p['demand'] for p, _ in matched], dtype=float)
+        low = np.array([p['confidence_low'] for p, _ in matched], dtype=float)
+        high = np.array([p['confidence_high'] for p, _ in matched], dtype=float)
+        abs_errors.append(np.abs(y - yhat))
+        actuals.append(y)
+        covered.append((y >= low) & (y <= high))
+        history = train[key]['y'].to_numpy(dtype=float)
+        naive_mae = np.mean(np.abs(history[7:] - history[:-7])) if len(history) > 7 else 0.0
+        if naive_mae > 0:
+            scaled.append(np.mean(np.abs(y - yhat)) / naive_mae)
+
+    if not abs_errors:
+        return {"series": 0}
+    errors, truth = np.concatenate(abs_errors), np.concatenate(actuals)
+    return {
+        "series": len(abs_errors),
+        "mae": round(float(errors.mean()), 3),
+        "wape": round(float(errors.sum() / max(truth.sum(), 1e-9)), 4),
+        "mase": round(float(np.mean(scaled)), 4) if scaled else None,
+        "coverage_90": round(float(np.concatenate(covered).mean()), 4),
+    }
+
+
+def backtest(histories: Dict[SeriesKey, pd.DataFrame], horizon_days: int, engines: List[str]) -> Dict[str, Dict]:
+    """Runs every engine on the same train/holdout split; returns accuracy and latency per engine."""
+    from app.services.forecast_engines import get_engine
+
+    train, actual = split_holdout(histories, horizon_days)
+    results = {}
+    for name in engines:
+        engine = get_engine(name)
+        started = time.perf_counter()
+        try:
+            forecasts = engine.forecast(train, horizon_days)
+        except Exception as e:
+            results[name] = {"error": str(e)}
+            continue
+        elapsed = time.perf_counter() - started
+        results[name] = {
+            **score(forecasts, train, actual),
+            "seconds": round(elapsed, 3),
+            "ms_per_series": round(1000 * elapsed / max(len(train), 1), 3),
+        }
+    return results
+
+
+def load_histories(n_series: Optional[int], seed: int) -> Dict[SeriesKey, pd.DataFrame]:
+    """(ds, y) histories from the configured sales store, optionally a random sample of n_series."""
+    from app.services.forecast_service import _filter_series
+    from app.services.series_index import get_series_index
+
+    keys = sorted(get_series_index().keys())
+    if n_series is not None and n_series < len(keys):
+        keys = sorted(random.Random(seed).sample(keys, n_series))
+    return {key: _filter_series(*key) for key in keys}
+
+
+def print_report(results: Dict[str, Dict]) -> None:
+    print(f"\n{'engine':16} {'series':>7} {'MAE':>9} {'WAPE':>8} {'MASE':>8} {'cov90':>7} {'seconds':>9} {'ms/series':>10}")
+    for name, r in results.items():
+        if "error" in r:
+            print(f"{name:16} failed: {r['error']}")
+            continue
+        print(
+            f"{name:16} {r['series']:>7} {r.get('mae', '-'):>9} {r.get('wape', '-'):>8} {r.get('mase') or '-':>8} "
+            f"{r.get('coverage_90', '-'):>7} {r['seconds']:>9} {r['ms_per_series']:>10}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engines", default="prophet,holt_winters,ets,seasonal_naive")
+    parser.add_argument("--horizon", type=int, default=28, help="Held-out days per series")
+    parser.add_argument("--series", type=int, default=200, help="Series sampled from the store (0 = all)")
+    parser.add_argument("--scale", choices=SCALES, default="small", help="Synthetic data scale (ignored with --sales-store)")
+    parser.add_argument("--sales-store", default=None, help="Backtest on an existing sales store instead of synthetic data")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="techspark-backtest-")
+    # Keep backtest fits out of the real model store; set before any app module is imported
+    os.environ["MODEL_STORE_PATH"] = os.path.join(workdir, "models")
+    if args.sales_store:
+        os.environ["SALES_STORE_PATH"] = args.sales_store
+    else:
+        os.environ["SALES_STORE_PATH"] = os.path.join(workdir, "sales_store")
+        os.environ["PRODUCT_HIERARCHY_PATH"] = os.path.join(workdir, "product_hierarchy.parquet")
+        write_sales_store(os.environ["SALES_STORE_PATH"], SCALES[args.scale], args.seed)
+
+    try:
+        histories = load_histories(args.series or None, args.seed)
+        engines = [e.strip() for e in args.engines.split(",") if e.strip()]
+        print(f"⏱️  Backtesting {', '.join(engines)} on {len(histories)} series, {args.horizon}-day holdout ...")
+        results = backtest(histories, args.horizon, engines)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print_report(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"horizon_days": args.horizon, "series": len(histories), "engines": results}, f, indent=2)
+        print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+# benchmarks/generate_data.py
+"""
+Synthetic retail data at configurable scale (SKUs x regions x channels x days).
+
+Writes the two raw files ingestion reads, in the Kaggle dataset's column layout:
+  sales.csv    date, item_id, price_base, quantity, store_id
+  catalog.csv  item_id, item_type, dept_name, class_name
+and can also write the processed sales store directly (with real channels), which is
+what the forecasting and pricing services read.
+
+    python -m benchmarks.generate_data --out data/bench --skus 500 --regions 4 --channels 2 --days 365
+"""
+import argparse
+import os
+import time
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+DEPARTMENTS = {
+    "Audio": ["Headphones", "Speakers", "Earbuds"],
+    "Kitchen": ["Blenders", "Kettles", "Toasters"],
+    "Garden": ["Hoses", "Planters", "Mowers"],
+    "Toys": ["Puzzles", "Board Games", "Building Sets"],
+    "Apparel": ["Jackets", "Sneakers", "Scarves"],
+}
+ADJECTIVES = ["Compact", "Premium", "Classic", "Wireless", "Eco", "Pro", "Mini", "Deluxe"]
+CHANNELS = ["online", "in-store", "marketplace", "outlet"]
+
+
+@dataclass
+class Scale:
+    skus: int
+    regions: int
+    channels: int
+    days: int
+
+    @property
+    def series(self) -> int:
+        return self.skus * self.regions * self.channels
+
+    @property
+    def rows(self) -> int:
+        return self.series * self.days
+
+
+SCALES = {
+    "tiny": Scale(skus=20, regions=2, channels=2, days=180),
+    "small": Scale(skus=200, regions=4, channels=2, days=365),
+    "medium": Scale(skus=2000, regions=8, channels=2, days=730),
+    "large": Scale(skus=20000, regions=10, channels=3, days=730),
+}
+
+
+def make_catalog(scale: Scale, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    depts = list(DEPARTMENTS)
+    dept = rng.integers(0, len(depts), scale.skus)
+    cls = rng.integers(0, 3, scale.skus)
+    adjective = rng.integers(0, len(ADJECTIVES), scale.skus)
+    return pd.DataFrame({
+        "item_id": [f"SKU{i:07d}" for i in range(scale.skus)],
+        "item_type": [f"{ADJECTIVES[a]} {DEPARTMENTS[depts[d]][c][:-1]} {i}" for i, (a, d, c) in enumerate(zip(adjective, dept, cls))],
+        "dept_name": [depts[d] for d in dept],
+        "class_name": [DEPARTMENTS[depts[d]][c] for d, c in zip(dept, cls)],
+    })
+
+
+def make_sales(scale: Scale, seed: int = 0, start: str = "2023-01-01") -> pd.DataFrame:
+    """
+    One row per (sku, region, channel, day): log-linear demand with a per-SKU elasticity
+    in [-2.5, -0.5], weekly and yearly seasonality, promos and noise, so forecasting and
+    elasticity estimation have real structure to find.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, periods=scale.days, freq="D")
+    n_series, n_days = scale.series, scale.days
+
+    sku = np.repeat(np.arange(scale.skus), scale.regions * scale.channels)
+    region = np.tile(np.repeat(np.arange(scale.regions), scale.channels), scale.skus)
+    channel = np.tile(np.arange(scale.channels), scale.skus * scale.regions)
+
+    base_price = rng.uniform(5, 500, scale.skus)[sku]
+    base_demand = rng.uniform(5, 200, n_series)
+    elasticity = rng.uniform(-2.5, -0.5, scale.skus)[sku]
+
+    day = np.arange(n_days)
+    weekly = 1 + 0.15 * np.sin(2 * np.pi * day / 7)
+    yearly = 1 + 0.25 * np.sin(2 * np.pi * day / 365.25)
+    price = base_price[:, None] * (1 + rng.normal(0, 0.08, (n_series, n_days)))
+    promo = rng.random((n_series, n_days)) < 0.1
+    demand = (
+        base_demand[:, None] * weekly * yearly
+        * (price / base_price[:, None]) ** elasticity[:, None]
+        * np.where(promo, 1.3, 1.0)
+        * rng.lognormal(0, 0.1, (n_series, n_days))
+    )
+
+    return pd.DataFrame({
+        "date": np.tile(dates.values, n_series),
+        "sku": np.repeat([f"SKU{i:07d}" for i in sku], n_days),
+        "region": np.repeat([f"R{r:02d}" for r in region], n_days),
+        "channel": np.repeat([CHANNELS[c % len(CHANNELS)] for c in channel], n_days),
+        "price": price.ravel().round(2),
+        "units_sold": np.maximum(demand.ravel().round(), 0.0),
+        "promo": promo.ravel().astype(np.int8),
+    })
+
+
+def write_raw(out_dir: str, scale: Scale, seed: int = 0) -> Tuple[str, str]:
+    """Writes sales.csv / catalog.csv in the raw Kaggle layout read by app.data_ingestion."""
+    os.makedirs(out_dir, exist_ok=True)
+    catalog_path = os.path.join(out_dir, "catalog.csv")
+    sales_path = os.path.join(out_dir, "sales.csv")
+    make_catalog(scale, seed).to_csv(catalog_path, index=False)
+    sales = make_sales(scale, seed)
+    raw = sales.rename(columns={"sku": "item_id", "price": "price_base", "units_sold": "quantity", "region": "store_id"})
+    raw[["date", "item_id", "price_base", "quantity", "store_id"]].to_csv(sales_path, index=False, date_format="%Y-%m-%d")
+    return sales_path, catalog_path
+
+
+def write_sales_store(path: str, scale: Scale, seed: int = 0) -> int:
+    """
+    Writes processed sales (all channels) straight into a sales store at `path`, plus the
+    matching product hierarchy (PRODUCT_HIERARCHY_PATH) for hierarchical forecasting.
+    """
+    from app.services.sales_store import append_sales, reset_sales_store, write_product_hierarchy
+
+    rng = np.random.default_rng(seed + 1)
+    sales = make_sales(scale, seed)
+    sales["cost"] = sales["price"] * 0.6
+    sales["stock_level"] = rng.integers(50, 500, len(sales)).astype(np.int32)
+    reset_sales_store(path)
+    append_sales(sales, path)
+    write_product_hierarchy(make_catalog(scale, seed).rename(columns={"item_id": "sku"}))
+    return len(sales)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", default="data/bench", help="Directory for sales.csv / catalog.csv")
+    parser.add_argument("--scale", choices=SCALES, default=None, help="Preset scale (overrides the individual sizes)")
+    parser.add_argument("--skus", type=int, default=200)
+    parser.add_argument("--regions", type=int, default=4)
+    parser.add_argument("--channels", type=int, default=2)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--sales-store", default=None, help="Also write the processed sales store here")
+    args = parser.parse_args()
+
+    scale = SCALES[args.scale] if args.scale else Scale(args.skus, args.regions, args.channels, args.days)
+    started = time.time()
+    sales_path, catalog_path = write_raw(args.out, scale, args.seed)
+    print(f"✅ {scale.rows} sales rows ({scale.series} series) -> {sales_path}; {scale.skus} products -> {catalog_path}")
+    if args.sales_store:
+        rows = write_sales_store(args.sales_store, scale, args.seed)
+        print(f"💾 {rows} processed rows -> {args.sales_store}")
+    print(f"Done in {time.time() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
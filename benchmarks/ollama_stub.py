@@ -0,0 +1,149 @@
+# benchmarks/ollama_stub.py
+"""
+Local stand-in for the Ollama HTTP API with configurable latency.
+
+Implements the routes the app uses:
+  POST /api/embed        {"model", "input": [...]}      -> {"embeddings": [[...], ...]}
+  POST /api/embeddings   {"model", "prompt"}            -> {"embedding": [...]}
+  POST /api/generate     {"model", "prompt", "stream"}  -> a DealNarration JSON answer
+  GET  /api/tags, GET /                                  -> liveness
+Embeddings are deterministic hashed bag-of-words vectors (similar texts get similar
+vectors); generations name every 'SKU: ...' found in the prompt, streamed token by token
+when stream=true.
+
+    python -m benchmarks.ollama_stub --port 11435 --embed-latency-ms 20 --generate-latency-ms 300
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional
+
+import numpy as np
+
+_TOKEN = re.compile(r"[0-9a-z]+")
+_SKU = re.compile(r"SKU: (\S+)")
+
+
+@dataclass
+class StubConfig:
+    dim: int = 768
+    embed_latency_ms: float = 20.0  # Per request
+    embed_per_text_ms: float = 0.5  # Added per text in a batch
+    generate_latency_ms: float = 300.0  # Time to first token
+    token_latency_ms: float = 5.0  # Between streamed chunks
+
+
+def embed_text(text: str, dim: int) -> List[float]:
+    vector = np.zeros(dim, dtype=np.float32)
+    for token in _TOKEN.findall(text.casefold()):
+        digest = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "little")
+        vector[digest % dim] += 1.0 if (digest >> 32) & 1 else -1.0
+    norm = np.linalg.norm(vector)
+    return (vector / norm if norm else vector).tolist()
+
+
+def narration_for(prompt: str) -> str:
+    skus = list(dict.fromkeys(_SKU.findall(prompt)))
+    return json.dumps({
+        "reasons": [{"sku": sku, "reason": f"A well-priced pick with a solid discount ({sku})."} for sku in skus],
+        "explanation": f"These {len(skus)} products combine the best discounts and quality for their price.",
+    })
+
+
+def make_handler(config: StubConfig):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):  # Keep benchmark output clean
+            pass
+
+        def _json(self, payload, status: int = 200) -> None:
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path in ("/", "/api/tags"):
+                return self._json({"models": [{"name": "stub"}]})
+            self._json({"error": "not found"}, 404)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            payload = json.loads(self.rfile.read(length) or b"{}")
+            if self.path == "/api/embed":
+                texts = payload.get("input", [])
+                texts = [texts] if isinstance(texts, str) else texts
+                time.sleep((config.embed_latency_ms + config.embed_per_text_ms * len(texts)) / 1000)
+                return self._json({"model": payload.get("model"), "embeddings": [embed_text(t, config.dim) for t in texts]})
+            if self.path == "/api/embeddings":
+                time.sleep((config.embed_latency_ms + config.embed_per_text_ms) / 1000)
+                return self._json({"embedding": embed_text(payload.get("prompt", ""), config.dim)})
+            if self.path == "/api/generate":
+                return self._generate(payload)
+            self._json({"error": "not found"}, 404)
+
+        def _generate(self, payload) -> None:
+            answer = narration_for(payload.get("prompt", ""))
+            time.sleep(config.generate_latency_ms / 1000)
+            if not payload.get("stream", True):
+                return self._json({"model": payload.get("model"), "response": answer, "done": True})
+            # NDJSON stream, as Ollama sends it
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            chunks = [answer[i:i + 8] for i in range(0, len(answer), 8)]
+            try:
+                for chunk in chunks:
+                    self._chunk(json.dumps({"model": payload.get("model"), "response": chunk, "done": False}) + "\n")
+                    time.sleep(config.token_latency_ms / 1000)
+                self._chunk(json.dumps({"model": payload.get("model"), "response": "", "done": True}) + "\n")
+                self.wfile.write(b"0\r\n\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # Client cancelled the generation
+
+        def _chunk(self, text: str) -> None:
+            data = text.encode()
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+    return Handler
+
+
+def start_stub(host: str = "127.0.0.1", port: int = 0, config: Optional[StubConfig] = None) -> ThreadingHTTPServer:
+    """Starts the stub on a background thread; port=0 picks a free port (see server.server_address)."""
+    server = ThreadingHTTPServer((host, port), make_handler(config or StubConfig()))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="ollama-stub", daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--embed-per-text-ms", type=float, default=0.5)
+    parser.add_argument("--generate-latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-latency-ms", type=float, default=5.0)
+    args = parser.parse_args()
+    config = StubConfig(args.dim, args.embed_latency_ms, args.embed_per_text_ms, args.generate_latency_ms, args.token_latency_ms)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(config))
+    print(f"🧪 Ollama stub listening on http://{args.host}:{args.port} (dim={args.dim})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
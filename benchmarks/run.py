@@ -0,0 +1,427 @@
+# benchmarks/run.py
+"""
+Benchmark scenarios for the ingestion, forecasting, pricing and deals paths.
+
+Everything runs against synthetic data (benchmarks.generate_data) and a local Ollama
+stand-in (benchmarks.ollama_stub) inside a throwaway work directory, so runs are
+reproducible and need neither Kaggle nor a live Ollama. Each scenario reports
+p50/p95/p99 latency, throughput and peak memory; results are written as JSON and can be
+compared with an earlier run.
+
+    python -m benchmarks.run --scale tiny
+    python -m benchmarks.run --scale small --scenarios generate_forecast_warm,recommend_price --iterations 50
+    python -m benchmarks.run --scale small --compare benchmarks/results/<earlier>.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.generate_data import SCALES, Scale, make_catalog, write_raw, write_sales_store
+from benchmarks.ollama_stub import StubConfig, start_stub
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+# --- Measurement ---
+def summarize(latencies: List[float], elapsed: float, peak_alloc_bytes: Optional[int] = None, **extra) -> Dict:
+    ms = np.asarray(latencies) * 1000
+    result = {
+        "count": len(latencies),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "throughput_per_s": round(len(latencies) / max(elapsed, 1e-9), 3),
+        "peak_alloc_mb": round(peak_alloc_bytes / 2**20, 2) if peak_alloc_bytes is not None else None,
+        "process_max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+    }
+    result.update(extra)
+    return result
+
+
+def measure(calls: List[Callable[[], object]], warmup: int = 0, **extra) -> Dict:
+    """
+    Times each call sequentially, then repeats the first one under tracemalloc for the
+    peak Python allocation (kept out of the timed loop because tracing slows it down).
+    """
+    for call in calls[:warmup]:
+        call()
+    latencies = []
+    started = time.perf_counter()
+    for call in calls[warmup:]:
+        t0 = time.perf_counter()
+        call()
+        latencies.append(time.perf_counter() - t0)
+    elapsed = time.perf_counter() - started
+
+    tracemalloc.start()
+    calls[-1]()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return summarize(latencies, elapsed, peak, **extra)
+
+
+# --- Context: data, stores and the Ollama stub, created once per run ---
+class BenchContext:
+    def __init__(self, workdir: str, scale: Scale, iterations: int, concurrency: int, seed: int, stub: StubConfig):
+        self.workdir = workdir
+        self.scale = scale
+        self.iterations = iterations
+        self.concurrency = concurrency
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.raw_dir = os.path.join(workdir, "raw")
+        self.stub = start_stub(config=stub)
+        self.ollama_url = f"http://127.0.0.1:{self.stub.server_address[1]}"
+        self.env = {
+            "SALES_STORE_PATH": os.path.join(workdir, "sales_store"),
+            "MODEL_STORE_PATH": os.path.join(workdir, "models"),
+            "PRODUCT_HIERARCHY_PATH": os.path.join(workdir, "product_hierarchy.parquet"),
+            "FORECAST_STORE_PATH": os.path.join(workdir, "forecasts.parquet"),
+            "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embedding_cache.sqlite"),
+            "CHROMA_PATH": os.path.join(workdir, "chroma_db"),
+            "OLLAMA_URL": self.ollama_url,
+        }
+        os.environ.update(self.env)  # Before any app module is imported
+        self._ready = set()
+
+    def raw_data(self) -> str:
+        if "raw" not in self._ready:
+            write_raw(self.raw_dir, self.scale, self.seed)
+            self._ready.add("raw")
+        return self.raw_dir
+
+    def sales_store(self) -> None:
+        if "sales" not in self._ready:
+            write_sales_store(self.env["SALES_STORE_PATH"], self.scale, self.seed)
+            self._ready.add("sales")
+
+    def series(self, n: int) -> List[tuple]:
+        self.sales_store()
+        from app.services.series_index import get_series_index
+        keys = sorted(get_series_index().keys())
+        return [keys[i % len(keys)] for i in range(n)]
+
+    def catalog(self) -> List[Dict]:
+        """Indexes the synthetic catalog into Chroma through the stub; returns (region, channel, query) samples."""
+        if "catalog" not in self._ready:
+            from app.data_ingestion import SalesSummary, iter_document_batches, iter_sales_chunks, sync_catalog
+            summary = SalesSummary()
+            for chunk in iter_sales_chunks(self.raw_data()):
+                summary.add(chunk)
+            self._docs = [doc.metadata for batch in iter_document_batches(self.raw_dir, summary) for doc in batch]
+            sync_catalog(iter_document_batches(self.raw_dir, summary))
+            self._ready.add("catalog")
+        catalog = make_catalog(self.scale, self.seed)
+        words = sorted(set(catalog["class_name"]) | set(catalog["dept_name"]))
+        samples = []
+        for _ in range(self.iterations):
+            meta = self.rng.choice(self._docs)
+            query = self.rng.choice([meta["sku"], meta["name"], f"cheap {self.rng.choice(words).lower()}", "gift ideas for a picnic"])
+            samples.append({"region": meta["region"], "channel": meta["channel"], "query": query})
+        return samples
+
+    def close(self) -> None:
+        self.stub.shutdown()
+
+
+# --- Scenarios ---
+def bench_preprocess_data(ctx: BenchContext) -> Dict:
+    from app.data_ingestion import preprocess_data
+    raw = ctx.raw_data()
+    runs = max(1, min(ctx.iterations, 3))
+    return measure([lambda: preprocess_data(raw)] * runs, sales_rows=ctx.scale.rows, products=ctx.scale.skus)
+
+
+def bench_generate_forecast_cold(ctx: BenchContext) -> Dict:
+    """First forecast of each series: every call fits a model (the run's model store starts empty)."""
+    from app.services.forecast_service import generate_forecast
+    series = ctx.series(min(ctx.iterations, ctx.scale.series))
+    return measure([lambda s=s: generate_forecast(s[0], s[1], s[2], "8w") for s in series])
+
+
+def bench_generate_forecast_warm(ctx: BenchContext) -> Dict:
+    """Repeated series whose fitted model is already cached."""
+    from app.services.forecast_service import generate_forecast
+    series = ctx.series(min(ctx.iterations, 5))
+    calls = [lambda s=s: generate_forecast(s[0], s[1], s[2], "8w") for s in series]
+    return measure(calls + [calls[i % len(calls)] for i in range(ctx.iterations)], warmup=len(calls))
+
+
+def bench_forecast_engines(ctx: BenchContext) -> Dict:
+    """Accuracy vs latency of each forecast engine on the same 28-day holdout (see benchmarks.backtest)."""
+    from benchmarks.backtest import backtest, load_histories
+    ctx.sales_store()
+    histories = load_histories(min(ctx.iterations, ctx.scale.series), ctx.seed)
+    return backtest(histories, 28, ["prophet", "holt_winters", "ets", "seasonal_naive"])
+
+
+def bench_forecast_materialized(ctx: BenchContext) -> Dict:
+    """Full and no-change incremental materialization runs, then serving lookups from the precomputed store."""
+    from app.services.forecast_materializer import ForecastMaterializer
+    from app.services.forecast_store import MaterializedForecastStore
+    series = ctx.series(ctx.iterations)
+    # Own store file, so the pricing scenarios' demand sources are not affected
+    store = MaterializedForecastStore(os.path.join(ctx.workdir, "forecasts_bench.parquet"))
+    materializer = ForecastMaterializer(store, horizon="13w", engine="holt_winters")
+    full, incremental = materializer.run(full=True, reason="bench"), materializer.run(reason="bench")
+    return {
+        "full_run": {"seconds": full["seconds"], "series": full["series"]},
+        "incremental_run": {"seconds": incremental["seconds"], "recomputed": incremental["recomputed"]},
+        "serve": measure([lambda s=s: store.get(s).points(56) for s in series]),
+    }
+
+
+def bench_recommend_price(ctx: BenchContext) -> Dict:
+    from app.schemas import PricingRecommendationRequest
+    from app.services.pricing_service import recommend_price
+    requests = [
+        PricingRecommendationRequest(sku=s[0], region=s[1], channel=s[2], current_price=100.0)
+        for s in ctx.series(ctx.iterations)
+    ]
+    return measure([lambda r=r: recommend_price(r) for r in requests], warmup=1)
+
+
+def bench_recommend_prices_batch(ctx: BenchContext) -> Dict:
+    from app.schemas import PricingRecommendationRequest
+    from app.services.pricing_service import recommend_prices_batch
+    batch = [
+        PricingRecommendationRequest(sku=s[0], region=s[1], channel=s[2], current_price=100.0)
+        for s in ctx.series(min(ctx.scale.series, 1000))
+    ]
+    runs = max(2, ctx.iterations // 10)
+    return measure([lambda: recommend_prices_batch(batch)] * runs, warmup=1, batch_size=len(batch))
+
+
+def _bench_search(ctx: BenchContext, fast: bool) -> Dict:
+    from app.services.deal_cache import deal_cache
+    from app.services.rag_service import search_deals
+
+    def call(sample):
+        deal_cache.clear()  # Measure the uncached path
+        return search_deals(sample["query"], sample["region"], sample["channel"], 5, fast=fast)
+
+    return measure([lambda s=s: call(s) for s in ctx.catalog()], warmup=1)
+
+
+def bench_search_deals_fast(ctx: BenchContext) -> Dict:
+    return _bench_search(ctx, fast=True)
+
+
+def bench_search_deals_llm(ctx: BenchContext) -> Dict:
+    return _bench_search(ctx, fast=False)
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _peak_rss_mb(pid: int) -> Optional[float]:
+    try:
+        with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def bench_http(ctx: BenchContext) -> Dict:
+    """Concurrent load against a uvicorn server (separate process) sharing this run's data."""
+    import requests
+
+    samples = ctx.catalog()
+    series = ctx.series(ctx.iterations)
+    port = _free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=REPO_ROOT, env={**os.environ, **ctx.env},
+    )
+    base = f"http://127.0.0.1:{port}"
+    try:
+        for _ in range(600):
+            try:
+                if requests.get(f"{base}/health", timeout=1).ok:
+                    break
+            except requests.ConnectionError:
+                time.sleep(0.1)
+        else:
+            raise RuntimeError("uvicorn did not start")
+
+        endpoints = {
+            "health": [lambda s: s.get(f"{base}/health")] * ctx.iterations,
+            "forecast": [
+                lambda s, k=k: s.get(f"{base}/forecast/forecast", params={"sku": k[0], "region": k[1], "channel": k[2]})
+                for k in series
+            ],
+            "pricing": [
+                lambda s, k=k: s.post(f"{base}/pricing/recommend", json={"sku": k[0], "region": k[1], "channel": k[2], "current_price": 100.0})
+                for k in series
+            ],
+            "deals_fast": [
+                lambda s, q=q: s.get(f"{base}/deals/search", params={**q, "top_k": 5, "fast": True})
+                for q in samples
+            ],
+        }
+        results = {}
+        for name, calls in endpoints.items():
+            results[name] = _load(calls, ctx.concurrency)
+        results["server_peak_rss_mb"] = _peak_rss_mb(server.pid)
+        return results
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _load(calls: List[Callable], concurrency: int) -> Dict:
+    import requests
+
+    sessions: Dict[int, requests.Session] = {}
+
+    def timed(call):
+        session = sessions.setdefault(threading.get_ident(), requests.Session())
+        t0 = time.perf_counter()
+        response = call(session)
+        return time.perf_counter() - t0, response.status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        outcomes = list(pool.map(timed, calls))
+    elapsed = time.perf_counter() - started
+    statuses: Dict[str, int] = {}
+    for _, status in outcomes:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return summarize([latency for latency, _ in outcomes], elapsed, concurrency=concurrency, status_codes=statuses)
+
+
+SCENARIOS: Dict[str, Callable[[BenchContext], Dict]] = {
+    "preprocess_data": bench_preprocess_data,
+    "generate_forecast_cold": bench_generate_forecast_cold,
+    "generate_forecast_warm": bench_generate_forecast_warm,
+    "forecast_engines": bench_forecast_engines,
+    "forecast_materialized": bench_forecast_materialized,
+    "recommend_price": bench_recommend_price,
+    "recommend_prices_batch": bench_recommend_prices_batch,
+    "search_deals_fast": bench_search_deals_fast,
+    "search_deals_llm": bench_search_deals_llm,
+    "http": bench_http,
+}
+
+
+# --- Reporting ---
+def _flatten(results: Dict, prefix: str = "") -> Dict[str, Dict]:
+    flat = {}
+    for name, value in results.items():
+        if isinstance(value, dict) and "p50_ms" in value:
+            flat[prefix + name] = value
+        elif isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{name}."))
+    return flat
+
+
+def print_report(results: Dict, baseline: Optional[Dict] = None) -> None:
+    current = _flatten(results["scenarios"])
+    previous = _flatten(baseline["scenarios"]) if baseline else {}
+    print(f"\n{'scenario':34} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10} {'thr/s':>10} {'peak MB':>8}  vs baseline")
+    for name, r in current.items():
+        delta = ""
+        if name in previous:
+            before = previous[name]
+            delta = (
+                f"p50 {100 * (r['p50_ms'] / before['p50_ms'] - 1):+.1f}%  "
+                f"thr {100 * (r['throughput_per_s'] / before['throughput_per_s'] - 1):+.1f}%"
+            ) if before["p50_ms"] and before["throughput_per_s"] else ""
+        peak = r.get("peak_alloc_mb")
+        print(
+            f"{name:34} {r['p50_ms']:>10.2f} {r['p95_ms']:>10.2f} {r['p99_ms']:>10.2f} "
+            f"{r['throughput_per_s']:>10.2f} {peak if peak is not None else '-':>8}  {delta}"
+        )
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", choices=SCALES, default="tiny")
+    parser.add_argument("--scenarios", default="all", help=f"Comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--iterations", type=int, default=20, help="Calls per scenario (per endpoint for http)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Parallel clients in the http scenario")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--embed-latency-ms", type=float, default=20.0)
+    parser.add_argument("--generate-latency-ms", type=float, default=300.0)
+    parser.add_argument("--token-latency-ms", type=float, default=5.0)
+    parser.add_argument("--output", default=None, help="Result file (default: benchmarks/results/<time>-<scale>.json)")
+    parser.add_argument("--compare", default=None, help="Earlier result file to compare against")
+    parser.add_argument("--keep-workdir", action="store_true")
+    args = parser.parse_args()
+
+    names = list(SCENARIOS) if args.scenarios == "all" else [n.strip() for n in args.scenarios.split(",") if n.strip()]
+    unknown = [n for n in names if n not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    workdir = tempfile.mkdtemp(prefix="techspark-bench-")
+    stub = StubConfig(embed_latency_ms=args.embed_latency_ms, generate_latency_ms=args.generate_latency_ms, token_latency_ms=args.token_latency_ms)
+    ctx = BenchContext(workdir, SCALES[args.scale], args.iterations, args.concurrency, args.seed, stub)
+    results = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "scale": {"name": args.scale, **vars(ctx.scale)},
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "keep_workdir")},
+        "scenarios": {},
+    }
+    try:
+        for name in names:
+            print(f"⏱️  {name} ...")
+            try:
+                results["scenarios"][name] = SCENARIOS[name](ctx)
+            except Exception as e:
+                print(f"❌ {name} failed: {e}")
+                results["scenarios"][name] = {"error": str(e)}
+    finally:
+        ctx.close()
+        if not args.keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{args.scale}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(results, baseline)
+    print(f"\n💾 Results saved to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# tests/conftest.py
+import os
+import tempfile
+
+import pytest
+
+# Every store the services read or write lives in a throwaway directory. The modules read
+# these variables at import time, so they are set before any app module is imported.
+_DATA_DIR = tempfile.mkdtemp(prefix="retail-tests-")
+os.environ.update({
+    "SALES_STORE_PATH": os.path.join(_DATA_DIR, "sales_store"),
+    "PRODUCT_HIERARCHY_PATH": os.path.join(_DATA_DIR, "product_hierarchy.parquet"),
+    "MODEL_STORE_PATH": os.path.join(_DATA_DIR, "models"),
+    "FORECAST_STORE_PATH": os.path.join(_DATA_DIR, "forecasts.parquet"),
+    "EMBEDDING_CACHE_PATH": os.path.join(_DATA_DIR, "embedding_cache.sqlite"),
+    "CHROMA_PATH": os.path.join(_DATA_DIR, "chroma_db"),
+    "INGEST_LOCK_DIR": _DATA_DIR,
+    # Prophet is optional; the vectorized engines need nothing beyond numpy/pandas
+    "FORECAST_ENGINE": "holt_winters",
+    "FORECAST_MATERIALIZE_AFTER_INGEST": "0",
+})
+
+
+@pytest.fixture(scope="session")
+def data_dir() -> str:
+    return _DATA_DIR
+
+
+@pytest.fixture(scope="session")
+def sales_data(data_dir):
+    """The 'tiny' synthetic benchmark data (80 series, 180 days) in the test sales store."""
+    from benchmarks.generate_data import SCALES, write_sales_store
+    from app.services.series_index import get_series_index
+
+    write_sales_store(os.environ["SALES_STORE_PATH"], SCALES["tiny"], seed=0)
+    return get_series_index()
@@ -0,0 +1,91 @@
+# tests/test_catalog_sync.py
+import os
+import zlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain_core")
+
+from app import data_ingestion  # noqa: E402
+from app.services.deal_cache import read_collection_version  # noqa: E402
+from app.services.lexical_index import get_lexical_index  # noqa: E402
+
+
+class FakeEmbeddingClient:
+    """Deterministic stand-in for the Ollama client: one small vector per text."""
+
+    def __init__(self, *args, **kwargs):
+        self.embedded = []
+
+    def embed(self, texts):
+        self.embedded.extend(texts)
+        return [np.random.default_rng(zlib.crc32(text.encode())).normal(size=8).tolist() for text in texts]
+
+    def close(self):
+        pass
+
+
+def _catalog(**prices) -> list:
+    frame = pd.DataFrame({
+        "sku": list(prices),
+        "name": [f"Product {sku}" for sku in prices],
+        "region": "R00",
+        "channel": "online",
+        "dept_name": "Grocery",
+        "class_name": "Snacks",
+        "quality_score": 7,
+        "price": list(prices.values()),
+        "discount": 10.0,
+    })
+    return data_ingestion.build_documents(frame, current_season="May")
+
+
+def _collection_ids() -> set:
+    return set(data_ingestion._open_collection().get(include=[])["ids"])
+
+
+@pytest.fixture
+def embedder(monkeypatch):
+    client = FakeEmbeddingClient()
+    monkeypatch.setattr(data_ingestion, "OllamaEmbeddingClient", lambda *args, **kwargs: client)
+    monkeypatch.setattr(data_ingestion, "VECTOR_BACKEND", "chroma")
+    return client
+
+
+def test_document_ids_change_only_with_the_content():
+    first, same, repriced = _catalog(A=1.0)[0], _catalog(A=1.0)[0], _catalog(A=2.0)[0]
+
+    assert data_ingestion.document_id(first) == data_ingestion.document_id(same)
+    assert data_ingestion.document_id(first) != data_ingestion.document_id(repriced)
+    assert data_ingestion.document_id(first).startswith("A:")
+
+
+def test_sync_upserts_changed_products_and_deletes_stale_ids(embedder):
+    assert not os.path.exists(data_ingestion.CHROMA_PATH)
+    dry = data_ingestion.sync_catalog([_catalog(A=1.0, B=2.0, C=3.0)], dry_run=True)
+    assert dry == {"added": 3, "changed": 0, "unchanged": 0, "removed": 0}
+    assert not os.path.exists(data_ingestion.CHROMA_PATH)  # A dry run writes nothing
+
+    initial = _catalog(A=1.0, B=2.0, C=3.0)
+    assert data_ingestion.sync_catalog([initial]) == {"added": 3, "changed": 0, "unchanged": 0, "removed": 0}
+    assert _collection_ids() == {data_ingestion.document_id(doc) for doc in initial}
+
+    embedder.embedded.clear()
+    assert data_ingestion.sync_catalog([initial]) == {"added": 0, "changed": 0, "unchanged": 3, "removed": 0}
+    assert embedder.embedded == []
+
+    updated = _catalog(A=1.0, B=2.5, D=4.0)  # B repriced, C dropped, D new
+    diff = data_ingestion.sync_catalog([updated])
+    assert diff == {"added": 1, "changed": 1, "unchanged": 1, "removed": 1}
+    assert len(embedder.embedded) == 2
+    assert _collection_ids() == {data_ingestion.document_id(doc) for doc in updated}
+    # The lexical index was written for the version the sync published
+    assert get_lexical_index(data_ingestion.CHROMA_PATH, read_collection_version(data_ingestion.CHROMA_PATH)) is not None
+
+    before = _collection_ids()
+    dry = data_ingestion.sync_catalog([_catalog(A=9.0)], dry_run=True)
+    assert dry == {"added": 0, "changed": 1, "unchanged": 0, "removed": 2}
+    assert _collection_ids() == before
@@ -0,0 +1,62 @@
+# tests/test_compute_scheduler.py
+import asyncio
+import gc
+import threading
+
+from app.services.compute_scheduler import compute
+
+
+def _running() -> int:
+    return compute.stats()["forecast"]["running"]
+
+
+def test_dropped_stream_releases_its_slot():
+    def produce():
+        yield 1
+
+    async def open_and_drop():
+        stream = await compute.stream("forecast", produce)
+        assert _running() == 1
+        del stream  # Never iterated: e.g. the response failed before its body started
+
+    asyncio.run(open_and_drop())
+    gc.collect()
+
+    assert _running() == 0
+
+
+def test_release_is_idempotent():
+    async def consume():
+        stream = await compute.stream("forecast", lambda: iter(range(3)))
+        items = [item async for item in stream]
+        await stream.aclose()  # The response's background task, after the body already finished
+        await stream.aclose()
+        return items
+
+    before = compute.stats()["forecast"]["completed"]
+    assert asyncio.run(consume()) == [0, 1, 2]
+    assert _running() == 0
+    assert compute.stats()["forecast"]["completed"] == before + 1
+
+
+def test_closed_stream_stops_the_generator():
+    closed = threading.Event()
+
+    def produce():
+        try:
+            while True:
+                yield 1
+        finally:
+            closed.set()
+
+    async def read_one():
+        stream = await compute.stream("forecast", produce)
+        assert await stream.__anext__() == 1
+        await stream.aclose()
+        # Closed: iteration ends instead of taking the slot again
+        assert [item async for item in stream] == []
+
+    asyncio.run(read_one())
+
+    assert closed.wait(5)
+    assert _running() == 0
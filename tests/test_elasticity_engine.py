@@ -0,0 +1,59 @@
+# tests/test_elasticity_engine.py
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.elasticity_engine import compute_elasticity_table
+
+
+def _series(sku: str, n: int, rng, price=None, promo=None, stock=None) -> pd.DataFrame:
+    price = rng.uniform(5, 15, n) if price is None else price
+    promo = rng.integers(0, 2, n) if promo is None else promo
+    stock = rng.integers(20, 200, n) if stock is None else stock
+    units = np.exp(4.0 - 1.7 * np.log(price) + 0.3 * promo + 0.002 * stock + rng.normal(0, 0.2, n))
+    return pd.DataFrame({
+        "sku": sku, "region": "R00", "channel": "online",
+        "units_sold": np.maximum(1, np.round(units)), "price": price, "promo": promo, "stock_level": stock,
+    })
+
+
+@pytest.fixture(scope="module")
+def sales():
+    rng = np.random.default_rng(7)
+    return pd.concat([
+        _series("FULL", 120, rng),
+        _series("NO_PROMO", 60, rng, promo=np.zeros(60), stock=np.full(60, 50)),  # promo and stock collinear with the constant
+        _series("FLAT_PRICE", 40, rng, price=np.full(40, 9.99)),
+        _series("ONE_ROW", 1, rng),
+    ], ignore_index=True)
+
+
+def _statsmodels_fit(frame: pd.DataFrame):
+    sm = pytest.importorskip("statsmodels.api")
+    X = sm.add_constant(np.column_stack([np.log(frame["price"]), frame["promo"], frame["stock_level"]]).astype(float), has_constant="add")
+    return sm.OLS(np.log(frame["units_sold"].to_numpy(dtype=float)), X).fit()
+
+
+@pytest.mark.parametrize("sku", ["FULL", "NO_PROMO"])
+def test_matches_statsmodels_ols(sales, sku):
+    row = compute_elasticity_table(sales).loc[(sku, "R00", "online")]
+    fit = _statsmodels_fit(sales[sales["sku"] == sku])
+
+    assert row["n_obs"] == fit.nobs
+    assert row["elasticity"] == pytest.approx(fit.params[1], rel=1e-6)
+    assert row["r_squared"] == pytest.approx(fit.rsquared, rel=1e-6)
+    assert row["std_err"] == pytest.approx(fit.bse[1], rel=1e-5)
+
+
+@pytest.mark.parametrize("sku, n_obs", [("FLAT_PRICE", 40), ("ONE_ROW", 1)])
+def test_unidentified_series_have_no_elasticity(sales, sku, n_obs):
+    row = compute_elasticity_table(sales).loc[(sku, "R00", "online")]
+
+    assert row["n_obs"] == n_obs
+    assert np.isnan(row["elasticity"]) and np.isnan(row["r_squared"]) and np.isnan(row["std_err"])
+
+
+def test_input_frame_is_not_modified(sales):
+    before = sales.copy()
+    compute_elasticity_table(sales)
+    pd.testing.assert_frame_equal(sales, before)
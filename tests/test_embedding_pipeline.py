@@ -0,0 +1,135 @@
+# tests/test_embedding_pipeline.py
+from types import SimpleNamespace
+
+import pytest
+
+from app import embedding_pipeline
+from app.embedding_pipeline import OllamaEmbeddingClient, embed_and_commit
+from benchmarks.ollama_stub import StubConfig, embed_text, make_handler, start_stub
+
+DIM = 16
+
+
+@pytest.fixture
+def ollama(monkeypatch):
+    """
+    The bundled Ollama stand-in, with knobs: `fail` 5xx responses before answering again,
+    and `legacy` to answer /api/embed with 404 like servers that predate it.
+    """
+    monkeypatch.setattr(embedding_pipeline, "EMBED_BACKOFF_SECONDS", 0.0)
+    state = SimpleNamespace(fail=0, legacy=False, calls=[])
+    config = StubConfig(dim=DIM, embed_latency_ms=0, embed_per_text_ms=0)
+    base = make_handler(config)
+
+    class Handler(base):
+        def do_POST(self):
+            state.calls.append(self.path)
+            if state.fail:
+                state.fail -= 1
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                return self._json({"error": "model is loading"}, 503)
+            if state.legacy and self.path == "/api/embed":
+                self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                return self._json({"error": "not found"}, 404)
+            return super().do_POST()
+
+    server = start_stub(config=config)
+    server.RequestHandlerClass = Handler
+    host, port = server.server_address
+    state.client = OllamaEmbeddingClient(f"http://{host}:{port}", "stub")
+    yield state
+    state.client.close()
+    server.shutdown()
+    server.server_close()
+
+
+class FakeCollection:
+    """The get/upsert subset of a Chroma collection that embed_and_commit uses."""
+
+    def __init__(self):
+        self.rows = {}
+        self.upserts = []
+
+    def get(self, ids, include):
+        return {"ids": [i for i in ids if i in self.rows]}
+
+    def upsert(self, ids, embeddings, metadatas, documents):
+        self.upserts.append(list(ids))
+        self.rows.update(zip(ids, embeddings))
+
+
+def _docs(n: int, start: int = 0):
+    return [SimpleNamespace(page_content=f"product number {i}", metadata={"sku": f"S{i}"}) for i in range(start, start + n)]
+
+
+def _id(doc) -> str:
+    return doc.metadata["sku"]
+
+
+def test_server_errors_are_retried(ollama):
+    ollama.fail = 2
+
+    vectors = ollama.client.embed(["red apples", "green pears"])
+
+    assert vectors == [embed_text("red apples", DIM), embed_text("green pears", DIM)]
+    assert ollama.calls == ["/api/embed"] * 3
+
+
+def test_retries_are_bounded(ollama, monkeypatch):
+    monkeypatch.setattr(embedding_pipeline, "EMBED_MAX_RETRIES", 2)
+    ollama.fail = 10
+
+    with pytest.raises(ConnectionError, match="after 3 attempts"):
+        ollama.client.embed(["red apples"])
+
+
+def test_falls_back_to_the_legacy_endpoint(ollama):
+    ollama.legacy = True
+
+    assert ollama.client.embed(["red apples", "green pears"]) == [embed_text("red apples", DIM), embed_text("green pears", DIM)]
+    assert ollama.calls == ["/api/embed", "/api/embeddings", "/api/embeddings"]
+
+    # The fallback is remembered: later batches go straight to the legacy endpoint
+    ollama.client.embed(["plums"])
+    assert ollama.calls[3:] == ["/api/embeddings"]
+
+
+def test_batches_are_committed_one_upsert_each(ollama):
+    collection = FakeCollection()
+    first = _docs(5)
+
+    done = embed_and_commit([first + first[:2], _docs(7, start=5)], collection, ollama.client, id_for=_id, concurrency=2, batch_size=3)
+
+    # IDs repeated within an input batch are embedded once; every upsert holds at most one batch
+    assert done == 12
+    assert sorted(collection.rows) == sorted(f"S{i}" for i in range(12))
+    assert sorted(len(ids) for ids in collection.upserts) == [1, 2, 3, 3, 3]
+    assert collection.rows["S4"] == embed_text("product number 4", DIM)
+
+
+def test_resume_embeds_only_what_a_failed_run_did_not_commit(ollama, monkeypatch):
+    monkeypatch.setattr(embedding_pipeline, "EMBED_MAX_RETRIES", 0)
+    collection = FakeCollection()
+    docs = _docs(8)
+    embed = ollama.client.embed
+    batches = []
+
+    def failing_second_batch(texts):
+        batches.append(texts)
+        if len(batches) == 2:
+            ollama.fail = 1  # This request exhausts its (zero) retries
+        return embed(texts)
+
+    monkeypatch.setattr(ollama.client, "embed", failing_second_batch)
+    with pytest.raises(ConnectionError):
+        embed_and_commit([docs], collection, ollama.client, id_for=_id, concurrency=1, batch_size=2)
+    committed = set(collection.rows)
+    assert {"S0", "S1"} <= committed and len(committed) < len(docs)
+
+    monkeypatch.setattr(ollama.client, "embed", embed)
+    ollama.calls.clear()
+    done = embed_and_commit([docs], collection, ollama.client, id_for=_id, concurrency=1, batch_size=2)
+
+    assert done == len(docs) - len(committed)
+    assert sorted(collection.rows) == sorted(_id(doc) for doc in docs)
+    assert len(ollama.calls) == -(-done // 2)  # Only the missing documents were sent
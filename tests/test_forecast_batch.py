@@ -0,0 +1,72 @@
+# tests/test_forecast_batch.py
+import json
+import warnings
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.schemas import horizon_days
+from app.services.compute_scheduler import compute
+from app.services.forecast_service import generate_forecast_batch
+
+
+@pytest.fixture(scope="module")
+def client():
+    return TestClient(app)
+
+
+def test_failing_series_do_not_abort_the_batch(sales_data):
+    good = sales_data.keys()[:2]
+    series = [(*good[0], "1w"), ("NO-SUCH-SKU", "R00", "online", "1w"), (*good[1], "not-a-horizon"), (*good[1], "2w")]
+
+    items = {(item["sku"], item["horizon"]): item for item in generate_forecast_batch(series)}
+
+    assert len(items) == len(series)
+    assert items[(good[0][0], "1w")]["status"] == "ok"
+    assert len(items[(good[0][0], "1w")]["forecast_series"]) == 7
+    assert len(items[(good[1][0], "2w")]["forecast_series"]) == 14
+    assert items[("NO-SUCH-SKU", "1w")]["status"] == "error"
+    assert "Insufficient historical sales data" in items[("NO-SUCH-SKU", "1w")]["error"]
+    assert items[(good[1][0], "not-a-horizon")]["status"] == "error"
+    assert "Invalid horizon" in items[(good[1][0], "not-a-horizon")]["error"]
+
+
+def test_batch_endpoint_streams_errors_per_series(client, sales_data):
+    sku, region, channel = sales_data.keys()[0]
+    body = {
+        "series": [
+            {"sku": sku, "region": region, "channel": channel, "horizon": "1w"},
+            {"sku": "NO-SUCH-SKU", "region": region, "channel": channel, "horizon": "1w"},
+        ],
+        "max_workers": 10_000,  # Accepted, but capped at FORECAST_MAX_WORKERS
+    }
+    response = client.post("/forecast/batch", json=body)
+
+    assert response.status_code == 200
+    statuses = {item["sku"]: item["status"] for item in map(json.loads, response.text.splitlines())}
+    assert statuses == {sku: "ok", "NO-SUCH-SKU": "error"}
+    assert compute.stats()["forecast"]["running"] == 0
+
+
+@pytest.mark.parametrize("horizon, days", [("8w", 56), ("1 w", 7), ("2W", 14), ("14d", 14), ("3D", 3), ("2 days", 2)])
+def test_horizons_parse_without_deprecated_units(horizon, days):
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")  # pandas 3 warns before it drops the lowercase 'w' and 'd' units
+        assert horizon_days(horizon) == days
+
+
+def test_batch_endpoint_rejects_an_invalid_horizon(client, sales_data):
+    response = client.post("/forecast/batch", json={"filter": {"region": "R00"}, "horizon": "soon"})
+
+    assert response.status_code == 422
+
+
+def test_batch_endpoint_is_admitted_by_the_compute_scheduler(client, sales_data, monkeypatch):
+    forecast = compute._classes["forecast"]
+    monkeypatch.setattr(forecast, "running", forecast.concurrency + forecast.max_queue)
+
+    response = client.post("/forecast/batch", json={"filter": {"region": "R00"}, "horizon": "1w"})
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
@@ -0,0 +1,52 @@
+# tests/test_forecast_materializer.py
+import os
+
+import pytest
+
+from app.services.forecast_materializer import ForecastMaterializer, get_materialized_forecasts
+from app.services.forecast_store import forecast_store
+from app.services.sales_store import append_sales, staged_sales_store
+from app.services.series_index import load_sales_frame, rebuild_series_index
+
+
+def _publish(frame) -> None:
+    """Replaces the sales store with `frame`, as an ingestion would."""
+    with staged_sales_store(os.environ["SALES_STORE_PATH"]) as staging:
+        append_sales(frame, staging)
+    rebuild_series_index()
+
+
+@pytest.fixture
+def original_sales(sales_data):
+    frame = load_sales_frame()
+    yield frame
+    _publish(frame)
+
+
+def test_incremental_run_recomputes_only_changed_series(original_sales):
+    materializer = ForecastMaterializer(store=forecast_store, horizon="2w")
+    keys = list(original_sales[["sku", "region", "channel"]].drop_duplicates().itertuples(index=False, name=None))
+
+    first = materializer.run(full=True)
+    assert (first["series"], first["recomputed"], first["errors"]) == (len(keys), len(keys), 0)
+
+    second = materializer.run()
+    assert (second["recomputed"], second["unchanged"], second["removed"]) == (0, len(keys), 0)
+
+    changed, removed = keys[0], keys[1]
+    frame = original_sales.copy()
+    is_changed = (frame["sku"] == changed[0]) & (frame["region"] == changed[1]) & (frame["channel"] == changed[2])
+    is_removed = (frame["sku"] == removed[0]) & (frame["region"] == removed[1]) & (frame["channel"] == removed[2])
+    frame.loc[is_changed, "units_sold"] += 5
+    _publish(frame[~is_removed])
+
+    # Until the next run, the forecast made from the old history of `changed` is not served
+    served = get_materialized_forecasts([changed, keys[2]], "1w")
+    assert list(served) == [keys[2]]
+
+    third = materializer.run()
+    assert (third["recomputed"], third["unchanged"], third["removed"]) == (1, len(keys) - 2, 1)
+    entries, metadata = forecast_store.snapshot()
+    assert removed not in entries and changed in entries
+    assert metadata["horizon"] == "2w"
+    assert changed in get_materialized_forecasts([changed], "1w")
@@ -0,0 +1,75 @@
+# tests/test_hierarchical.py
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services import forecast_service
+from app.services.forecast_engines import FORECAST_FAST_ENGINE, get_engine
+from app.services.forecast_service import _product_labels, generate_forecast_hierarchical
+
+
+@pytest.mark.parametrize("level", ["dept", "class"])
+def test_mint_members_add_up_to_their_aggregate(sales_data, level):
+    series = sales_data.keys()
+    result = generate_forecast_hierarchical(series, "2w", level=level, reconciliation="mint")
+    labels = _product_labels(level)
+
+    members = defaultdict(list)
+    for forecast in result["forecasts"]:
+        members[(labels[forecast["sku"]], forecast["region"])].append([p["demand"] for p in forecast["forecast_series"]])
+
+    assert result["groups"]
+    for group in result["groups"]:
+        rows = members[(group["group"], group["region"])]
+        assert len(rows) == group["members"]
+        total = np.array([p["demand"] for p in group["forecast_series"]])
+        # Every level is rounded to whole units separately: allow half a unit per rounded series
+        assert np.abs(np.sum(rows, axis=0) - total).max() <= (len(rows) + 1) / 2
+
+
+def test_top_down_splits_the_aggregate_by_share(sales_data):
+    result = generate_forecast_hierarchical(sales_data.keys()[:4], "1w", level="dept", reconciliation="top_down")
+
+    assert result["aggregate_fits"] == len(result["groups"])
+    assert result["member_fits"] == 0
+    assert all(len(f["forecast_series"]) == 7 for f in result["forecasts"])
+
+
+@pytest.mark.parametrize("reconciliation", ["bottom_up", "mint"])
+def test_members_ending_on_different_days_share_one_calendar(monkeypatch, reconciliation):
+    rng = np.random.default_rng(3)
+    histories = {
+        ("EARLY", "R00", "online"): pd.DataFrame({"ds": pd.date_range("2024-01-01", "2024-05-20"), "y": 0.0}),
+        ("LATE", "R00", "online"): pd.DataFrame({"ds": pd.date_range("2024-01-01", "2024-05-31"), "y": 0.0}),
+    }
+    for frame in histories.values():
+        frame["y"] = 20 + 10 * (frame["ds"].dt.dayofweek == 5) + rng.normal(0, 1, len(frame))
+
+    class Index:
+        def keys(self):
+            return list(histories)
+
+    monkeypatch.setattr(forecast_service, "get_series_index", lambda: Index())
+    monkeypatch.setattr(forecast_service, "_filter_series", lambda *key: histories[key])
+    monkeypatch.setattr(forecast_service, "_product_labels", lambda level: {"EARLY": "Snacks", "LATE": "Snacks"})
+    monkeypatch.setattr(forecast_service, "_remember_forecast", lambda key, points: None)
+
+    result = generate_forecast_hierarchical(list(histories), "1w", level="dept", reconciliation=reconciliation)
+
+    calendar = [d.strftime("%Y-%m-%d") for d in pd.date_range("2024-06-01", periods=7)]
+    (group,) = result["groups"]
+    assert [p["date"] for p in group["forecast_series"]] == calendar
+    for forecast in result["forecasts"]:
+        assert [p["date"] for p in forecast["forecast_series"]] == calendar
+    if reconciliation == "bottom_up":
+        # The early member contributes its own forecast for these dates, not its first week
+        early = ("EARLY", "R00", "online")
+        own = get_engine(FORECAST_FAST_ENGINE).forecast({early: histories[early]}, 18)[early]
+        expected = {p["date"]: p["demand"] for p in own}
+        served = next(f for f in result["forecasts"] if f["sku"] == "EARLY")["forecast_series"]
+        assert [p["demand"] for p in served] == [expected[d] for d in calendar]
+    rows = [[p["demand"] for p in f["forecast_series"]] for f in result["forecasts"]]
+    total = np.array([p["demand"] for p in group["forecast_series"]])
+    assert np.abs(np.sum(rows, axis=0) - total).max() <= 1.5
@@ -0,0 +1,48 @@
+# tests/test_ingestion.py
+import os
+
+import pandas as pd
+import pytest
+
+pytest.importorskip("chromadb")
+pytest.importorskip("langchain_core")
+
+from app import data_ingestion  # noqa: E402
+from app.services.sales_store import read_product_hierarchy  # noqa: E402
+from app.services.series_index import get_series_index, load_sales_frame  # noqa: E402
+
+
+@pytest.fixture
+def kaggle_dir(tmp_path):
+    """A two-product download in the Kaggle dataset's layout."""
+    pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=30).repeat(2),
+        "item_id": ["NEW1", "NEW2"] * 30,
+        "price_base": 4.5,
+        "quantity": 3,
+        "store_id": "S9",
+    }).to_csv(tmp_path / "sales.csv", index=False)
+    pd.DataFrame({
+        "item_id": ["NEW1", "NEW2"], "item_type": ["Tea", "Coffee"], "dept_name": ["Drinks"] * 2, "class_name": ["Hot"] * 2,
+    }).to_csv(tmp_path / "catalog.csv", index=False)
+    return str(tmp_path)
+
+
+def test_failed_catalog_sync_leaves_the_previous_sales_live(sales_data, kaggle_dir, monkeypatch):
+    def failing_sync(*args, **kwargs):
+        raise ConnectionError("Ollama is down")
+
+    monkeypatch.setattr(data_ingestion, "sync_catalog", failing_sync)
+    store = os.environ["SALES_STORE_PATH"]
+    before, hierarchy, version = load_sales_frame(), read_product_hierarchy(), get_series_index().version
+
+    with pytest.raises(ConnectionError):
+        data_ingestion.stream_ingestion(kaggle_dir)
+
+    pd.testing.assert_frame_equal(load_sales_frame(), before)
+    pd.testing.assert_frame_equal(read_product_hierarchy(), hierarchy)
+    assert get_series_index().version == version
+    # The staged copy was discarded
+    parent, name = os.path.split(os.path.abspath(store))
+    live = os.path.basename(os.path.realpath(store))
+    assert [entry for entry in os.listdir(parent) if entry.startswith(f"{name}.v-") and entry != live] == []
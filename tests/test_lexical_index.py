@@ -0,0 +1,32 @@
+# tests/test_lexical_index.py
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from langchain_core.documents import Document  # noqa: E402
+
+from app.services.lexical_index import LexicalIndex, get_lexical_index  # noqa: E402
+
+
+def _index(version: str) -> LexicalIndex:
+    index = LexicalIndex(version)
+    index.add([Document(page_content="Crunchy oat bars", metadata={
+        "sku": "A1", "name": "Oat bars", "region": "R00", "channel": "online", "dept_name": "Grocery", "class_name": "Snacks",
+    })])
+    return index.finalize()
+
+
+def test_lookup_before_the_index_is_saved_does_not_stick(tmp_path):
+    path = str(tmp_path)
+    _index("v1").save(path)
+    assert get_lexical_index(path, "v1").version == "v1"
+
+    # A search between the version bump and the save still finds the old index on disk
+    assert get_lexical_index(path, "v2") is None
+
+    _index("v2").save(path)
+    index = get_lexical_index(path, "v2")
+    assert index is not None and index.version == "v2"
+    assert get_lexical_index(path, "v2") is index
+    docs, _ = index.search("oat bars", "R00", "online", 5)
+    assert [doc.metadata["sku"] for doc in docs] == ["A1"]
@@ -0,0 +1,88 @@
+# tests/test_pricing.py
+import pandas as pd
+import pytest
+
+from app.schemas import PricingRecommendationRequest
+from app.services import demand_provider
+from app.services.pricing_service import recommend_price, recommend_prices_batch
+
+
+@pytest.fixture
+def no_forecasts(monkeypatch):
+    def forecast(*args, **kwargs):
+        raise AssertionError("pricing fell through to a full forecast")
+
+    monkeypatch.setattr(demand_provider, "generate_forecast_batch", forecast)
+
+
+def test_pricing_on_historical_data_needs_no_forecast(sales_data, no_forecasts):
+    # The test data ends in mid-2023: long before today, but current relative to itself
+    sku, region, channel = sales_data.keys()[0]
+    result = recommend_price(PricingRecommendationRequest(sku=sku, region=region, channel=channel, current_price=10.0))
+
+    assert result.demand_source in ("cache", "materialized", "rolling")
+
+
+def test_series_lagging_the_data_is_stale(sales_data, monkeypatch):
+    monkeypatch.setattr(demand_provider, "DEMAND_SOURCES", ["rolling"])
+    key = sales_data.keys()[0]
+    history = sales_data.get(*key)
+    lagging = history[history["date"] <= history["date"].max() - pd.Timedelta(days=60)]
+
+    (q, source, rationale), = demand_provider.estimate_demand_batch([key], [lagging])
+
+    assert source == "stale"
+    assert "60 days before the latest sales" in rationale
+
+
+@pytest.fixture
+def rolling_demand(monkeypatch):
+    """Deterministic demand for comparing results across calls."""
+    monkeypatch.setattr(demand_provider, "DEMAND_SOURCES", ["rolling"])
+
+
+def _request(key, **fields) -> PricingRecommendationRequest:
+    sku, region, channel = key
+    return PricingRecommendationRequest(sku=sku, region=region, channel=channel, **{"current_price": 10.0, "cost": 6.0, **fields})
+
+
+def test_batch_keeps_request_order_and_isolates_unknown_series(sales_data, rolling_demand):
+    keys = sales_data.keys()[:5][::-1]
+    requests = [_request(key) for key in keys]
+    requests.insert(2, _request(("NO-SUCH-SKU", "R00", "online"), current_price=12.5))
+
+    results = recommend_prices_batch(requests)
+
+    assert [r.sku for r in results] == [r.sku for r in requests]
+    unknown = results[2]
+    assert unknown.recommended_price == 12.5 and unknown.max_profit_estimate == 0.0
+    assert "Insufficient historical sales data" in unknown.rationale
+    assert all(r.demand_source == "rolling" for i, r in enumerate(results) if i != 2)
+
+
+def test_constraints_apply_per_item(sales_data, rolling_demand):
+    key = sales_data.keys()[0]
+    (free,) = recommend_prices_batch([_request(key)])
+    floor = round(free.recommended_price + 5, 2)  # Min margin whose price floor binds
+    cap = round(free.recommended_price / 2, 2)  # Competitor bound below the optimum
+
+    unconstrained, floored, capped = recommend_prices_batch([
+        _request(key),
+        _request(key, min_margin_percent=floor / 6.0 - 1),
+        _request(key, min_margin_percent=0.0, competitor_price_bound=cap),
+    ])
+
+    assert unconstrained == free
+    assert floored.recommended_price == pytest.approx(floor)
+    assert "margin constraint" in floored.rationale and "competitor" not in floored.rationale
+    assert capped.recommended_price == cap
+    assert "competitor price bound" in capped.rationale and "margin constraint" not in capped.rationale
+    assert len({r.elasticity_coefficient for r in (unconstrained, floored, capped)}) == 1
+
+
+def test_single_recommendation_matches_the_batch(sales_data, rolling_demand):
+    requests = [_request(key, min_margin_percent=0.2, competitor_price_bound=11.0) for key in sales_data.keys()[:4]]
+
+    batch = recommend_prices_batch(requests)
+
+    assert [recommend_price(request) for request in requests] == batch
@@ -0,0 +1,31 @@
+# tests/test_telemetry.py
+import re
+import threading
+
+from app.services.telemetry import observe_request, render_prometheus, span
+
+
+def test_scrape_while_new_stages_register():
+    def register(worker: int):
+        for n in range(300):
+            with span(f"test.stage{worker}.{n}"):
+                pass
+            observe_request("GET", f"/test/{worker}/{n}", 200, 0.001)
+
+    threads = [threading.Thread(target=register, args=(worker,)) for worker in range(4)]
+    for thread in threads:
+        thread.start()
+    renders = 0
+    while any(thread.is_alive() for thread in threads) or not renders:
+        text = render_prometheus()
+        renders += 1
+    for thread in threads:
+        thread.join()
+
+    # Every rendered histogram is self-consistent: its +Inf bucket equals its count
+    inf = _samples(r'^(\S+)_bucket\{(.*),le="\+Inf"\} (\d+)$', text)
+    assert inf and inf == _samples(r'^(\S+)_count\{(.*)\} (\d+)$', text)
+
+
+def _samples(pattern: str, text: str) -> dict:
+    return {(name, labels): int(value) for name, labels, value in re.findall(pattern, text, re.M)}
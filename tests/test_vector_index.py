@@ -0,0 +1,47 @@
+# tests/test_vector_index.py
+import os
+
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from app.services.vector_index import VECTOR_INDEX_DIR, build_vector_index, get_vector_index  # noqa: E402
+
+
+class FakeCollection:
+    """Just the paged get() of a Chroma collection that the index build reads."""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    def get(self, include, limit, offset):
+        page = self.rows[offset:offset + limit]
+        return {
+            "ids": [row["sku"] for row in page],
+            "embeddings": [row["vector"] for row in page],
+            "metadatas": [{"sku": row["sku"], "region": "R00", "channel": "online"} for row in page],
+            "documents": [f"Product {row['sku']}" for row in page],
+        }
+
+
+COLLECTION = FakeCollection([{"sku": "A1", "vector": [1.0, 0.0, 0.0]}, {"sku": "B2", "vector": [0.0, 1.0, 0.0]}])
+
+
+def test_lookup_during_the_build_does_not_stick(tmp_path):
+    path = str(tmp_path)
+    build_vector_index(COLLECTION, path, "v1")
+    assert get_vector_index(path, "v1").version == "v1"
+
+    # A query for the new version while its index is still being built falls back to Chroma...
+    assert get_vector_index(path, "v2") is None
+
+    build_vector_index(COLLECTION, path, "v2", keep=("v1",))
+    # ...and picks the index up once it is there; the served version survives the build
+    index = get_vector_index(path, "v2")
+    assert index is not None and index.version == "v2"
+    assert get_vector_index(path, "v2") is index
+    assert sorted(os.listdir(os.path.join(path, VECTOR_INDEX_DIR))) == ["v1", "v2"]
+    assert [doc.metadata["sku"] for doc in index.search([0.1, 0.9, 0.0], "R00", "online", 1)] == ["B2"]
+
+    build_vector_index(COLLECTION, path, "v3", keep=("v2",))
+    assert sorted(os.listdir(os.path.join(path, VECTOR_INDEX_DIR))) == ["v2", "v3"]